@@ -0,0 +1,78 @@
+# Compare coordinate_index.py neighbour lookups with a scan of every planet on a synthetic universe
+# Usage: python3 benchmarks/bench_coordinate_index.py [--galaxies N] [--planets-per-system N] [--lookups N]
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import coordinate_index as ci  # noqa: E402
+
+SYSTEMS = 499
+POSITIONS = 15
+
+
+def build_universe_xml(galaxies, planets_per_system, seed=0):
+    rng = random.Random(seed)
+    lines = ['<?xml version="1.0" encoding="utf-8"?>', '<universe timestamp="1704067200" serverId="1">']
+    planet_id = 1
+    for galaxy in range(1, galaxies + 1):
+        for system in range(1, SYSTEMS + 1):
+            for position in rng.sample(range(1, POSITIONS + 1), planets_per_system):
+                player_id = 100000 + rng.randrange(galaxies * SYSTEMS * planets_per_system // 5)
+                lines.append(f'<planet id="{planet_id}" player="{player_id}" name="Planet" coords="{galaxy}:{system}:{position}"/>')
+                planet_id += 1
+    lines.append('</universe>')
+    return '\n'.join(lines).encode()
+
+
+def scan_nearest(planets, coords, count, radius):
+    # Reference: distance to every planet of the universe, closest planet per player
+    galaxy, system, position = (int(part) for part in coords.split(':'))
+    closest = {}
+    for planet_galaxy, planet_system, planet_position, player_id in planets:
+        if planet_galaxy != galaxy or abs(planet_system - system) > radius:
+            continue
+        distance = (abs(planet_system - system), abs(planet_position - position))
+        if player_id not in closest or distance < closest[player_id]:
+            closest[player_id] = distance
+    return sorted(closest, key=lambda player_id: (closest[player_id], player_id))[:count]
+
+
+def measure(function, queries):
+    start = time.perf_counter()
+    results = [function(coords) for coords in queries]
+    return (time.perf_counter() - start) / len(queries), results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--galaxies', type=int, default=9, help='Galaxies of the universe')
+    parser.add_argument('--planets-per-system', type=int, default=10, help='Owned planets per system (up to 15)')
+    parser.add_argument('--lookups', type=int, default=200, help='Neighbour lookups measured')
+    parser.add_argument('--count', type=int, default=ci.DEFAULT_COUNT, help='Neighbours per lookup')
+    parser.add_argument('--radius', type=int, default=ci.DEFAULT_RADIUS, help='Systems searched on each side')
+    arguments = parser.parse_args()
+
+    document = build_universe_xml(arguments.galaxies, arguments.planets_per_system)
+    start = time.perf_counter()
+    index = ci.parse_universe(document)
+    build_time = time.perf_counter() - start
+    planets = [(*ci.split_key(int(key)), int(player_id)) for key, player_id in zip(index.keys, index.player_ids)]
+
+    rng = random.Random(1)
+    queries = [f'{rng.randint(1, arguments.galaxies)}:{rng.randint(1, SYSTEMS)}:{rng.randint(1, POSITIONS)}' for _ in range(arguments.lookups)]
+    index_time, index_results = measure(lambda coords: [player_id for player_id, _, _ in index.nearest(coords, arguments.count, arguments.radius)], queries)
+    scan_time, scan_results = measure(lambda coords: scan_nearest(planets, coords, arguments.count, arguments.radius), queries)
+    assert index_results == scan_results
+
+    print(f'{len(index)} planets ({len(document) / 2 ** 20:.1f} MiB), index built in {build_time:.2f}s')
+    print(f'{"method":>8} {"us/lookup":>10} {"speedup":>8}')
+    print(f'{"scan":>8} {scan_time * 1e6:>10.1f} {1:>8.1f}')
+    print(f'{"index":>8} {index_time * 1e6:>10.1f} {scan_time / index_time:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# Time every stage of a newcomer check cycle against the local fake OGame API
+# Usage: python3 benchmarks/bench_cycle.py [--players N] [--newcomers N] [--latency S] [--error-rate R] [--memory]
+import argparse
+import logging
+import os
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as et
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+# Keep the benchmark output on the console instead of the bot log file
+logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(message)s')
+
+import fake_ogame_api as fake  # noqa: E402
+import app_context as ac  # noqa: E402
+import api_parsing as ap  # noqa: E402
+import check_newcomers as cn  # noqa: E402
+import player_fetcher as pf  # noqa: E402
+import player_index as pi  # noqa: E402
+import retry_policy as rp  # noqa: E402
+
+SERVER = '1'
+COMMUNITY = 'xx'
+
+
+class Stages:
+    def __init__(self, memory):
+        self.memory = memory
+        self.results = []
+
+    def run(self, name, function, *args):
+        if self.memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        peak = None
+        if self.memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        self.results.append((name, elapsed, peak))
+        return result
+
+    def report(self):
+        print(f'{"stage":<12} {"time (ms)":>10} {"peak (KiB)":>11}')
+        for name, elapsed, peak in self.results:
+            peak_str = f'{peak / 1024:>11.0f}' if peak is not None else f'{"-":>11}'
+            print(f'{name:<12} {elapsed * 1000:>10.1f} {peak_str}')
+
+
+def fetch_highscore(context):
+    url = f'{ap.get_api_url(SERVER, COMMUNITY, context)}/highscore.xml?category=1&type=3'
+    response = context.retry.fetch(context.client, url)
+    return response.content
+
+
+def parse_highscore(content):
+    xml_tree = et.fromstring(content)
+    return ap.get_timestamp(xml_tree), ap.get_player_ids(xml_tree)
+
+
+def main():
+    parser = argparse.ArgumentParser(usage='python3 bench_cycle.py [--players] [--newcomers] [--latency] [--error-rate] [--requests-per-second] [--max-in-flight] [--memory] [-h|--help]')
+    parser.add_argument('--players', type=int, default=10000)
+    parser.add_argument('--newcomers', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--requests-per-second', type=float, default=1000.0)
+    parser.add_argument('--max-in-flight', type=int, default=8)
+    parser.add_argument('--memory', action='store_true', help='Trace peak memory (slows every stage down)')
+    arguments = parser.parse_args()
+
+    api = fake.FakeOgameApi(arguments.players, arguments.newcomers, arguments.latency, arguments.error_rate)
+    server = fake.start_server(api)
+    # Injected errors must be retried quickly and must not open the circuit
+    context = ac.AppContext(
+        {'CHECK_NEWCOMERS': {'api_base_url': f'http://127.0.0.1:{server.server_port}/{{server}}-{{community}}/api'}},
+        retry=rp.RetryPolicy(base_delay=0.01, max_delay=0.1, failure_threshold=10 ** 9),
+    )
+
+    # Known players are the ones of the first generation, the benchmarked cycle sees the second one
+    known_players = pi.PlayerIndex(api.player_ids())
+    api.advance()
+
+    stages = Stages(arguments.memory)
+    content = stages.run('fetch', fetch_highscore, context)
+    timestamp, current_players = stages.run('parse', parse_highscore, content)
+    new_players, _ = stages.run('diff', known_players.diff, current_players)
+    enriched_players = stages.run(
+        'enrichment', pf.enrich_players, SERVER, COMMUNITY, new_players,
+        arguments.requests_per_second, arguments.max_in_flight, context,
+    )
+    payload = stages.run('payload', cn.build_payload, timestamp, enriched_players)
+    server.shutdown()
+
+    failed = sum(1 for _, fields in enriched_players if fields is None)
+    print(f'{arguments.players} players, {len(new_players)} newcomers ({failed} failed), '
+          f'{len(content) / 1024:.0f} KiB highscore, {len(payload)} chars payload, {api.requests} API requests')
+    stages.report()
+
+
+if __name__ == '__main__':
+    main()
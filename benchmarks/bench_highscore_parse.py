@@ -0,0 +1,61 @@
+# Compare the fromstring() and streaming highscore.xml parsers on synthetic documents
+# Usage: python3 benchmarks/bench_highscore_parse.py [player_count ...]
+import os
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as et
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import highscore_stream as hs  # noqa: E402
+
+CHUNK_SIZE = 65536
+
+
+def build_highscore_xml(player_count):
+    lines = ['<?xml version="1.0" encoding="utf-8"?>', '<highscore category="1" type="3" timestamp="1704067200">']
+    for position in range(1, player_count + 1):
+        lines.append(f'<player position="{position}" id="{100000 + position}" score="{(player_count - position) * 1000}" ships="{position}"/>')
+    lines.append('</highscore>')
+    return '\n'.join(lines).encode()
+
+
+def chunked(data):
+    for offset in range(0, len(data), CHUNK_SIZE):
+        yield data[offset:offset + CHUNK_SIZE]
+
+
+def parse_fromstring(data):
+    xml_tree = et.fromstring(data)
+    return [child.attrib.get('id') for child in xml_tree]
+
+
+def parse_stream(data):
+    return [str(player_id) for player_id, _, _ in hs.HighscoreStream(chunked(data))]
+
+
+def measure(parse, data):
+    tracemalloc.start()
+    start = time.perf_counter()
+    ids = parse(data)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # The peak includes the returned ID list, which both parsers build
+    return elapsed, peak, len(ids)
+
+
+def main():
+    player_counts = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000, 200000]
+    print(f'{"players":>8} {"parser":>10} {"time (ms)":>10} {"peak (KiB)":>11}')
+    for player_count in player_counts:
+        data = build_highscore_xml(player_count)
+        for name, parse in (('fromstring', parse_fromstring), ('stream', parse_stream)):
+            elapsed, peak, count = measure(parse, data)
+            assert count == player_count
+            print(f'{player_count:>8} {name:>10} {elapsed * 1000:>10.1f} {peak / 1024:>11.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# Measure how highscore.xml parse throughput scales with the number of parse_pool.py worker processes
+# Usage: python3 benchmarks/bench_parse_pool.py [--players N] [--documents N] [--workers N ...]
+import os
+import sys
+import time
+import argparse
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import parse_pool as pp  # noqa: E402
+from bench_highscore_parse import build_highscore_xml  # noqa: E402
+
+
+def measure(workers, documents):
+    # inline_threshold=0 sends every document to the workers, a single worker parses inline
+    pool = pp.ParsePool(workers=workers, inline_threshold=0)
+    try:
+        # Start the worker processes before timing
+        pool.run(pp.parse_highscore, documents[0])
+        start = time.perf_counter()
+        futures = [pool.submit(pp.parse_highscore, document) for document in documents]
+        player_count = sum(len(future.result()[1]) for future in futures)
+        return time.perf_counter() - start, player_count
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--players', type=int, default=100000, help='Players per highscore document')
+    parser.add_argument('--documents', type=int, default=16, help='Documents parsed per run (e.g. one per universe)')
+    parser.add_argument('--workers', type=int, nargs='+', help='Worker counts to measure, powers of two up to the CPU count by default')
+    arguments = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    cpus = pp.default_workers()
+    worker_counts = arguments.workers or sorted({1 << power for power in range(cpus.bit_length()) if 1 << power <= cpus} | {cpus})
+    documents = [build_highscore_xml(arguments.players)] * arguments.documents
+    size = sum(len(document) for document in documents)
+
+    print(f'{arguments.documents} documents of {arguments.players} players ({size / 2 ** 20:.1f} MiB), {cpus} CPUs available')
+    print(f'{"workers":>8} {"time (s)":>9} {"MiB/s":>8} {"players/s":>11} {"speedup":>8}')
+    baseline = None
+    for workers in worker_counts:
+        elapsed, player_count = measure(workers, documents)
+        assert player_count == arguments.players * arguments.documents
+        baseline = baseline or elapsed
+        print(f'{workers:>8} {elapsed:>9.2f} {size / 2 ** 20 / elapsed:>8.1f} {player_count / elapsed:>11.0f} {baseline / elapsed:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# Measure the import time of the bot modules with python -X importtime
+# Usage: python3 benchmarks/bench_startup.py [--modules M ...] [--runs N] [--top N]
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+DEFAULT_MODULES = ('api_parsing', 'check_newcomers', 'discord_bot', 'multi_bot')
+
+# Heavy dependencies that must only be loaded when first used
+LAZY_MODULES = ('requests', 'numpy', 'sqlite3', 'http.server')
+
+
+def import_times(module):
+    """
+    Import a module in a fresh interpreter and parse the -X importtime report.
+
+    Args:
+        module (str): The module to import.
+
+    Returns:
+        list: (module, self_us, cumulative_us) tuples, in import order.
+    """
+
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=SRC_DIR, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(usage='python3 bench_startup.py [--modules] [--runs] [--top] [-h|--help]')
+    parser.add_argument('--modules', nargs='+', default=list(DEFAULT_MODULES))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5, help='Slowest imports listed per module')
+    arguments = parser.parse_args()
+
+    print(f'{"module":<18} {"median (ms)":>12} {"min (ms)":>9}  lazy dependencies loaded')
+    details = {}
+    for module in arguments.modules:
+        totals = []
+        for _ in range(arguments.runs):
+            rows = import_times(module)
+            totals.append(next(cumulative for name, _, cumulative in rows if name == module))
+        loaded = [name for name in LAZY_MODULES if any(row[0] == name for row in rows)]
+        details[module] = rows
+        print(f'{module:<18} {statistics.median(totals) / 1000:>12.1f} {min(totals) / 1000:>9.1f}  {", ".join(loaded) or "-"}')
+
+    for module, rows in details.items():
+        print(f'\n{module}: slowest imports (self time)')
+        for name, self_us, cumulative_us in sorted(rows, key=lambda row: -row[1])[:arguments.top]:
+            print(f'  {name:<40} {self_us / 1000:>7.1f} ms  (cumulative {cumulative_us / 1000:.1f} ms)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+# Local stand-in for the OGame public APIs, serving synthetic documents
+# Usage: python3 benchmarks/fake_ogame_api.py [--players N] [--newcomers N] [--latency S] [--error-rate R]
+# Then set api_base_url = 'http://127.0.0.1:8765/{server}-{community}/api' in config.toml
+# Every GET /_advance publishes a new API update with --newcomers more players
+import argparse
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+BASE_TIMESTAMP = 1704067200
+FIRST_PLAYER_ID = 100000
+
+
+class FakeOgameApi:
+    """
+    Synthetic OGame API state: player_count players at generation 0, newcomers more at every generation.
+
+    Documents are generated deterministically from the player IDs and cached per generation.
+
+    Args:
+        player_count (int): Players at generation 0.
+
+        newcomers (int): Players added at every generation.
+
+        latency (float): Seconds every response is delayed by.
+
+        error_rate (float): Probability for a request to be answered with a 503.
+
+        seed (int): Seed of the error injection.
+    """
+
+    def __init__(self, player_count=1000, newcomers=10, latency=0.0, error_rate=0.0, seed=0):
+        self.player_count = player_count
+        self.newcomers = newcomers
+        self.latency = latency
+        self.error_rate = error_rate
+        self.generation = 0
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @property
+    def timestamp(self):
+        return BASE_TIMESTAMP + 3600 * self.generation
+
+    def player_ids(self, generation=None):
+        generation = self.generation if generation is None else generation
+        return range(FIRST_PLAYER_ID, FIRST_PLAYER_ID + self.player_count + self.newcomers * generation)
+
+    def advance(self):
+        with self._lock:
+            self.generation += 1
+            self._cache.clear()
+        return self.timestamp
+
+    def score(self, player_id, highscore_type):
+        # Older players (lower IDs) score higher, scores grow with the generation
+        age = FIRST_PLAYER_ID + self.player_count + self.newcomers * self.generation - player_id
+        return age * (highscore_type + 1) * 10 + self.generation * (player_id % 7)
+
+    def ships(self, player_id):
+        return (player_id * 31) % 5000
+
+    def highscore(self, category, highscore_type):
+        ids = self.player_ids()
+        lines = [f'<highscore category="{category}" type="{highscore_type}" timestamp="{self.timestamp}">']
+        for position, player_id in enumerate(ids, start=1):
+            ships = f' ships="{self.ships(player_id)}"' if highscore_type == 3 else ''
+            lines.append(f'<player position="{position}" id="{player_id}" score="{self.score(player_id, highscore_type)}"{ships}/>')
+        lines.append('</highscore>')
+        return lines
+
+    def player_data(self, player_id):
+        ids = self.player_ids()
+        if player_id not in ids:
+            return None
+        position = ids.index(player_id) + 1
+        lines = [f'<playerData id="{player_id}" name="Player{player_id}" serverId="1" timestamp="{self.timestamp}">', '<positions>']
+        for highscore_type in range(12):
+            ships = f' ships="{self.ships(player_id)}"' if highscore_type == 3 else ''
+            lines.append(f'<position type="{highscore_type}" score="{self.score(player_id, highscore_type)}"{ships}>{position}</position>')
+        lines.append('</positions>')
+        lines.append('<planets>')
+        for planet_index, coords in enumerate(self.coords(player_id)):
+            lines.append(f'<planet id="{player_id * 10 + planet_index}" name="Planet{planet_index}" coords="{coords}"/>')
+        lines.append('</planets>')
+        lines.append('</playerData>')
+        return lines
+
+    def coords(self, player_id):
+        return [f'{(player_id + index) % 9 + 1}:{(player_id * 7 + index) % 499 + 1}:{(player_id + index * 3) % 15 + 1}' for index in range(1 + player_id % 3)]
+
+    def players(self):
+        lines = [f'<players timestamp="{self.timestamp}" serverId="1">']
+        for player_id in self.player_ids():
+            lines.append(f'<player id="{player_id}" name="Player{player_id}"/>')
+        lines.append('</players>')
+        return lines
+
+    def universe(self):
+        lines = [f'<universe timestamp="{self.timestamp}" serverId="1">']
+        for player_id in self.player_ids():
+            for planet_index, coords in enumerate(self.coords(player_id)):
+                lines.append(f'<planet id="{player_id * 10 + planet_index}" player="{player_id}" name="Planet{planet_index}" coords="{coords}"/>')
+        lines.append('</universe>')
+        return lines
+
+    def render(self, endpoint, query):
+        """
+        Render an API document.
+
+        Args:
+            endpoint (str): File name of the endpoint (e.g., 'highscore.xml').
+
+            query (dict): Parsed query string.
+
+        Returns:
+            bytes: The document, None for unknown endpoints or players.
+        """
+
+        key = (self.generation, endpoint, tuple(sorted((name, tuple(values)) for name, values in query.items())))
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+        if endpoint == 'highscore.xml':
+            lines = self.highscore(query.get('category', ['1'])[0], int(query.get('type', ['0'])[0]))
+        elif endpoint == 'playerData.xml':
+            lines = self.player_data(int(query.get('id', ['0'])[0]))
+        elif endpoint == 'players.xml':
+            lines = self.players()
+        elif endpoint == 'universe.xml':
+            lines = self.universe()
+        else:
+            lines = None
+        body = None if lines is None else ('<?xml version="1.0" encoding="utf-8"?>\n' + '\n'.join(lines)).encode()
+        # Only bulk documents are worth caching
+        if body is not None and endpoint != 'playerData.xml':
+            with self._lock:
+                self._cache[key] = body
+        return body
+
+    def should_fail(self):
+        with self._lock:
+            self.requests += 1
+            return self._random.random() < self.error_rate
+
+
+def make_handler(api):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/_advance':
+                return self.reply(200, f'{api.advance()}'.encode(), 'text/plain')
+            if api.latency:
+                time.sleep(api.latency)
+            if api.should_fail():
+                return self.reply(503, b'Service Unavailable', 'text/plain')
+            body = api.render(url.path.rsplit('/', 1)[-1], parse_qs(url.query))
+            if body is None:
+                return self.reply(404, b'Not Found', 'text/plain')
+            return self.reply(200, body, 'application/xml')
+
+        def reply(self, status, body, content_type):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_server(api, host='127.0.0.1', port=0):
+    """
+    Serve a FakeOgameApi from a background thread.
+
+    Args:
+        api (FakeOgameApi): The synthetic API state.
+
+        host (str): Interface to listen on.
+
+        port (int): Port to listen on, 0 for any free port.
+
+    Returns:
+        http.server.ThreadingHTTPServer: The running server, its base URL template is
+            f'http://{host}:{server.server_port}/{{server}}-{{community}}/api'.
+    """
+
+    server = ThreadingHTTPServer((host, port), make_handler(api))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(usage='python3 fake_ogame_api.py [--port] [--players] [--newcomers] [--latency] [--error-rate] [-h|--help]')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--players', type=int, default=1000)
+    parser.add_argument('--newcomers', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    arguments = parser.parse_args()
+    api = FakeOgameApi(arguments.players, arguments.newcomers, arguments.latency, arguments.error_rate)
+    server = start_server(api, port=arguments.port)
+    print(f"Serving on http://127.0.0.1:{server.server_port}/{{server}}-{{community}}/api")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+# Load necessary modules
+import os
+import re
+import gzip
+import json
+import time
+import hashlib
+import logging
+import threading
+import metrics
+import state_store as ss
+
+# Default settings, overridable from the [ARCHIVE] section of config.toml
+DEFAULT_CODEC = 'gzip'
+DEFAULT_LEVEL = 6
+
+# File extension of the stored objects per codec, also used to pick the decompressor when reading
+CODEC_EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+
+# Every OGame API document carries its generation time on the root element
+TIMESTAMP_PATTERN = re.compile(rb'<\w+[^>]*?\btimestamp="(\d+)"')
+
+
+class ApiArchive:
+    """
+    Content-addressed archive of raw OGame API responses.
+
+    Each response body is compressed and stored once under objects/{digest[:2]}/{digest}{extension}, digest being
+    the SHA-256 of the raw body, so an unchanged document polled again costs nothing.
+    Every target has an append-only index ({server}_{community}.jsonl) with one line per archived response:
+    endpoint (e.g., 'highscore.xml?category=1&type=3'), API timestamp, digest, codec and fetch time.
+    An (endpoint, timestamp, digest) triple is only indexed once.
+
+    Args:
+        archive_dir (str): The archive directory.
+
+        codec (str): 'gzip', or 'zstd' if the zstandard package is installed (falls back to gzip otherwise).
+
+        level (int): Compression level of the codec.
+    """
+
+    def __init__(self, archive_dir, codec=DEFAULT_CODEC, level=DEFAULT_LEVEL):
+        if codec not in CODEC_EXTENSIONS:
+            raise ValueError(f'Unknown archive codec {codec!r}, expected one of {sorted(CODEC_EXTENSIONS)}')
+        if codec == 'zstd' and _load_zstd() is None:
+            logging.warning('zstandard is not installed, archiving with gzip instead')
+            codec = 'gzip'
+        self.archive_dir = archive_dir
+        self.codec = codec
+        self.level = level
+        self._indexed = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(archive_dir, 'objects'), exist_ok=True)
+
+    def store(self, server, community, endpoint, content, fetched_at=None):
+        """
+        Archive a raw response body.
+
+        Args:
+            server (str): The OGame server number (e.g., '123', '260').
+
+            community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+            endpoint (str): File name and query of the endpoint (e.g., 'playerData.xml?id=108794').
+
+            content (bytes): The raw response body.
+
+            fetched_at (float): Epoch unix time of the fetch, now if None.
+
+        Returns:
+            str: The digest of the body.
+        """
+
+        digest = hashlib.sha256(content).hexdigest()
+        timestamp = get_document_timestamp(content)
+        key = (endpoint, timestamp, digest)
+        with self._lock:
+            indexed = self._load_keys(server, community)
+            if key in indexed:
+                return digest
+            object_path = self.find_object(digest)
+            if object_path is None:
+                object_path = self.object_path(digest, self.codec)
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                compressed = compress(content, self.codec, self.level)
+                ss.atomic_write(object_path, compressed)
+                metrics.registry.inc('archive_bytes_total', len(compressed), codec=self.codec)
+            entry = {
+                'endpoint': endpoint,
+                'timestamp': timestamp,
+                'digest': digest,
+                'codec': codec_of(object_path),
+                'fetched_at': round(fetched_at if fetched_at is not None else time.time(), 3),
+            }
+            with open(self.index_path(server, community), 'a') as index_file:
+                index_file.write(json.dumps(entry) + '\n')
+            indexed.add(key)
+        metrics.registry.inc('archive_responses_total', endpoint=endpoint.split('?', 1)[0])
+        return digest
+
+    def entries(self, server, community, endpoint=None):
+        """
+        List the archived responses of a target.
+
+        Args:
+            server (str): The OGame server number (e.g., '123', '260').
+
+            community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+            endpoint (str): Only list this endpoint (file name and query), None for every endpoint.
+
+        Returns:
+            list: Index entries (dicts) in archiving order.
+        """
+
+        index_path = self.index_path(server, community)
+        if not os.path.exists(index_path):
+            return []
+        entries = []
+        with open(index_path, 'r') as index_file:
+            for line in index_file:
+                # A line without its newline is a torn write from a crash, ignore it
+                if not line.endswith('\n'):
+                    break
+                entry = json.loads(line)
+                if endpoint is None or entry['endpoint'] == endpoint:
+                    entries.append(entry)
+        return entries
+
+    def read(self, digest):
+        """
+        Read an archived response body back.
+
+        Args:
+            digest (str): The digest of the body, as found in the index.
+
+        Raises:
+            FileNotFoundError: If no object has this digest.
+
+        Returns:
+            bytes: The raw response body.
+        """
+
+        object_path = self.find_object(digest)
+        if object_path is None:
+            raise FileNotFoundError(f'No archived object {digest} in {self.archive_dir}')
+        with open(object_path, 'rb') as object_file:
+            return decompress(object_file.read(), codec_of(object_path))
+
+    def index_path(self, server, community):
+        return os.path.join(self.archive_dir, f'{server}_{community}.jsonl')
+
+    def object_path(self, digest, codec):
+        return os.path.join(self.archive_dir, 'objects', digest[:2], f'{digest}{CODEC_EXTENSIONS[codec]}')
+
+    def find_object(self, digest):
+        # An object may have been written with another codec by an earlier configuration
+        for codec in CODEC_EXTENSIONS:
+            object_path = self.object_path(digest, codec)
+            if os.path.exists(object_path):
+                return object_path
+        return None
+
+    def _load_keys(self, server, community):
+        name = f'{server}_{community}'
+        if name not in self._indexed:
+            self._indexed[name] = {(entry['endpoint'], entry['timestamp'], entry['digest']) for entry in self.entries(server, community)}
+        return self._indexed[name]
+
+
+def get_document_timestamp(content):
+    """
+    Read the timestamp of an OGame API document without parsing it.
+
+    Args:
+        content (bytes): The raw document.
+
+    Returns if success:
+        int: Epoch unix timestamp of the root element.
+
+    Returns if failure:
+        NoneType: None
+    """
+
+    match = TIMESTAMP_PATTERN.search(content, 0, 4096)
+    return int(match.group(1)) if match else None
+
+
+def compress(data, codec, level=DEFAULT_LEVEL):
+    """
+    Compress bytes with one of the archive codecs.
+
+    Args:
+        data (bytes): The data.
+
+        codec (str): 'gzip' or 'zstd'.
+
+        level (int): Compression level.
+
+    Returns:
+        bytes: The compressed data.
+    """
+
+    if codec == 'zstd':
+        return _load_zstd().ZstdCompressor(level=level).compress(data)
+    # mtime=0 keeps the output deterministic for a given body
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def decompress(data, codec):
+    """
+    Decompress bytes written by compress().
+
+    Args:
+        data (bytes): The compressed data.
+
+        codec (str): 'gzip' or 'zstd'.
+
+    Raises:
+        RuntimeError: If the data is zstd compressed and zstandard is not installed.
+
+    Returns:
+        bytes: The original data.
+    """
+
+    if codec == 'zstd':
+        zstd = _load_zstd()
+        if zstd is None:
+            raise RuntimeError('zstandard is required to read zstd archived objects')
+        return zstd.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def codec_of(path):
+    """
+    Tell the codec of an archived object from its extension.
+
+    Args:
+        path (str): The object path.
+
+    Returns:
+        str: 'gzip' or 'zstd'.
+    """
+
+    for codec, extension in CODEC_EXTENSIONS.items():
+        if path.endswith(extension):
+            return codec
+    raise ValueError(f'Unknown archived object extension: {path}')
+
+
+def _load_zstd():
+    # Optional dependency, only needed for codec = 'zstd'
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def from_config(config):
+    """
+    Build an ApiArchive from a parsed config.toml.
+
+    Args:
+        config (dict): The parsed configuration file.
+
+    Returns if archive_dir is set in [ARCHIVE]:
+        ApiArchive: An archive using the [ARCHIVE] settings, defaults for missing keys.
+
+    Returns if the archive is disabled:
+        NoneType: None
+    """
+
+    # Extract configuration parameters: archive directory (empty disables the archive), codec and compression level
+    archive_config = config.get('ARCHIVE', {})
+    archive_dir = archive_config.get('archive_dir', '')
+    if not archive_dir:
+        return None
+    return ApiArchive(
+        archive_dir,
+        codec=archive_config.get('codec', DEFAULT_CODEC),
+        level=archive_config.get('level', DEFAULT_LEVEL),
+    )
@@ -1,46 +1,42 @@
 # Load necessary modules
-import os
-import tomllib
 import logging
-import requests
+import app_context as ac
+import metrics
+import highscore_stream as hs
+import player_record as pr
 import xml.etree.ElementTree as et
-import time
 
-# Set the working directory to this script location
-os.chdir(f'{os.path.dirname(__file__)}')
+# Military highscore type, the one carrying the ship count
+MILITARY_TYPE = 3
 
-# Parse the configuration file
-with open('../config.toml', 'rb') as config_file:
-    config = tomllib.load(config_file)
+# Returned by get_highscore_api() when a conditional request shows the API did not change
+NOT_MODIFIED = object()
 
-# Extract configuration parameters: logs directory
-log_dir = config.get('CHECK_NEWCOMERS', {}).get('log_dir')
 
-# Extract configuration parameters: logging level
-log_lvl_str = config.get('CHECK_NEWCOMERS', {}).get('log_lvl')
-module_name, attribute_name = log_lvl_str.rsplit('.', 1)
-log_lvl = getattr(logging, attribute_name)
+def main():
+    ...
 
-# Extract configuration parameters: server of interest
-server = config.get('CHECK_NEWCOMERS', {}).get('server')
 
-# Extract configuration parameters: community of interest
-community = config.get('CHECK_NEWCOMERS', {}).get('community')
+def get_api_url(server, community, context=None):
+    """
+    Build the base URL of the OGame APIs of a server.
 
-# Set up logging format
-logging.basicConfig(
-    filename=f'{log_dir}/{server}_{community}_check_newcomers.log',
-    filemode='a',
-    format='%(asctime)s %(levelname)s %(message)s',
-    level=log_lvl,
-)
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
 
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
 
-def main():
-    ...
+        context (app_context.AppContext): Settings to use, the default context if None.
 
+    Returns:
+        str: The base URL without trailing slash (e.g., 'https://s123-fr.ogame.gameforge.com/api').
+    """
+
+    context = context or ac.get_default()
+    return context.api_base_url.format(server=server, community=community).rstrip('/')
 
-def get_highscore_api(server, community, category, type, max_retries=70, retry_sleep=60):
+
+def get_highscore_api(server, community, category, type, cache=None, context=None):
     """
     Retrieve data from OGame highscore API.
 
@@ -67,38 +63,264 @@ def get_highscore_api(server, community, category, type, max_retries=70, retry_s
             - '10': Lifeforms technology highscore
             - '11': Lifeforms discovery highscore
 
-        max_retries (int): The number of time the function will try to reach the API.
+        cache (http_cache.HttpCache): Optional validators store used to send a conditional request.
 
-        retry_sleep (int): The amount of time (in seconds) the function will wait before trying to reach the API again after a previous failure.
+        context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
 
     Raises:
-        requests.exceptions.RequestException: If there is an error during the request.
+        xml.etree.ElementTree.ParseError: If the API returns a malformed document.
 
     Returns if success:
         xml.etree.ElementTree.Element: The whole XML document as a tree.
 
+    Returns if the API did not change since the last committed cache entry:
+        object: NOT_MODIFIED
+
     Returns if failure:
         NoneType: None
     """
 
-    api_url = f'https://s{server}-{community}.ogame.gameforge.com/api/highscore.xml?category={category}&type={type}'
+    content = get_highscore_content(server, community, category, type, cache, context)
+    if content is None or content is NOT_MODIFIED:
+        return content
+    xml_tree = et.fromstring(content)
+    return xml_tree
 
-    retries = 0
 
-    while retries < max_retries:
-        try:
-            response = requests.get(api_url)
-            if response.status_code == 200:
-                xml_tree = et.fromstring(response.content)
-                return xml_tree
-            response.raise_for_status()
-        except requests.exceptions.RequestException as exception:
-            logging.warning(f'Calling get_highscore_api(): {exception}')
-            logging.warning(f'Waiting {retry_sleep}s and trying again')
-        time.sleep(retry_sleep)
-        retries += 1
-    logging.warning(f'Reached maximum retry limit ({max_retries}). Unable to obtain XML tree.')
-    return None
+def get_highscore_content(server, community, category, type, cache=None, context=None):
+    """
+    Retrieve the raw document of OGame highscore API, for callers parsing it themselves (see parse_pool.py).
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        category (str): The category of highscore data to retrieve (see get_highscore_api()).
+
+        type (str): The type of highscore data to retrieve (see get_highscore_api()).
+
+        cache (http_cache.HttpCache): Optional validators store used to send a conditional request.
+
+        context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
+
+    Raises: None.
+
+    Returns if success:
+        bytes: The whole XML document.
+
+    Returns if the API did not change since the last committed cache entry:
+        object: NOT_MODIFIED
+
+    Returns if failure:
+        NoneType: None
+    """
+
+    context = context or ac.get_default()
+    api_url = f'{get_api_url(server, community, context)}/highscore.xml?category={category}&type={type}'
+
+    headers = cache.validators(api_url) if cache is not None else None
+
+    response = context.retry.fetch(context.client, api_url, headers=headers)
+    if response is None:
+        logging.warning('Calling get_highscore_content(): Unable to obtain XML document.')
+        return None
+    if response.status_code == 304:
+        logging.info('Calling get_highscore_content(): 304 Not Modified')
+        return NOT_MODIFIED
+    archive_response(server, community, api_url, response.content, context)
+    if cache is not None and not cache.update(api_url, response):
+        logging.info('Calling get_highscore_content(): Content hash unchanged')
+        return NOT_MODIFIED
+    return response.content
+
+
+def get_highscore_stream(server, community, category, type, cache=None, chunk_size=65536, with_ships=False, context=None):
+    """
+    Retrieve data from OGame highscore API as a stream of player entries.
+
+    Unlike get_highscore_api(), the body is not loaded in memory at once: it is parsed while being downloaded
+    and every entry is discarded once yielded. Only the request is retried, not a failure mid-stream.
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        category (str): The category of highscore data to retrieve (see get_highscore_api()).
+
+        type (str): The type of highscore data to retrieve (see get_highscore_api()).
+
+        cache (http_cache.HttpCache): Optional validators store used to send a conditional request.
+
+        chunk_size (int): Size (in bytes) of the chunks fed to the parser.
+
+        with_ships (bool): Whether the yielded tuples end with the ship count.
+
+        context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
+
+    Raises:
+        xml.etree.ElementTree.ParseError: If the API returns a malformed document.
+
+    Returns if success:
+        highscore_stream.HighscoreStream: Timestamp available up front, iterating yields (id, position, score) tuples.
+
+    Returns if the API did not change since the last committed cache entry:
+        object: NOT_MODIFIED
+
+    Returns if failure:
+        NoneType: None
+    """
+
+    context = context or ac.get_default()
+    api_url = f'{get_api_url(server, community, context)}/highscore.xml?category={category}&type={type}'
+
+    headers = cache.validators(api_url) if cache is not None else None
+
+    response = context.retry.fetch(context.client, api_url, headers=headers, stream=True)
+    if response is None:
+        logging.warning('Calling get_highscore_stream(): Unable to obtain highscore stream.')
+        return None
+    if response.status_code == 304:
+        response.close()
+        logging.info('Calling get_highscore_stream(): 304 Not Modified')
+        return NOT_MODIFIED
+    if cache is not None:
+        cache.remember(api_url, response)
+    chunks = count_bytes(response, response.iter_content(chunk_size), 'highscore.xml')
+    if context.archive is not None:
+        chunks = archive_chunks(server, community, api_url, chunks, context)
+    return hs.HighscoreStream(chunks, on_close=response.close, with_ships=with_ships)
+
+
+def count_bytes(response, chunks, endpoint):
+    """
+    Count the bytes of a streamed response in the api_bytes_total metric while passing them through.
+
+    The chunks are decoded, so the bytes read from the connection are counted instead, as for the other endpoints
+    (see retry_policy.wire_bytes()).
+
+    Args:
+        response (requests.Response): The streamed response.
+
+        chunks (iterable): Bytes chunks of the response.
+
+        endpoint (str): File name of the endpoint (e.g., 'highscore.xml').
+
+    Returns:
+        generator: The same chunks.
+    """
+
+    tell = getattr(getattr(response, 'raw', None), 'tell', None)
+    counted = 0
+    for chunk in chunks:
+        read = tell() if tell is not None else counted + len(chunk)
+        metrics.registry.inc('api_bytes_total', read - counted, endpoint=endpoint)
+        counted = read
+        yield chunk
+    if tell is not None:
+        metrics.registry.inc('api_bytes_total', tell() - counted, endpoint=endpoint)
+
+
+def fetch_document(server, community, api_url, caller, context, cache=None):
+    """
+    Retrieve the raw body of an OGame API document, archiving it if an archive is configured.
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        api_url (str): The URL of the document.
+
+        caller (str): Name of the calling function, for the logs.
+
+        context (app_context.AppContext): Settings and HTTP client to use.
+
+        cache (http_cache.HttpCache): Optional validators store used to send a conditional request.
+
+    Returns if success:
+        bytes: The document.
+
+    Returns if the document did not change since the last committed cache entry:
+        object: NOT_MODIFIED
+
+    Returns if failure:
+        NoneType: None
+    """
+
+    headers = cache.validators(api_url) if cache is not None else None
+
+    response = context.retry.fetch(context.client, api_url, headers=headers)
+    if response is not None and response.status_code == 304:
+        logging.info(f'Calling {caller}(): 304 Not Modified')
+        return NOT_MODIFIED
+    if response is None or response.status_code != 200:
+        logging.warning(f'Calling {caller}(): Unable to obtain XML document.')
+        return None
+    archive_response(server, community, api_url, response.content, context)
+    if cache is not None and not cache.update(api_url, response):
+        logging.info(f'Calling {caller}(): Content hash unchanged')
+        return NOT_MODIFIED
+    return response.content
+
+
+def archive_response(server, community, api_url, content, context):
+    """
+    Store a raw response body in the archive of the context, if one is configured.
+
+    Archiving never fails a fetch: errors are logged and the response is used as usual.
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        api_url (str): The fetched URL, its file name and query become the archived endpoint.
+
+        content (bytes): The raw response body.
+
+        context (app_context.AppContext): Settings to use.
+
+    Returns: None.
+    """
+
+    archive = context.archive
+    if archive is None:
+        return
+    endpoint = api_url.rsplit('/', 1)[-1]
+    try:
+        archive.store(server, community, endpoint, content)
+    except OSError as error:
+        logging.warning(f'Calling archive_response(): Unable to archive {endpoint}: {error}')
+
+
+def archive_chunks(server, community, api_url, chunks, context):
+    """
+    Pass the chunks of a streamed response through, then archive the whole body once it was read to the end.
+
+    A stream closed early (e.g., the API was not updated) is not archived.
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        api_url (str): The fetched URL.
+
+        chunks (iterable): Bytes chunks of the response.
+
+        context (app_context.AppContext): Settings to use.
+
+    Returns:
+        generator: The same chunks.
+    """
+
+    body = []
+    for chunk in chunks:
+        body.append(chunk)
+        yield chunk
+    archive_response(server, community, api_url, b''.join(body), context)
 
 
 def get_player_ids(xml_tree):
@@ -130,7 +352,7 @@ def get_player_ids(xml_tree):
     return ids
 
 
-def get_player_api(server, community, player_id, max_retries=70, retry_sleep=60):
+def get_player_api(server, community, player_id, context=None):
     """
     Retrieve data from OGame player API.
 
@@ -141,12 +363,65 @@ def get_player_api(server, community, player_id, max_retries=70, retry_sleep=60)
 
         player_id (str): The ID of the player of interest (e.g., '142515', '108794').
 
-        max_retries (int): The number of time the function will try to reach the API.
+        context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
+
+    Raises:
+        xml.etree.ElementTree.ParseError: If the API returns a malformed document.
+
+    Returns if success:
+        xml.etree.ElementTree.Element: The whole XML document as a tree.
+
+    Returns if failure:
+        NoneType: None
+    """
+
+    content = get_player_content(server, community, player_id, context)
+    if content is None:
+        return None
+    xml_tree = et.fromstring(content)
+    return xml_tree
+
+
+def get_player_content(server, community, player_id, context=None):
+    """
+    Retrieve the raw document of OGame player API, for callers parsing it themselves (see parse_pool.py).
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        player_id (str): The ID of the player of interest (e.g., '142515', '108794').
+
+        context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
+
+    Raises: None.
+
+    Returns if success:
+        bytes: The whole XML document.
+
+    Returns if failure:
+        NoneType: None
+    """
 
-        retry_sleep (int): The amount of time (in seconds) the function will wait before trying to reach the API again after a previous failure.
+    context = context or ac.get_default()
+    api_url = f'{get_api_url(server, community, context)}/playerData.xml?id={player_id}'
+    return fetch_document(server, community, api_url, 'get_player_content', context)
+
+
+def get_players_api(server, community, context=None):
+    """
+    Retrieve data from OGame players API (every player name, status and alliance, updated daily).
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
 
     Raises:
-        requests.exceptions.RequestException: If there is an error during the request.
+        xml.etree.ElementTree.ParseError: If the API returns a malformed document.
 
     Returns if success:
         xml.etree.ElementTree.Element: The whole XML document as a tree.
@@ -155,24 +430,99 @@ def get_player_api(server, community, player_id, max_retries=70, retry_sleep=60)
         NoneType: None
     """
 
-    api_url = f'https://s{server}-{community}.ogame.gameforge.com/api/playerData.xml?id={player_id}'
+    content = get_players_content(server, community, context)
+    if content is None:
+        return None
+    xml_tree = et.fromstring(content)
+    return xml_tree
 
-    retries = 0
 
-    while retries < max_retries:
-        try:
-            response = requests.get(api_url)
-            if response.status_code == 200:
-                xml_tree = et.fromstring(response.content)
-                return xml_tree
-            response.raise_for_status()
-        except requests.exceptions.RequestException as exception:
-            logging.warning(f'Calling get_player_api(): {exception}')
-            logging.warning(f'Waiting {retry_sleep}s and trying again')
-        time.sleep(retry_sleep)
-        retries += 1
-    logging.warning(f'Reached maximum retry limit ({max_retries}). Unable to obtain XML tree.')
-    return None
+def get_players_content(server, community, context=None, cache=None):
+    """
+    Retrieve the raw document of OGame players API, for callers parsing it themselves (see parse_pool.py).
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
+
+        cache (http_cache.HttpCache): Optional validators store used to send a conditional request.
+
+    Raises: None.
+
+    Returns if success:
+        bytes: The whole XML document.
+
+    Returns if the API did not change since the last committed cache entry:
+        object: NOT_MODIFIED
+
+    Returns if failure:
+        NoneType: None
+    """
+
+    context = context or ac.get_default()
+    api_url = f'{get_api_url(server, community, context)}/players.xml'
+    return fetch_document(server, community, api_url, 'get_players_content', context, cache)
+
+
+def get_universe_api(server, community, context=None):
+    """
+    Retrieve data from OGame universe API (every planet and moon with its owner, updated weekly).
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
+
+    Raises:
+        xml.etree.ElementTree.ParseError: If the API returns a malformed document.
+
+    Returns if success:
+        xml.etree.ElementTree.Element: The whole XML document as a tree.
+
+    Returns if failure:
+        NoneType: None
+    """
+
+    content = get_universe_content(server, community, context)
+    if content is None:
+        return None
+    xml_tree = et.fromstring(content)
+    return xml_tree
+
+
+def get_universe_content(server, community, context=None, cache=None):
+    """
+    Retrieve the raw document of OGame universe API, for callers parsing it themselves (see parse_pool.py).
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
+
+        cache (http_cache.HttpCache): Optional validators store used to send a conditional request.
+
+    Raises: None.
+
+    Returns if success:
+        bytes: The whole XML document.
+
+    Returns if the API did not change since the last committed cache entry:
+        object: NOT_MODIFIED
+
+    Returns if failure:
+        NoneType: None
+    """
+
+    context = context or ac.get_default()
+    api_url = f'{get_api_url(server, community, context)}/universe.xml'
+    return fetch_document(server, community, api_url, 'get_universe_content', context, cache)
 
 
 def get_player_name(xml_tree):
@@ -213,7 +563,8 @@ def get_player_home(xml_tree):
         NoneType: None
     """
 
-    player_home = xml_tree[1][0].get('coords')
+    planet = xml_tree.find('planets/planet')
+    player_home = planet.get('coords') if planet is not None else None
 
     if player_home is None:
         logging.warning('Calling get_player_home(): Attribute "coords" not found in XML tree')
@@ -228,9 +579,6 @@ def get_military_points(xml_tree):
     Args:
         xml_tree (xml.etree.ElementTree.Element): Whole XML document as a tree.
 
-    Raises:
-        ValueError: If float() or int() raise a ValueError because pts_str or pts_float have an unexpected value.
-
     Returns if success:
         int: The military points of the player of interest.
 
@@ -238,21 +586,15 @@ def get_military_points(xml_tree):
         NoneType: None
     """
 
-    pts_str = xml_tree[0][3].get('score')
+    position = xml_tree.find(f"positions/position[@type='{MILITARY_TYPE}']")
+    pts_str = position.get('score') if position is not None else None
 
     if pts_str is None:
         logging.warning('Calling get_military_points(): Attribute "score" not found in XML tree')
         return None
-    try:
-        pts_float = float(pts_str)
-    except ValueError as error:
-        logging.warning(f'Calling get_military_points(): {error}')
-        return None
-    try:
-        pts_int = int(pts_float)
-    except ValueError as error:
-        logging.warning(f'Calling get_military_points(): {error}')
-        return None
+    pts_int = pr.to_int(pts_str)
+    if pts_int is None:
+        logging.warning(f'Calling get_military_points(): Invalid score {pts_str!r}')
     return pts_int
 
 
@@ -263,9 +605,6 @@ def get_ship_count(xml_tree):
     Args:
         xml_tree (xml.etree.ElementTree.Element): Whole XML document as a tree.
 
-    Raises:
-        ValueError: If float() or int() raise a ValueError because pts_str or pts_float have an unexpected value.
-
     Returns if success:
         int: The ship count of the player of interest.
 
@@ -276,21 +615,15 @@ def get_ship_count(xml_tree):
         NoneType: None
     """
 
-    ships_str = xml_tree[0][3].get('ships')
+    position = xml_tree.find(f"positions/position[@type='{MILITARY_TYPE}']")
+    ships_str = position.get('ships') if position is not None else None
 
     if ships_str is None:
         logging.warning('Calling get_ship_count(): Attribute "ships" not found in XML tree. Setting ship count to 0')
         return int(0)
-    try:
-        ships_float = float(ships_str)
-    except ValueError as error:
-        logging.warning(f'Calling get_ship_count(): {error}')
-        return None
-    try:
-        ships_int = int(ships_float)
-    except ValueError as error:
-        logging.warning(f'Calling get_ship_count(): {error}')
-        return None
+    ships_int = pr.to_int(ships_str)
+    if ships_int is None:
+        logging.warning(f'Calling get_ship_count(): Invalid ship count {ships_str!r}')
     return ships_int
 
 
@@ -0,0 +1,321 @@
+# Load necessary modules
+import os
+import logging
+import threading
+
+# Directory of the bot scripts, relative paths of config.toml are resolved against it
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Configuration file used when none is given
+DEFAULT_CONFIG_PATH = os.path.join(SRC_DIR, '..', 'config.toml')
+
+# Base URL template of the OGame APIs, {server} and {community} are substituted
+DEFAULT_API_BASE_URL = 'https://s{server}-{community}.ogame.gameforge.com/api'
+
+# (section, key) pairs of config.toml holding paths
+PATH_KEYS = (
+    ('CHECK_NEWCOMERS', 'log_dir'),
+    ('CHECK_NEWCOMERS', 'data_dir'),
+    ('CHECK_NEWCOMERS', 'sqlite_path'),
+    ('METRICS', 'json_path'),
+    ('ARCHIVE', 'archive_dir'),
+)
+
+
+class AppContext:
+    """
+    Settings and shared resources of the bot, passed explicitly to the functions that need them.
+
+    Building a context has no side effect: no working directory change, no logging setup, no network.
+    The HTTP client and the retry policy (and with them the requests library) are only created on first use,
+    then shared by every call made with the context.
+
+    Args:
+        config (dict): The parsed configuration file, see load(). Missing settings take their default value.
+
+        base_dir (str): Directory relative paths of the configuration are resolved against (src/ by default,
+            where the scripts always ran from).
+
+        client (http_client.HttpClient): HTTP client to use instead of the one built from [HTTP_CLIENT].
+
+        retry (retry_policy.RetryPolicy): Retry policy to use instead of the one built from [RETRY].
+    """
+
+    def __init__(self, config=None, base_dir=SRC_DIR, client=None, retry=None):
+        self.config = resolve_paths(config or {}, base_dir)
+        settings = self.config.get('CHECK_NEWCOMERS', {})
+        self.server = settings.get('server')
+        self.community = settings.get('community')
+        self.data_dir = settings.get('data_dir')
+        self.log_dir = settings.get('log_dir')
+        self.log_lvl = settings.get('log_lvl', 'logging.INFO')
+        self.api_base_url = settings.get('api_base_url', DEFAULT_API_BASE_URL)
+        self.streaming_parse = settings.get('streaming_parse', False)
+        self.enrichment = settings.get('enrichment', 'player')
+        self.sqlite_path = settings.get('sqlite_path', '')
+        self.requests_per_second = settings.get('requests_per_second', 2.0)
+        self.max_in_flight = settings.get('max_in_flight', 4)
+        self._client = client
+        self._retry = retry
+        self._archive = None
+        self._archive_loaded = False
+        self._parse_pool = None
+        self._parse_pool_loaded = False
+        self._http_caches = {}
+        self._watchlists = {}
+        self._neighbourhoods = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """
+        Returns:
+            http_client.HttpClient: The shared HTTP client, built on first use.
+        """
+
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import http_client as hc
+                    self._client = hc.from_config(self.config)
+        return self._client
+
+    @property
+    def retry(self):
+        """
+        Returns:
+            retry_policy.RetryPolicy: The shared retry policy, built on first use.
+        """
+
+        if self._retry is None:
+            with self._lock:
+                if self._retry is None:
+                    import retry_policy as rp
+                    self._retry = rp.from_config(self.config)
+        return self._retry
+
+    @property
+    def archive(self):
+        """
+        Returns if [ARCHIVE] sets an archive_dir:
+            api_archive.ApiArchive: The shared raw responses archive, built on first use.
+
+        Returns if the archive is disabled:
+            NoneType: None
+        """
+
+        if not self._archive_loaded:
+            with self._lock:
+                if not self._archive_loaded:
+                    import api_archive as aa
+                    self._archive = aa.from_config(self.config)
+                    self._archive_loaded = True
+        return self._archive
+
+    @property
+    def parse_pool(self):
+        """
+        Returns if [PARSE_POOL] is enabled:
+            parse_pool.ParsePool: The shared parse pool, built on first use (its processes on first offloaded document).
+
+        Returns if parsing is not offloaded:
+            NoneType: None
+        """
+
+        if not self._parse_pool_loaded:
+            with self._lock:
+                if not self._parse_pool_loaded:
+                    import parse_pool as pp
+                    self._parse_pool = pp.from_config(self.config)
+                    self._parse_pool_loaded = True
+        return self._parse_pool
+
+    def http_cache(self, server, community):
+        """
+        Return the HTTP validators store of a server, loading it from the data directory on first use.
+
+        Args:
+            server (str): The OGame server number (e.g., '123', '260').
+
+            community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        Returns:
+            http_cache.HttpCache: The store, shared by every cycle run with this context.
+        """
+
+        import http_cache as hcache
+        with self._lock:
+            key = (server, community)
+            if key not in self._http_caches:
+                self._http_caches[key] = hcache.HttpCache(f'{self.data_dir}/{server}_{community}_http_cache.json')
+            return self._http_caches[key]
+
+    def watchlist(self, data_dir, server, community):
+        """
+        Return the newcomers watchlist of a server, loading it from its data directory on first use.
+
+        Args:
+            data_dir (str): The directory holding the state files of the server.
+
+            server (str): The OGame server number (e.g., '123', '260').
+
+            community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        Returns if [WATCHLIST] is enabled:
+            watchlist.Watchlist: The watchlist, shared by every cycle run with this context.
+
+        Returns if newcomers are not followed:
+            NoneType: None
+        """
+
+        import watchlist as wl
+        with self._lock:
+            key = (data_dir, server, community)
+            if key not in self._watchlists:
+                self._watchlists[key] = wl.from_config(self.config, f'{data_dir}/{server}_{community}_watchlist.json')
+            return self._watchlists[key]
+
+    def neighbourhood(self, data_dir, server, community):
+        """
+        Return the coordinate index of a server, loading it from its data directory on first use.
+
+        Args:
+            data_dir (str): The directory holding the state files of the server.
+
+            server (str): The OGame server number (e.g., '123', '260').
+
+            community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        Returns if [NEIGHBOURS] is enabled:
+            coordinate_index.Neighbourhood: The index, shared by every cycle run with this context.
+
+        Returns if neighbours are not reported:
+            NoneType: None
+        """
+
+        # Only loaded when enabled, it needs NumPy
+        if not self.config.get('NEIGHBOURS', {}).get('enabled', False):
+            return None
+        import coordinate_index as ci
+        with self._lock:
+            key = (data_dir, server, community)
+            if key not in self._neighbourhoods:
+                self._neighbourhoods[key] = ci.from_config(self.config, f'{data_dir}/{server}_{community}_neighbourhood.npz')
+            return self._neighbourhoods[key]
+
+    def close(self):
+        """
+        Close the pooled HTTP connections and stop the parse workers, if any were started.
+
+        Returns: None.
+        """
+
+        if self._client is not None:
+            self._client.close()
+        if self._parse_pool is not None:
+            self._parse_pool.close()
+
+
+def resolve_paths(config, base_dir=SRC_DIR):
+    """
+    Make the relative paths of a parsed config.toml absolute.
+
+    Args:
+        config (dict): The parsed configuration file, left untouched.
+
+        base_dir (str): Directory relative paths are resolved against.
+
+    Returns:
+        dict: A copy of config with absolute paths (empty paths stay empty, they disable a feature).
+    """
+
+    config = {section: dict(values) if isinstance(values, dict) else values for section, values in config.items()}
+    for section, key in PATH_KEYS:
+        value = config.get(section, {}).get(key)
+        if value:
+            config[section][key] = os.path.normpath(os.path.join(base_dir, value))
+    if isinstance(config.get('TARGETS'), list):
+        config['TARGETS'] = [dict(target) for target in config['TARGETS']]
+        for target in config['TARGETS']:
+            if target.get('data_dir'):
+                target['data_dir'] = os.path.normpath(os.path.join(base_dir, target['data_dir']))
+    return config
+
+
+def load(path=DEFAULT_CONFIG_PATH, base_dir=SRC_DIR):
+    """
+    Parse a configuration file into an application context.
+
+    Args:
+        path (str): The configuration file (config.toml next to src/ by default).
+
+        base_dir (str): Directory relative paths of the configuration are resolved against.
+
+    Raises:
+        OSError: If the file cannot be read.
+        tomllib.TOMLDecodeError: If the file is not valid TOML.
+
+    Returns:
+        AppContext: The context.
+    """
+
+    import tomllib
+    with open(path, 'rb') as config_file:
+        return AppContext(tomllib.load(config_file), base_dir)
+
+
+def setup_logging(context):
+    """
+    Send the logs of the process to {log_dir}/{server}_{community}_check_newcomers.log, as the bot always did.
+
+    Records go through a queue to a background writer, with the rotation, format and rate limiting of [LOGGING]
+    (see log_setup.py). Meant for the scripts entry points, libraries using the bot modules keep their own logging setup.
+
+    Args:
+        context (AppContext): The application context.
+
+    Returns:
+        logging.handlers.QueueListener: The started background writer.
+    """
+
+    import log_setup
+    log_lvl = getattr(logging, context.log_lvl.rsplit('.', 1)[-1])
+    log_path = f'{context.log_dir}/{context.server}_{context.community}_check_newcomers.log'
+    return log_setup.configure(context.config, log_path, log_lvl)
+
+
+_default_context = None
+_default_lock = threading.Lock()
+
+
+def get_default():
+    """
+    Return the context of the default configuration file, loading it on first use.
+
+    Used by the functions called without an explicit context.
+
+    Returns:
+        AppContext: The default context.
+    """
+
+    global _default_context
+    if _default_context is None:
+        with _default_lock:
+            if _default_context is None:
+                _default_context = load()
+    return _default_context
+
+
+def set_default(context):
+    """
+    Replace the context used by the functions called without an explicit one.
+
+    Args:
+        context (AppContext): The new default context.
+
+    Returns: None.
+    """
+
+    global _default_context
+    with _default_lock:
+        _default_context = context
@@ -0,0 +1,255 @@
+# Load necessary modules
+import os
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import app_context as ac
+import api_parsing as ap
+import player_index as pi
+import state_store as ss
+
+DEFAULT_WORKERS = 8
+
+
+def parse_target(value, webhook=''):
+    """
+    Parse a target given on the command line.
+
+    Args:
+        value (str): 'server:community' or 'server:community:webhook' (e.g., '123:fr').
+
+        webhook (str): Webhook used when value does not carry one.
+
+    Raises:
+        ValueError: If value has no community.
+
+    Returns:
+        dict: server, community and webhook keys, like a [[TARGETS]] table.
+    """
+
+    parts = value.split(':', 2)
+    if len(parts) < 2 or not parts[0] or not parts[1]:
+        raise ValueError(f'Invalid target {value!r}, expected server:community[:webhook]')
+    return {'server': parts[0], 'community': parts[1], 'webhook': parts[2] if len(parts) == 3 else webhook}
+
+
+def read_server_list(path, community=None, webhook=''):
+    """
+    Read the targets listed in a server list file.
+
+    Two formats are accepted: the JSON list of the OGame lobby (https://lobby.ogame.gameforge.com/api/servers),
+    whose entries carry 'number' and 'language', or a text file with one 'server community [webhook]' line per target
+    ('#' starts a comment).
+
+    Args:
+        path (str): The server list file.
+
+        community (str): Only keep the servers of this community, None for every community.
+
+        webhook (str): Webhook used for the targets that do not carry one.
+
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If a line or an entry is malformed.
+
+    Returns:
+        list: Target dicts in file order, without duplicates.
+    """
+
+    with open(path, 'r') as server_list_file:
+        content = server_list_file.read()
+
+    targets = []
+    if content.lstrip().startswith('['):
+        for server in json.loads(content):
+            targets.append({'server': str(server['number']), 'community': server['language'], 'webhook': webhook})
+    else:
+        for line in content.splitlines():
+            fields = line.split('#', 1)[0].split()
+            if not fields:
+                continue
+            if len(fields) == 1:
+                targets.append(parse_target(fields[0], webhook))
+            else:
+                targets.append({'server': fields[0], 'community': fields[1], 'webhook': fields[2] if len(fields) > 2 else webhook})
+
+    unique_targets = {}
+    for target in targets:
+        if community is None or target['community'] == community:
+            unique_targets.setdefault((target['server'], target['community']), target)
+    return list(unique_targets.values())
+
+
+def has_state(data_dir, server, community):
+    """
+    Tell whether a universe already has a players index (binary or legacy JSON).
+
+    Args:
+        data_dir (str): The data directory.
+
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+    Returns:
+        bool: True if the universe was already seeded.
+    """
+
+    return os.path.exists(pi.get_index_path(data_dir, server, community)) or os.path.exists(f'{data_dir}/{server}_{community}_players.json')
+
+
+def seed_target(target, data_dir, reseed=False, context=None):
+    """
+    Seed the players index and timestamp of a universe from its military highscore.
+
+    Args:
+        target (dict): server and community of the universe, and optionally its own data_dir.
+
+        data_dir (str): The data directory, used when the target does not set its own.
+
+        reseed (bool): Whether to overwrite an existing state, False skips seeded universes.
+
+        context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
+
+    Raises: None.
+
+    Returns:
+        str: 'seeded', 'skipped' or 'failed'.
+    """
+
+    server, community = target['server'], target['community']
+    # Same resolution as multi_bot.get_targets(), so the bot finds the state where it was seeded
+    data_dir = target.get('data_dir', data_dir)
+    if not reseed and has_state(data_dir, server, community):
+        return 'skipped'
+
+    stream = ap.get_highscore_stream(server, community, '1', '3', context=context)
+    if stream is None or stream is ap.NOT_MODIFIED:
+        return 'failed'
+    try:
+        player_ids = [player_id for player_id, _, _ in stream]
+    except Exception as exception:
+        logging.warning(f'{server}_{community}: Unable to read the highscore: {exception}')
+        return 'failed'
+    finally:
+        stream.close()
+
+    # Same files as a committed cycle: binary index with its timestamp, plus the timestamp mirror
+    os.makedirs(data_dir, exist_ok=True)
+    state = ss.StateStore(data_dir, server, community)
+    state.players = pi.PlayerIndex(player_ids)
+    state.commit(stream.timestamp)
+    logging.info(f'{server}_{community}: Seeded {len(player_ids)} players at {stream.timestamp}')
+    return 'seeded'
+
+
+def bootstrap_targets(targets, data_dir, workers=DEFAULT_WORKERS, reseed=False, context=None):
+    """
+    Seed several universes concurrently.
+
+    Each universe is a different host, so the downloads run side by side through the pooled client of the context.
+
+    Args:
+        targets (list): Target dicts (server, community, optionally data_dir).
+
+        data_dir (str): The data directory of the targets that do not set their own.
+
+        workers (int): Number of universes seeded at the same time.
+
+        reseed (bool): Whether to overwrite existing states.
+
+        context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
+
+    Returns:
+        list: (target, status) tuples in the order of targets, see seed_target().
+    """
+
+    def seed(target):
+        try:
+            return seed_target(target, data_dir, reseed, context)
+        except Exception as exception:
+            logging.warning(f'{target["server"]}_{target["community"]}: Seeding failed: {exception}')
+            return 'failed'
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return list(zip(targets, executor.map(seed, targets)))
+
+
+def update_config_targets(config_path, targets):
+    """
+    Merge targets into the [[TARGETS]] tables of config.toml in one write.
+
+    Targets already listed keep their settings, except an empty webhook which is replaced by the new one.
+
+    Args:
+        config_path (str): The configuration file.
+
+        targets (list): Target dicts (server, community, webhook).
+
+    Returns:
+        int: Number of targets added to the file.
+    """
+
+    # Only needed to write the configuration file
+    import toml
+
+    with open(config_path, 'r') as config_file:
+        config_data = toml.load(config_file)
+
+    listed = {(str(target['server']), target['community']): target for target in config_data.setdefault('TARGETS', [])}
+    added = 0
+    for target in targets:
+        key = (target['server'], target['community'])
+        if key in listed:
+            if not listed[key].get('webhook') and target.get('webhook'):
+                listed[key]['webhook'] = target['webhook']
+            continue
+        new_target = {'server': target['server'], 'community': target['community'], 'webhook': target.get('webhook', '')}
+        if 'data_dir' in target:
+            new_target['data_dir'] = target['data_dir']
+        config_data['TARGETS'].append(new_target)
+        listed[key] = new_target
+        added += 1
+
+    ss.atomic_write(config_path, toml.dumps(config_data).encode())
+    return added
+
+
+def bootstrap(targets, workers=DEFAULT_WORKERS, reseed=False, context=None, config_path=ac.DEFAULT_CONFIG_PATH):
+    """
+    Seed every target and list the seeded ones in config.toml.
+
+    Re-running it is safe: seeded universes are skipped (unless reseed), failed ones are tried again,
+    and targets already in config.toml are not duplicated. The checkout itself is left untouched.
+    Targets already listed with a data_dir are seeded there, where the bot will look for their state.
+
+    Args:
+        targets (list): Target dicts (server, community, webhook, optionally data_dir).
+
+        workers (int): Number of universes seeded at the same time.
+
+        reseed (bool): Whether to overwrite existing states.
+
+        context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
+
+        config_path (str): The configuration file to update.
+
+    Returns:
+        list: (target, status) tuples, see seed_target().
+    """
+
+    context = context or ac.get_default()
+    data_dirs = {
+        (str(target['server']), target['community']): target['data_dir']
+        for target in context.config.get('TARGETS', []) if 'data_dir' in target
+    }
+    for target in targets:
+        key = (target['server'], target['community'])
+        if 'data_dir' not in target and key in data_dirs:
+            target['data_dir'] = data_dirs[key]
+    results = bootstrap_targets(targets, context.data_dir, workers, reseed, context)
+    ready = [target for target, status in results if status != 'failed']
+    if ready:
+        added = update_config_targets(config_path, ready)
+        logging.info(f'Listed {added} new targets in {config_path}')
+    return results
@@ -0,0 +1,254 @@
+# Load necessary modules
+import logging
+import xml.etree.ElementTree as et
+import app_context as ac
+import api_parsing as ap
+import player_fetcher as pf
+import player_record as pr
+
+
+class BulkIndex:
+    """
+    In-memory indexes keyed by player ID, built from the bulk OGame APIs of a server.
+
+    Attributes:
+        names (dict): Player ID (str) -> name, from players.xml.
+
+        homes (dict): Player ID (str) -> coordinates of the oldest planet (lowest planet ID), from universe.xml.
+
+        military (dict): Player ID (str) -> (military points, ship count), from the military highscore.
+    """
+
+    def __init__(self):
+        self.names = {}
+        self.homes = {}
+        self.military = {}
+
+    def add_players(self, players_tree):
+        for player in players_tree:
+            player_id = player.attrib.get('id')
+            if player_id is not None:
+                self.names[player_id] = player.attrib.get('name')
+
+    def add_universe(self, universe_tree):
+        home_ids = {}
+        for planet in universe_tree:
+            player_id = planet.attrib.get('player')
+            coords = planet.attrib.get('coords')
+            if player_id is None or coords is None:
+                continue
+            planet_id = int(planet.attrib.get('id', 0))
+            # The home planet is the first one created, i.e. the one with the lowest ID
+            if player_id not in home_ids or planet_id < home_ids[player_id]:
+                home_ids[player_id] = planet_id
+                self.homes[player_id] = coords
+
+    def add_military_highscore(self, highscore_tree):
+        for player in highscore_tree:
+            player_id = player.attrib.get('id')
+            if player_id is None:
+                continue
+            self.military[player_id] = (
+                pr.to_int(player.attrib.get('score')),
+                pr.to_int(player.attrib.get('ships', 0)),
+            )
+
+    def update(self, other):
+        """
+        Merge the indexes of another BulkIndex (e.g., one built in a parse worker) into this one.
+
+        Args:
+            other (BulkIndex): The index to merge.
+
+        Returns: None.
+        """
+
+        self.names.update(other.names)
+        self.homes.update(other.homes)
+        self.military.update(other.military)
+
+    def resolve(self, player_id):
+        """
+        Resolve the record of a player from the indexes.
+
+        Args:
+            player_id (str): The ID of the player of interest.
+
+        Returns if the player is present in every index:
+            player_record.PlayerRecord: Partial record holding the name, home, military points and ship count.
+
+        Returns otherwise:
+            NoneType: None
+        """
+
+        player_id = str(player_id)
+        if player_id not in self.names or player_id not in self.homes or player_id not in self.military:
+            return None
+        military_points, ship_count = self.military[player_id]
+        return pr.PlayerRecord.partial(player_id, self.names[player_id], self.homes[player_id], military_points, ship_count)
+
+
+def build_index(server, community, highscore_tree=None, context=None, highscore_content=None):
+    """
+    Download the bulk OGame APIs of a server once and index them by player ID.
+
+    With a parse pool in the context, the documents are parsed side by side in its worker processes.
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        highscore_tree (xml.etree.ElementTree.Element): Military highscore already downloaded this cycle, if any.
+
+        context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
+
+        highscore_content (bytes): Military highscore already downloaded but not parsed this cycle, if any.
+
+    Returns:
+        BulkIndex: The indexes, left empty for the APIs that could not be fetched or parsed.
+    """
+
+    context = context or ac.get_default()
+    if context.parse_pool is not None:
+        return build_index_offloaded(server, community, highscore_tree, context, highscore_content)
+
+    index = BulkIndex()
+
+    # A malformed document leaves its index empty, the players it would have resolved are fetched one by one
+    try:
+        players_tree = ap.get_players_api(server, community, context)
+        if players_tree is not None:
+            index.add_players(players_tree)
+    except et.ParseError as exception:
+        logging.warning(f'Calling build_index(): players.xml: {exception}')
+
+    try:
+        universe_tree = ap.get_universe_api(server, community, context)
+        if universe_tree is not None:
+            index.add_universe(universe_tree)
+    except et.ParseError as exception:
+        logging.warning(f'Calling build_index(): universe.xml: {exception}')
+
+    try:
+        if highscore_tree is None and highscore_content is not None:
+            highscore_tree = et.fromstring(highscore_content)
+        if highscore_tree is None:
+            highscore_tree = ap.get_highscore_api(server, community, '1', '3', context=context)
+        if highscore_tree is not None:
+            index.add_military_highscore(highscore_tree)
+    except et.ParseError as exception:
+        logging.warning(f'Calling build_index(): highscore.xml: {exception}')
+
+    return index
+
+
+def build_index_offloaded(server, community, highscore_tree, context, highscore_content=None):
+    """
+    Build the indexes of build_index() in the parse pool of the context.
+
+    Each document is submitted as soon as it is downloaded, so it is parsed while the next one downloads.
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        highscore_tree (xml.etree.ElementTree.Element): Military highscore already parsed this cycle, if any.
+
+        context (app_context.AppContext): Settings, HTTP client and parse pool to use.
+
+        highscore_content (bytes): Military highscore already downloaded but not parsed this cycle, if any.
+
+    Returns:
+        BulkIndex: The indexes, left empty for the APIs that could not be fetched or parsed.
+    """
+
+    parse_pool = context.parse_pool
+    index = BulkIndex()
+    futures = []
+
+    players_content = ap.get_players_content(server, community, context)
+    if players_content is not None:
+        futures.append(parse_pool.submit(parse_bulk_index, players_content, 'players'))
+
+    universe_content = ap.get_universe_content(server, community, context)
+    if universe_content is not None:
+        futures.append(parse_pool.submit(parse_bulk_index, universe_content, 'universe'))
+
+    if highscore_tree is not None:
+        index.add_military_highscore(highscore_tree)
+    else:
+        if highscore_content is None:
+            highscore_content = ap.get_highscore_content(server, community, '1', '3', context=context)
+        if highscore_content is not None:
+            futures.append(parse_pool.submit(parse_bulk_index, highscore_content, 'military_highscore'))
+
+    for future in futures:
+        try:
+            index.update(future.result())
+        except Exception as exception:
+            logging.warning(f'Calling build_index_offloaded(): {exception}')
+    return index
+
+
+def parse_bulk_index(content, kind):
+    """
+    Index one bulk OGame API document by player ID, in a parse worker.
+
+    Args:
+        content (bytes): The raw document.
+
+        kind (str): 'players', 'universe' or 'military_highscore', the BulkIndex.add_* method to use.
+
+    Raises:
+        xml.etree.ElementTree.ParseError: If the document is malformed.
+
+    Returns:
+        BulkIndex: An index holding this document only, see BulkIndex.update().
+    """
+
+    index = BulkIndex()
+    getattr(index, f'add_{kind}')(et.fromstring(content))
+    return index
+
+
+def enrich_players(
+    server, community, player_ids, highscore_tree=None, requests_per_second=2.0, max_in_flight=4, context=None, highscore_content=None,
+):
+    """
+    Retrieve the records of several players from the bulk OGame APIs.
+
+    players.xml is only refreshed daily and universe.xml weekly, so the newest players are often missing from them.
+    Those players are fetched one by one from OGame player API instead.
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        player_ids (list): The IDs of the players of interest.
+
+        highscore_tree (xml.etree.ElementTree.Element): Military highscore already downloaded this cycle, if any.
+
+        requests_per_second (float): Sustained request rate allowed for the per-player fallback.
+
+        max_in_flight (int): Maximum number of concurrent requests for the per-player fallback.
+
+        context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
+
+        highscore_content (bytes): Military highscore already downloaded but not parsed this cycle, if any.
+
+    Returns:
+        list: (player_id, record) tuples in the order of player_ids, like player_fetcher.enrich_players().
+    """
+
+    index = build_index(server, community, highscore_tree, context, highscore_content)
+    resolved = {player_id: index.resolve(player_id) for player_id in player_ids}
+
+    missing = [player_id for player_id, record in resolved.items() if record is None]
+    logging.info(f'Bulk enrichment resolved {len(player_ids) - len(missing)}/{len(player_ids)} players locally')
+    if missing:
+        resolved.update(pf.enrich_players(server, community, missing, requests_per_second, max_in_flight, context))
+
+    return [(player_id, resolved[player_id]) for player_id in player_ids]
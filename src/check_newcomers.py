@@ -1,40 +1,62 @@
 # Load necessary modules
-import os
-import tomllib
 import logging
+import app_context as ac
+import api_archive as aa
 import api_parsing as ap
-import json
+import http_cache as hcache
+import log_setup
+import parse_pool as pp
+import player_fetcher as pf
+import bulk_enrichment as be
+import metrics
+import state_store as ss
 import datetime
-import time
+import xml.etree.ElementTree as et
 
-# Set the working directory to this script location
-os.chdir(f'{os.path.dirname(__file__)}')
 
-# Parse the configuration file
-with open('../config.toml', 'rb') as config_file:
-    config = tomllib.load(config_file)
+def main(context=None):
+    """
+    Retrieve a list of new players that arrived on the configured OGame server between API updates.
 
-# Extract configuration parameters: server of interest
-server = config.get('CHECK_NEWCOMERS', {}).get('server')
+    Args:
+        context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
 
-# Extract configuration parameters: community of interest
-community = config.get('CHECK_NEWCOMERS', {}).get('community')
+    Raises: None.
 
-# Extract configuration parameters: data directory
-data_dir = config.get('CHECK_NEWCOMERS', {}).get('data_dir')
+    Returns: See check_target().
+    """
 
+    context = context or ac.get_default()
+    http_cache = context.http_cache(context.server, context.community)
+    return check_target(context.server, context.community, context.data_dir, http_cache, context)
 
-def main():
+
+def check_target(server, community, data_dir, http_cache=None, context=None, state=None):
     """
-    Retrieve a list of new players that arrived on the OGame server of interest between API updates.
+    Retrieve a list of new players that arrived on an OGame server between API updates.
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
 
-    Args: None.
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        data_dir (str): The directory holding the state files of the server (e.g., '../data').
+
+        http_cache (http_cache.HttpCache): Validators store of the server, None disables conditional requests.
+
+        context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
+
+        state (state_store.StateStore): Loaded state kept in memory by a long-running caller, which checkpoints it.
+            None loads the state from disk and commits it (with the HTTP validators) at the end of the cycle.
 
     Raises: None.
 
-    Returns if new players arrived:
+    Returns if new players arrived or watched players changed significantly:
         str: Formated payload supposed to be passed onto a Discord server channel.
 
+    Returns if new players arrived and watched players changed significantly:
+        list: The newcomers payload then the watchlist digest, each one a separate Discord message.
+
     Returns if no new player arrived:
         bool: False
 
@@ -42,83 +64,436 @@ def main():
         str: Stating were the script failed.
     """
 
-    logging.info('Starting up !')
+    logging.info(f'Starting up {server}_{community} !')
+
+    if http_cache is None:
+        http_cache = hcache.HttpCache()
+    context = context or ac.get_default()
+
+    cycle = metrics.CycleTimer(f'{server}_{community}')
+    try:
+        with log_setup.target(f'{server}_{community}'):
+            return run_cycle(server, community, data_dir, http_cache, cycle, context, state)
+    finally:
+        cycle.finish()
+
+
+def run_cycle(server, community, data_dir, http_cache, cycle, context, state=None):
+    """
+    Run the stages of check_target(), timing each of them.
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        data_dir (str): The directory holding the state files of the server.
+
+        http_cache (http_cache.HttpCache): Validators store of the server.
 
-    highscore_api = ap.get_highscore_api(server, community, '1', '3')
+        cycle (metrics.CycleTimer): Collects the stage durations.
+
+        context (app_context.AppContext): Settings and HTTP client to use.
+
+        state (state_store.StateStore): In-memory state, see check_target().
+
+    Raises: None.
+
+    Returns: See check_target().
+    """
+
+    streaming_parse = context.streaming_parse
+    requests_per_second = context.requests_per_second
+    max_in_flight = context.max_in_flight
+
+    # Without streaming, the highscore can be kept raw and parsed in the parse pool
+    parse_pool = None if streaming_parse else context.parse_pool
+
+    with cycle.stage('fetch'):
+        if streaming_parse:
+            # The stream reads the body up to the root element, a broken download or document fails right here
+            import requests
+            try:
+                highscore_api = ap.get_highscore_stream(server, community, '1', '3', cache=http_cache, context=context)
+            except (et.ParseError, requests.exceptions.RequestException) as exception:
+                logging.warning(f'Calling get_highscore_stream(): {exception}')
+                # Forget the validators of the failed response, so the next cycle downloads the document again
+                http_cache.discard()
+                highscore_api = None
+        elif parse_pool is not None:
+            highscore_api = ap.get_highscore_content(server, community, '1', '3', cache=http_cache, context=context)
+        else:
+            highscore_api = ap.get_highscore_api(server, community, '1', '3', cache=http_cache, context=context)
+    if highscore_api is ap.NOT_MODIFIED:
+        logging.info('Highscore API not modified, exiting !\n')
+        return False
     if highscore_api is None:
         return '```\nError: highscore_api is None\n```'
 
+    # Load the known players and the last processed timestamp, resuming an interrupted cycle if any
+    durable = state is None
+    if durable:
+        with cycle.stage('load'):
+            state = ss.StateStore(data_dir, server, community).load()
+
     # Compare old and new timestamp to determine whether the API was updated or not
-    with open(f'{data_dir}/{server}_{community}_timestamp.json', 'r') as timestamp_file:
-        old_ts = int(json.load(timestamp_file))
-    new_ts = ap.get_timestamp(highscore_api)
+    old_ts = state.timestamp
+    if streaming_parse:
+        new_ts = highscore_api.timestamp
+    elif parse_pool is not None:
+        new_ts = aa.get_document_timestamp(highscore_api)
+    else:
+        new_ts = ap.get_timestamp(highscore_api)
     if old_ts == new_ts:
         logging.info(f'Timestamps match: {old_ts} == {new_ts}, API not updated, exiting !\n')
+        if streaming_parse:
+            # The rest of the document is not needed, stop downloading it
+            highscore_api.close()
+        http_cache.commit(persist=durable)
         return False
     logging.info(f'Timestamps differ: {old_ts} != {new_ts}, API updated')
 
     # Compare old and current player lists checking for new players
-    with open(f'{data_dir}/{server}_{community}_players.json', 'r') as players_file:
-        old_players = json.load(players_file)
-
-    current_players = ap.get_player_ids(highscore_api)
+    with cycle.stage('parse'):
+        if streaming_parse:
+            current_players = get_streamed_player_ids(highscore_api)
+        elif parse_pool is not None:
+            current_players = get_offloaded_player_ids(parse_pool, highscore_api)
+        else:
+            current_players = ap.get_player_ids(highscore_api)
     if current_players is None:
+        http_cache.discard()
         return '```\nError: current_players is None\n```'
 
-    new_players = [x for x in current_players if x not in old_players]
+    with cycle.stage('diff'):
+        new_players, _ = state.players.diff(current_players)
     if len(new_players) == 0:
-        logging.info(f'No new players detected, updating {data_dir}/{server}_{community}_timestamp.json and exiting !\n')
-        with open(f'{data_dir}/{server}_{community}_timestamp.json', 'w') as timestamp_file:
-            json.dump(new_ts, timestamp_file)
-        return False
+        logging.info('No new players detected, exiting !\n')
+        with cycle.stage('watchlist'):
+            digest = follow_newcomers(server, community, data_dir, new_ts, (), context)
+        with cycle.stage('commit'):
+            record_history(server, community, new_ts, current_players, sqlite_path=context.sqlite_path)
+            commit_state(state, new_ts, http_cache, durable)
+        return digest or False
 
     logging.info(f'New players detected: {new_players}')
+    metrics.registry.inc('newcomers_found_total', len(new_players), target=f'{server}_{community}')
+
+    # Fetch new players data, results come back in the order of new_players
+    with cycle.stage('enrichment'):
+        if context.enrichment == 'bulk':
+            logging.info(f'Enriching {len(new_players)} players from bulk APIs')
+            highscore_tree = None if streaming_parse or parse_pool is not None else highscore_api
+            highscore_content = highscore_api if parse_pool is not None else None
+            enriched_players = be.enrich_players(
+                server, community, new_players, highscore_tree, requests_per_second, max_in_flight, context, highscore_content,
+            )
+        else:
+            logging.info(f'Fetching {len(new_players)} players ({requests_per_second} req/s, {max_in_flight} in flight)')
+            enriched_players = pf.enrich_players(server, community, new_players, requests_per_second, max_in_flight, context)
+
+    # Build the payload, then journal the processed players (the index itself is only rewritten once at the end of the cycle)
+    with cycle.stage('neighbours'):
+        neighbours = find_neighbours(server, community, data_dir, http_cache, enriched_players, context)
+    with cycle.stage('payload'):
+        payload = build_payload(new_ts, enriched_players, neighbours)
+    with cycle.stage('watchlist'):
+        digest = follow_newcomers(server, community, data_dir, new_ts, enriched_players, context)
+    if digest:
+        # The digest is its own code block, it is sent as its own message
+        payload = [payload, digest]
+    with cycle.stage('commit'):
+        processed_players = [player_id for player_id, player_record in enriched_players if player_record is not None]
+        for player_id in processed_players:
+            # Failed players are not journaled, so they show up again as newcomers at the next API update
+            state.record(player_id)
+        logging.info(f'Added {len(processed_players)} entries to {state.journal_path}')
+
+        # Record the update in the history database, then commit the players index and timestamp together
+        record_history(server, community, new_ts, current_players, enriched_players, context.sqlite_path)
+        commit_state(state, new_ts, http_cache, durable)
+
+    logging.info('Done !\n')
+
+    return payload
+
+
+def commit_state(state, timestamp, http_cache, durable):
+    """
+    Move the state of a server to a processed API update.
+
+    Args:
+        state (state_store.StateStore): The state of the server.
+
+        timestamp (int): Epoch unix timestamp of the processed API update.
+
+        http_cache (http_cache.HttpCache): Validators store of the server.
+
+        durable (bool): Whether to write the index, timestamp and validators now,
+            False leaves them in memory until the caller checkpoints them.
+
+    Returns: None.
+    """
+
+    if durable:
+        logging.info(f'Updating {state.index_path} and {state.timestamp_path}')
+        state.commit(timestamp)
+    else:
+        state.advance(timestamp)
+    http_cache.commit(persist=durable)
+
+
+def build_payload(timestamp, enriched_players, neighbours=None):
+    """
+    Format the newcomers of an API update for a Discord server channel.
+
+    Args:
+        timestamp (int): Epoch unix timestamp of the API update.
+
+        enriched_players (list): (player_id, record) tuples as returned by player_fetcher.enrich_players().
+
+        neighbours (dict): Player ID -> coordinate_index.Neighbour tuples living near them, see find_neighbours().
+
+    Raises: None.
+
+    Returns:
+        str: Formated payload, one line per newcomer.
+    """
 
     # Set up payload string
-    update_datetime = datetime.datetime.fromtimestamp(new_ts)
+    update_datetime = datetime.datetime.fromtimestamp(timestamp)
     payload = f'```\n{update_datetime}\n'
 
-    # Loop through new players fetching data
-    for player_id in new_players:
+    # Loop through fetched players
+    for player_id, player_record in enriched_players:
         logging.info(f'Processing player {player_id}')
-        player_api = ap.get_player_api(server, community, player_id)
-        if player_api:
-            player_name = ap.get_player_name(player_api)
-            player_home = ap.get_player_home(player_api)
-            player_military_points = ap.get_military_points(player_api)
-            player_ship_count = ap.get_ship_count(player_api)
-        else:
-            logging.critical('API was not fetched, exiting !\n')
-            return False
-
-        # Format military points and ship count
-        military_points_str = (f'{player_military_points:,}').replace(',', '.')
-        military_ships_str = (f'{player_ship_count:,}').replace(',', '.')
+        if player_record is None:
+            logging.warning(f'API was not fetched for player {player_id}, reporting it as failed')
+            payload += f'\n? ({player_id}) Unable to fetch player data\n'
+            continue
+        # Format military points and ship count, a score missing from the API shows up as '?'
+        military_points_str = format_number(player_record.military_points)
+        military_ships_str = format_number(player_record.ship_count)
 
         # Append new data to payload string
-        payload += f'\n{player_name} ({player_id}, {player_home}) {military_points_str} ({military_ships_str})\n'
-
-        # Update players.json with processed player
-        logging.info(f'Adding entry to {data_dir}/{server}_{community}_players.json')
-        old_players.append(f'{player_id}')
-        with open(f'{data_dir}/{server}_{community}_players.json', 'w') as players_file:
-            json.dump(old_players, players_file)
-
-        # Sleep 500 ms to avoid the API server blocking the requests
-        time.sleep(0.5)
+        payload += f'\n{player_record.name} ({player_id}, {player_record.home}) {military_points_str} ({military_ships_str})\n'
+        if neighbours and neighbours.get(player_id):
+            payload += 'Near: ' + ', '.join(
+                f'{neighbour.name or neighbour.player_id} ({neighbour.coords}) {format_number(neighbour.score)}'
+                for neighbour in neighbours[player_id]
+            ) + '\n'
 
     # Finalize the payload string
     payload += '```'
 
-    # Update timestamps.json
-    logging.info(f'Updating {data_dir}/{server}_{community}_timestamp.json')
-    with open(f'{data_dir}/{server}_{community}_timestamp.json', 'w') as timestamp_file:
-        json.dump(new_ts, timestamp_file)
+    return payload
 
-    logging.info('Done !\n')
 
-    return payload
+def find_neighbours(server, community, data_dir, http_cache, enriched_players, context):
+    """
+    List the players living near each newcomer home, if neighbours are enabled.
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        data_dir (str): The directory holding the state files of the server.
+
+        http_cache (http_cache.HttpCache): Validators store of the server.
+
+        enriched_players (list): (player_id, record) tuples of the newcomers of the update.
+
+        context (app_context.AppContext): Settings and HTTP client to use.
+
+    Raises: None.
+
+    Returns:
+        dict: Player ID -> list of coordinate_index.Neighbour tuples, empty if neighbours are disabled.
+    """
+
+    homes = [(player_id, player_record.home) for player_id, player_record in enriched_players if player_record is not None and player_record.home]
+    if not homes:
+        return {}
+    neighbourhood = context.neighbourhood(data_dir, server, community)
+    if neighbourhood is None:
+        return {}
+    neighbourhood.refresh(server, community, http_cache, context)
+    try:
+        neighbourhood.save()
+    except OSError as error:
+        logging.warning(f'Calling find_neighbours(): Unable to save the neighbourhood: {error}')
+    return {player_id: neighbourhood.find(home, exclude=player_id) for player_id, home in homes}
+
+
+def follow_newcomers(server, community, data_dir, timestamp, enriched_players, context):
+    """
+    Add the reported newcomers to the watchlist of the server and refresh its due players, if the watchlist is enabled.
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        data_dir (str): The directory holding the state files of the server.
+
+        timestamp (int): Epoch unix timestamp of the API update, used as the watchlist clock.
+
+        enriched_players (list): (player_id, record) tuples of the newcomers of the update.
+
+        context (app_context.AppContext): Settings and HTTP client to use.
+
+    Raises: None.
+
+    Returns if watched players changed significantly:
+        str: Formated digest, see build_digest().
+
+    Returns otherwise:
+        str: Empty string.
+    """
+
+    watchlist = context.watchlist(data_dir, server, community)
+    if watchlist is None:
+        return ''
+    for _, player_record in enriched_players:
+        if player_record is not None:
+            watchlist.add(player_record, timestamp)
+    changes = watchlist.refresh(server, community, timestamp, context.requests_per_second, context.max_in_flight, context)
+    try:
+        watchlist.save()
+    except OSError as error:
+        logging.warning(f'Calling follow_newcomers(): Unable to save the watchlist: {error}')
+    return build_digest(changes) if changes else ''
+
+
+def build_digest(changes):
+    """
+    Format the significant changes of watched players for a Discord server channel.
+
+    Args:
+        changes (list): watchlist.Change tuples.
+
+    Raises: None.
+
+    Returns:
+        str: Formated digest, one line per player.
+    """
+
+    digest = f'```\nWatched newcomers ({len(changes)} changed)\n'
+    for change in changes:
+        # Day 1 is the first day after the player arrived
+        day = int(change.age // 86400) + 1
+        digest += (
+            f'\n{change.name} ({change.player_id}, {change.home}) day {day}: '
+            f'{format_number(change.points_before)} -> {format_number(change.points_after)} '
+            f'({format_number(change.ships_before)} -> {format_number(change.ships_after)})\n'
+        )
+    digest += '```'
+    return digest
+
+
+def format_number(value):
+    """
+    Format an integer with dots as thousands separators (e.g., 1234567 -> '1.234.567').
+
+    Args:
+        value (int): The number, None if unknown.
+
+    Returns:
+        str: The formatted number, '?' if unknown.
+    """
+
+    if value is None:
+        return '?'
+    return (f'{value:,}').replace(',', '.')
+
+
+def record_history(server, community, timestamp, current_players, enriched_players=(), sqlite_path=''):
+    """
+    Record an API update in the SQLite history database, if one is configured.
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        timestamp (int): Epoch unix timestamp of the API update.
+
+        current_players (list): Every player ID present in the update.
+
+        enriched_players (list): (player_id, record) tuples of the newcomers.
+
+        sqlite_path (str): The database file, empty to disable the history.
+
+    Raises: None. A database that cannot be written is logged, the cycle goes on without history.
+
+    Returns: None.
+    """
+
+    if not sqlite_path:
+        return
+    # Only loaded when the history is enabled
+    import sqlite_store as sq
+    try:
+        with sq.SqliteStore(sqlite_path) as store:
+            store.record_cycle(server, community, timestamp, current_players, enriched_players)
+    except sq.sqlite3.Error as error:
+        logging.warning(f'Calling record_history(): {error}')
+
+
+def get_streamed_player_ids(highscore_stream):
+    """
+    Retrieve a list of all player IDs from a streamed OGame highscore API document.
+
+    Args:
+        highscore_stream (highscore_stream.HighscoreStream): The stream returned by get_highscore_stream().
+
+    Raises:
+        requests.exceptions.RequestException: If the download fails mid-stream.
+        xml.etree.ElementTree.ParseError: If the document is malformed.
+
+    Returns if success:
+        list: All fetched player IDs (as str, like get_player_ids()).
+
+    Returns if failure:
+        NoneType: None
+    """
+
+    try:
+        return [str(player_id) for player_id, _, _ in highscore_stream]
+    except Exception as exception:
+        logging.warning(f'Calling get_streamed_player_ids(): {exception}')
+        return None
+
+
+def get_offloaded_player_ids(parse_pool, content):
+    """
+    Retrieve a list of all player IDs from a raw OGame highscore API document through the parse pool.
+
+    Args:
+        parse_pool (parse_pool.ParsePool): The pool of the context.
+
+        content (bytes): The document returned by get_highscore_content().
+
+    Raises: None.
+
+    Returns if success:
+        array.array: All fetched player IDs (as int).
+
+    Returns if failure:
+        NoneType: None
+    """
+
+    try:
+        _, player_ids = parse_pool.run(pp.parse_highscore, content)
+    except Exception as exception:
+        logging.warning(f'Calling get_offloaded_player_ids(): {exception}')
+        return None
+    return player_ids
 
 
 if __name__ == '__main__':
-    main()
+    context = ac.load()
+    ac.setup_logging(context)
+    metrics.configure(context.config)
+    main(context)
@@ -0,0 +1,471 @@
+# Load necessary modules
+import io
+import os
+import logging
+from collections import namedtuple
+import xml.etree.ElementTree as et
+import numpy as np
+import app_context as ac
+import api_archive as aa
+import api_parsing as ap
+import metrics
+import state_store as ss
+
+# Default settings, overridable from the [NEIGHBOURS] section of config.toml
+DEFAULT_COUNT = 3
+DEFAULT_RADIUS = 10
+
+# Coordinates 'galaxy:system:position' are encoded as galaxy * GALAXY_FACTOR + system * SYSTEM_FACTOR + position,
+# so sorted keys are ordered by galaxy, then system, then position (systems go up to 499, positions up to 17)
+GALAXY_FACTOR = 100000
+SYSTEM_FACTOR = 100
+
+# Marks an unknown timestamp in the .npz file
+MISSING = -1
+
+# A player living near a newcomer, systems being the distance between their closest planet and the newcomer home
+Neighbour = namedtuple('Neighbour', ('player_id', 'name', 'coords', 'score', 'systems'))
+
+
+class CoordinateIndex:
+    """
+    Owned planets of a universe as sorted integer coordinates.
+
+    Planets of a range of systems are contiguous in keys, so they are found with two binary searches
+    instead of a scan of the whole universe.
+
+    Attributes:
+        timestamp (int): API timestamp of the universe.xml the index was built from, None if empty.
+
+        keys (numpy.ndarray): Encoded coordinates of every owned planet, sorted (int64, shape (n,)).
+
+        player_ids (numpy.ndarray): Owner of each planet, aligned on keys (int64, shape (n,)).
+    """
+
+    def __init__(self, timestamp=None, keys=None, player_ids=None):
+        self.timestamp = timestamp
+        self.keys = keys if keys is not None else np.empty(0, dtype=np.int64)
+        self.player_ids = player_ids if player_ids is not None else np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_entries(cls, timestamp, entries):
+        """
+        Build an index from parsed planets.
+
+        Args:
+            timestamp (int): API timestamp of the universe.
+
+            entries (list): (key, player_id) tuples, see encode_coords().
+
+        Returns:
+            CoordinateIndex: The sorted index.
+        """
+
+        columns = np.array(entries, dtype=np.int64).reshape(-1, 2)
+        order = np.argsort(columns[:, 0], kind='stable')
+        return cls(timestamp, columns[order, 0], columns[order, 1])
+
+    def in_systems(self, galaxy, first_system, last_system):
+        """
+        Retrieve the planets of a range of systems of a galaxy.
+
+        Args:
+            galaxy (int): The galaxy.
+
+            first_system (int): First system of the range.
+
+            last_system (int): Last system of the range (included).
+
+        Returns:
+            tuple: (keys, player_ids) views of the planets in the range, sorted by coordinates.
+        """
+
+        start, stop = np.searchsorted(self.keys, [encode(galaxy, max(first_system, 0), 0), encode(galaxy, last_system + 1, 0)])
+        return self.keys[start:stop], self.player_ids[start:stop]
+
+    def nearest(self, coords, count=DEFAULT_COUNT, radius=DEFAULT_RADIUS, exclude=None):
+        """
+        Find the players living closest to some coordinates, within radius systems of the same galaxy.
+
+        Args:
+            coords (str): The coordinates of interest (e.g. '3:420:12').
+
+            count (int): Maximum number of players returned.
+
+            radius (int): Systems searched on each side of the coordinates.
+
+            exclude (str | int): A player ID left out (e.g., the newcomer living there).
+
+        Returns:
+            list: (player_id, key, systems) tuples, the closest first (by system, then position distance, then ID),
+                one per player (their closest planet). Empty if coords are malformed.
+        """
+
+        key = encode_coords(coords)
+        if key is None or count <= 0:
+            return []
+        galaxy, system, position = split_key(key)
+        keys, player_ids = self.in_systems(galaxy, system - radius, system + radius)
+        if exclude is not None:
+            kept = player_ids != int(exclude)
+            keys, player_ids = keys[kept], player_ids[kept]
+        if len(keys) == 0:
+            return []
+
+        systems = np.abs(keys // SYSTEM_FACTOR % (GALAXY_FACTOR // SYSTEM_FACTOR) - system)
+        positions = np.abs(keys % SYSTEM_FACTOR - position)
+        order = np.lexsort((player_ids, positions, systems))
+        # np.unique returns the first occurrence of each player in distance order, i.e. their closest planet
+        _, first = np.unique(player_ids[order], return_index=True)
+        closest = order[np.sort(first)[:count]]
+        return [(int(player_ids[row]), int(keys[row]), int(systems[row])) for row in closest]
+
+
+class PlayerTable:
+    """
+    Values of a bulk OGame API document (names, scores) as arrays sorted by player ID.
+
+    Attributes:
+        timestamp (int): API timestamp of the document the table was built from, None if empty.
+
+        ids (numpy.ndarray): Sorted player IDs (int64, shape (n,)).
+
+        values (numpy.ndarray): Value of each player, aligned on ids.
+    """
+
+    def __init__(self, timestamp=None, ids=None, values=None):
+        self.timestamp = timestamp
+        self.ids = ids if ids is not None else np.empty(0, dtype=np.int64)
+        self.values = values if values is not None else np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_entries(cls, timestamp, ids, values):
+        """
+        Build a table from parsed entries.
+
+        Args:
+            timestamp (int): API timestamp of the document.
+
+            ids (list): Player IDs (int).
+
+            values (list): The value of each player (str or int), aligned on ids.
+
+        Returns:
+            PlayerTable: The sorted table.
+        """
+
+        ids = np.array(ids, dtype=np.int64)
+        order = np.argsort(ids, kind='stable')
+        values = np.array(values) if values else np.empty(0, dtype=np.int64)
+        return cls(timestamp, ids[order], values[order])
+
+    def get(self, player_ids):
+        """
+        Look several players up.
+
+        Args:
+            player_ids (list): Player IDs (int).
+
+        Returns:
+            list: The value of each player (as a Python str or int), None for players missing from the table.
+        """
+
+        if len(self.ids) == 0:
+            return [None] * len(player_ids)
+        wanted = np.array(player_ids, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(self.ids, wanted), len(self.ids) - 1)
+        found = self.ids[rows] == wanted
+        return [self.values[row].item() if present else None for row, present in zip(rows, found)]
+
+
+class Neighbourhood:
+    """
+    Coordinate index of a universe, with the names and scores of its players, kept up to date across cycles.
+
+    Each refresh sends conditional requests for universe.xml (updated weekly), players.xml (daily) and the general
+    highscore (hourly). A table is only parsed again when its document changed and carries a new API timestamp,
+    and the tables are persisted to a .npz file so a restarted bot does not download them again.
+
+    Args:
+        path (str): The .npz file the tables are persisted to, None keeps them in memory only.
+
+        count (int): Neighbours listed per newcomer.
+
+        radius (int): Systems searched on each side of a newcomer home.
+    """
+
+    def __init__(self, path=None, count=DEFAULT_COUNT, radius=DEFAULT_RADIUS):
+        self.path = path
+        self.count = count
+        self.radius = radius
+        self.planets = CoordinateIndex()
+        self.names = PlayerTable()
+        self.scores = PlayerTable()
+        self.dirty = False
+        if path is not None and os.path.exists(path):
+            try:
+                self._load(path)
+            except (OSError, ValueError, KeyError) as error:
+                logging.warning(f'Ignoring unreadable neighbourhood {path}: {error}')
+
+    def refresh(self, server, community, http_cache=None, context=None):
+        """
+        Rebuild the tables whose OGame API document changed since they were built.
+
+        Args:
+            server (str): The OGame server number (e.g., '123', '260').
+
+            community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+            http_cache (http_cache.HttpCache): Validators store of the server, None downloads every document.
+
+            context (app_context.AppContext): Settings, HTTP client and parse pool to use, the default context if None.
+
+        Returns: None.
+        """
+
+        context = context or ac.get_default()
+        self.planets = self._rebuild(
+            self.planets, lambda cache: ap.get_universe_content(server, community, context, cache), parse_universe, http_cache, context,
+        )
+        self.names = self._rebuild(
+            self.names, lambda cache: ap.get_players_content(server, community, context, cache), parse_player_names, http_cache, context,
+        )
+        self.scores = self._rebuild(
+            self.scores, lambda cache: ap.get_highscore_content(server, community, '1', '0', cache, context), parse_scores, http_cache, context,
+        )
+
+    def find(self, coords, exclude=None):
+        """
+        List the players living closest to some coordinates, see CoordinateIndex.nearest().
+
+        Args:
+            coords (str): The coordinates of interest (e.g. '3:420:12').
+
+            exclude (str | int): A player ID left out (e.g., the newcomer living there).
+
+        Returns:
+            list: Neighbour tuples, the closest first, name and score being None for players missing from
+                players.xml or the highscore.
+        """
+
+        with metrics.registry.timer('neighbour_lookup_seconds'):
+            nearest = self.planets.nearest(coords, self.count, self.radius, exclude)
+            player_ids = [player_id for player_id, _, _ in nearest]
+            names = self.names.get(player_ids)
+            scores = self.scores.get(player_ids)
+        return [
+            Neighbour(player_id, name, decode_key(key), score, systems)
+            for (player_id, key, systems), name, score in zip(nearest, names, scores)
+        ]
+
+    def save(self):
+        """
+        Write the tables to their file, if any of them was rebuilt since the last write.
+
+        Returns: None.
+        """
+
+        if self.path is None or not self.dirty:
+            return
+        npz_file = io.BytesIO()
+        np.savez(
+            npz_file,
+            universe_timestamp=_to_stored(self.planets.timestamp), keys=self.planets.keys, planet_players=self.planets.player_ids,
+            players_timestamp=_to_stored(self.names.timestamp), name_ids=self.names.ids, names=self.names.values,
+            highscore_timestamp=_to_stored(self.scores.timestamp), score_ids=self.scores.ids, scores=self.scores.values,
+        )
+        ss.atomic_write(self.path, npz_file.getvalue())
+        self.dirty = False
+
+    def _load(self, path):
+        with np.load(path) as data:
+            self.planets = CoordinateIndex(_from_stored(data['universe_timestamp']), data['keys'], data['planet_players'])
+            self.names = PlayerTable(_from_stored(data['players_timestamp']), data['name_ids'], data['names'])
+            self.scores = PlayerTable(_from_stored(data['highscore_timestamp']), data['score_ids'], data['scores'])
+
+    def _rebuild(self, table, fetch, parse, http_cache, context):
+        # Validators of a document whose table is missing (e.g., a deleted .npz file) would only get a 304
+        content = fetch(http_cache if table.timestamp is not None else None)
+        if content is None or content is ap.NOT_MODIFIED:
+            return table
+        timestamp = aa.get_document_timestamp(content)
+        if timestamp is not None and timestamp == table.timestamp:
+            return table
+        parse_pool = context.parse_pool
+        try:
+            with metrics.registry.timer('neighbourhood_rebuild_seconds', table=parse.__name__):
+                rebuilt = parse_pool.run(parse, content) if parse_pool is not None else parse(content)
+        except Exception as exception:
+            logging.warning(f'Calling Neighbourhood.refresh(): {parse.__name__}: {exception}')
+            return table
+        logging.info(f'Rebuilt {parse.__name__} table: {len(rebuilt)} entries at {rebuilt.timestamp}')
+        self.dirty = True
+        return rebuilt
+
+
+def encode(galaxy, system, position):
+    return galaxy * GALAXY_FACTOR + system * SYSTEM_FACTOR + position
+
+
+def split_key(key):
+    return key // GALAXY_FACTOR, key // SYSTEM_FACTOR % (GALAXY_FACTOR // SYSTEM_FACTOR), key % SYSTEM_FACTOR
+
+
+def encode_coords(coords):
+    """
+    Encode coordinates as a sortable integer.
+
+    Args:
+        coords (str): The coordinates (e.g. '3:420:12').
+
+    Returns if success:
+        int: The key (e.g. 342012).
+
+    Returns if failure:
+        NoneType: None
+    """
+
+    try:
+        galaxy, system, position = (int(part) for part in coords.split(':'))
+    except (AttributeError, ValueError):
+        return None
+    if galaxy < 0 or not 0 <= system < GALAXY_FACTOR // SYSTEM_FACTOR or not 0 <= position < SYSTEM_FACTOR:
+        return None
+    return encode(galaxy, system, position)
+
+
+def decode_key(key):
+    """
+    Decode a key built by encode_coords().
+
+    Args:
+        key (int): The key (e.g. 342012).
+
+    Returns:
+        str: The coordinates (e.g. '3:420:12').
+    """
+
+    return ':'.join(str(part) for part in split_key(key))
+
+
+def parse_universe(content):
+    """
+    Parse an OGame universe API document into a CoordinateIndex (moons are left out).
+
+    Args:
+        content (bytes): The raw document.
+
+    Raises:
+        xml.etree.ElementTree.ParseError: If the document is malformed.
+
+    Returns:
+        CoordinateIndex: The index of every owned planet.
+    """
+
+    xml_tree = et.fromstring(content)
+    entries = []
+    for planet in xml_tree:
+        player_id = planet.attrib.get('player')
+        key = encode_coords(planet.attrib.get('coords'))
+        if player_id is not None and key is not None:
+            entries.append((key, int(player_id)))
+    return CoordinateIndex.from_entries(_get_timestamp(xml_tree), entries)
+
+
+def parse_player_names(content):
+    """
+    Parse an OGame players API document into a PlayerTable of names.
+
+    Args:
+        content (bytes): The raw document.
+
+    Raises:
+        xml.etree.ElementTree.ParseError: If the document is malformed.
+
+    Returns:
+        PlayerTable: The name of every player.
+    """
+
+    xml_tree = et.fromstring(content)
+    ids, names = [], []
+    for player in xml_tree:
+        player_id, name = player.attrib.get('id'), player.attrib.get('name')
+        if player_id is not None and name is not None:
+            ids.append(int(player_id))
+            names.append(name)
+    return PlayerTable.from_entries(_get_timestamp(xml_tree), ids, names)
+
+
+def parse_scores(content):
+    """
+    Parse an OGame highscore API document into a PlayerTable of scores.
+
+    Args:
+        content (bytes): The raw document.
+
+    Raises:
+        xml.etree.ElementTree.ParseError: If the document is malformed.
+
+    Returns:
+        PlayerTable: The score of every ranked player.
+    """
+
+    xml_tree = et.fromstring(content)
+    ids, scores = [], []
+    for player in xml_tree:
+        player_id, score = player.attrib.get('id'), player.attrib.get('score')
+        if player_id is None or score is None:
+            continue
+        try:
+            scores.append(int(float(score)))
+        except ValueError:
+            continue
+        ids.append(int(player_id))
+    return PlayerTable.from_entries(_get_timestamp(xml_tree), ids, scores)
+
+
+def _get_timestamp(xml_tree):
+    timestamp = xml_tree.attrib.get('timestamp')
+    return int(timestamp) if timestamp is not None else None
+
+
+def _to_stored(timestamp):
+    return np.int64(MISSING if timestamp is None else timestamp)
+
+
+def _from_stored(value):
+    return None if int(value) == MISSING else int(value)
+
+
+def from_config(config, path):
+    """
+    Build a Neighbourhood from a parsed config.toml.
+
+    Args:
+        config (dict): The parsed configuration file.
+
+        path (str): The .npz file the tables are persisted to.
+
+    Returns if enabled in [NEIGHBOURS]:
+        Neighbourhood: A neighbourhood using the [NEIGHBOURS] settings, defaults for missing keys.
+
+    Returns if neighbours are not reported:
+        NoneType: None
+    """
+
+    # Extract configuration parameters: switch, neighbours per newcomer and search radius (in systems)
+    neighbours_config = config.get('NEIGHBOURS', {})
+    if not neighbours_config.get('enabled', False):
+        return None
+    return Neighbourhood(
+        path,
+        count=neighbours_config.get('count', DEFAULT_COUNT),
+        radius=neighbours_config.get('radius', DEFAULT_RADIUS),
+    )
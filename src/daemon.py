@@ -0,0 +1,117 @@
+# Load necessary modules
+import time
+import signal
+import logging
+import threading
+import state_store as ss
+
+# Default settings, overridable from the [DAEMON] section of config.toml
+DEFAULT_CHECKPOINT_INTERVAL = 300
+DEFAULT_DRAIN_TIMEOUT = 30
+
+
+class TargetState:
+    """
+    State of one target kept in memory for the life of a long-running bot.
+
+    The known players index and the last timestamp are loaded once (warm start from the latest checkpoint plus
+    the journal), then every cycle works on them in memory. Newcomers are still journaled as they are processed,
+    but the index, the timestamp mirror, the HTTP validators and the scheduler stats are only written by checkpoint(),
+    at most once per checkpoint_interval and on shutdown.
+
+    Args:
+        data_dir (str): The directory holding the state files of the server.
+
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        http_cache (http_cache.HttpCache): Validators store of the server.
+
+        scheduler (update_scheduler.UpdateScheduler): Scheduler whose stats are saved with the checkpoints, if any.
+
+        checkpoint_interval (float): Minimum seconds between two checkpoints, 0 to write after every cycle.
+
+    Raises:
+        FileNotFoundError: If the state files of the server do not exist (see setup.py).
+    """
+
+    def __init__(self, data_dir, server, community, http_cache, scheduler=None, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL):
+        self.name = f'{server}_{community}'
+        self.http_cache = http_cache
+        self.scheduler = scheduler
+        self.checkpoint_interval = checkpoint_interval
+        self.store = ss.StateStore(data_dir, server, community).load()
+        self.last_checkpoint = time.monotonic()
+        logging.info(f'{self.name}: Warm start with {len(self.store.players)} known players at {self.store.timestamp}')
+
+    @property
+    def timestamp(self):
+        return self.store.timestamp
+
+    def checkpoint(self, force=False):
+        """
+        Write the in-memory state to disk if the checkpoint interval elapsed.
+
+        Args:
+            force (bool): Write now regardless of the interval (used on shutdown).
+
+        Returns:
+            bool: True if a checkpoint was taken.
+        """
+
+        now = time.monotonic()
+        if not force and now - self.last_checkpoint < self.checkpoint_interval:
+            return False
+        self.last_checkpoint = now
+        written = self.store.checkpoint()
+        self.http_cache.save()
+        if self.scheduler is not None:
+            self.scheduler.save_stats()
+        if written:
+            logging.info(f'{self.name}: Checkpointed {len(self.store.players)} players at {self.store.timestamp}')
+        return True
+
+    def close(self):
+        """
+        Take a final checkpoint and close the journal.
+
+        Returns: None.
+        """
+
+        self.checkpoint(force=True)
+        self.store.close()
+
+
+class ShutdownSignal:
+    """
+    Turn SIGTERM and SIGINT into an event the polling loops wait on.
+
+    The running cycle is never interrupted: the loops notice the event once it is over, then drain.
+    Must be created from the main thread.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._handle)
+
+    def _handle(self, signum, frame):
+        logging.info(f'Received {signal.Signals(signum).name}, shutting down after the running cycle')
+        self.event.set()
+
+    def is_set(self):
+        return self.event.is_set()
+
+    def wait(self, timeout):
+        """
+        Sleep until timeout or a shutdown signal, whichever comes first.
+
+        Args:
+            timeout (float): Seconds to sleep.
+
+        Returns:
+            bool: True if a shutdown was requested.
+        """
+
+        return self.event.wait(timeout)
@@ -1,64 +1,77 @@
-import os
-import tomllib
-import check_newcomers as cn
-import json
-import datetime
 import time
-import dhooks
 import logging
+import app_context as ac
+import check_newcomers as cn
+import daemon
+import discord_outbox as do
+import update_scheduler as us
+import metrics
 
-# Set the working directory to this script location
-os.chdir(f'{os.path.dirname(__file__)}')
 
-# Parse the configuration file
-with open('../config.toml', 'rb') as config_file:
-    config = tomllib.load(config_file)
+def main(context=None):
+    # Read config.toml once, every cycle reuses the same settings and HTTP connections
+    if context is None:
+        context = ac.load()
+        ac.setup_logging(context)
+    server, community, data_dir = context.server, context.community, context.data_dir
+    discord_webhook = context.config.get('DISCORD_BOT', {}).get('webhook')
 
-# Extract configuration parameters: server of interest
-server = config.get('CHECK_NEWCOMERS', {}).get('server')
+    # Extract configuration parameters: seconds between two state checkpoints, seconds allowed to flush the outbox on shutdown
+    checkpoint_interval = context.config.get('DAEMON', {}).get('checkpoint_interval', daemon.DEFAULT_CHECKPOINT_INTERVAL)
+    drain_timeout = context.config.get('DAEMON', {}).get('drain_timeout', daemon.DEFAULT_DRAIN_TIMEOUT)
 
-# Extract configuration parameters: community of interest
-community = config.get('CHECK_NEWCOMERS', {}).get('community')
+    # Expose metrics if enabled in the configuration
+    metrics.configure(context.config)
 
-# Extract configuration parameters: data directory
-data_dir = config.get('CHECK_NEWCOMERS', {}).get('data_dir')
+    # Stop polling on SIGTERM/SIGINT, once the running cycle is over
+    shutdown = daemon.ShutdownSignal()
 
-# Extract configuration parameters: discord webhook URL
-discord_webhook = config.get('DISCORD_BOT', {}).get('webhook')
-hook = dhooks.Webhook(discord_webhook)
+    # Deliver payloads from a background thread so polling never waits on Discord
+    outbox_dir = f'{data_dir}/{server}_{community}_outbox'
+    outbox = do.from_config(context.config, discord_webhook, outbox_dir, context.client, f'{server}_{community}').start()
 
+    # Keep the known players and the last timestamp in memory, starting from the latest checkpoint
+    scheduler = us.from_config(context.config, f'{data_dir}/{server}_{community}_scheduler_stats.json')
+    http_cache = context.http_cache(server, community)
+    state = daemon.TargetState(data_dir, server, community, http_cache, scheduler, checkpoint_interval)
 
-def main():
-    while True:
-        # Pause 60s between each iteration
-        time.sleep(60)
+    # Learn the API update cadence, starting from the last processed timestamp
+    scheduler.observe(state.timestamp)
 
-        # Read the old timestamp
-        with open(f'{data_dir}/{server}_{community}_timestamp.json', 'r') as timestamp_file:
-            old_timestamp = int(json.load(timestamp_file))
+    while not shutdown.is_set():
+        # Sleep until the next predicted update, then poll with growing intervals until it shows up
+        delay = scheduler.next_poll_delay(time.time())
+        logging.info(f'Next poll in {delay:.0f}s')
+        if shutdown.wait(delay):
+            break
 
-        # Format it and compare it to itself + 1h
-        current_time = datetime.datetime.now()
-        current_float_timestamp = current_time.timestamp()
-        current_int_timestamp = int(current_float_timestamp)
+        # A failed cycle is logged and the bot keeps polling, the state stays checkpointed either way
+        try:
+            payload = cn.check_target(server, community, data_dir, http_cache, context, state.store)
+        except Exception as exception:
+            logging.critical(f'{server}_{community}: Cycle failed: {exception}')
+            payload = False
+        finally:
+            scheduler.record_poll(state.timestamp, time.time())
+            state.checkpoint()
 
-        # Only run cn.main() if the last API check is more than an hour old
-        if current_int_timestamp > old_timestamp + 3600:
-            payload = cn.main()
+        # Check if cn.check_target() returned payloads to be further used
+        if payload is False:
+            continue
 
-            # Check if cn.main() returned the payload string to be further used
-            if payload is False:
-                continue
+        # Hand the payload over to the background sender, it survives restarts in the outbox directory
+        try:
+            outbox.enqueue(payload)
+        except OSError as error:
+            metrics.registry.inc('webhook_failures_total')
+            logging.warning(f'Calling outbox.enqueue(): {error}')
+            logging.warning('Payload not queued !\n')
 
-            # Send payload through webhook
-            logging.info('Sending payload')
-            try:
-                hook.send(payload)
-                logging.info('Payload sent !\n')
-            except Exception as exception:
-                logging.warning(f'Calling hook.send(): {exception}')
-                logging.warning('Payload not sent !\n')
-            continue
+    # Graceful drain: persist the state, then give the outbox a chance to deliver what is queued
+    state.close()
+    outbox.drain(drain_timeout)
+    context.close()
+    logging.info('Stopped !\n')
 
 
 if __name__ == '__main__':
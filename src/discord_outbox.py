@@ -0,0 +1,317 @@
+# Load necessary modules
+import os
+import time
+import random
+import logging
+import threading
+import retry_policy as rp
+import state_store as ss
+import metrics
+
+# Default settings, overridable from the [DISCORD_BOT] section of config.toml
+DEFAULT_MAX_LENGTH = 2000
+DEFAULT_RETRY_DELAY = 5
+DEFAULT_MAX_RETRY_DELAY = 300
+
+CODE_FENCE = '```'
+
+
+def split_payload(payload, max_length=DEFAULT_MAX_LENGTH):
+    """
+    Split a payload into Discord messages of at most max_length characters.
+
+    Messages are cut at line boundaries, so a newcomer line is never split across two messages.
+    A payload wrapped in a code block gets its fences repeated around every message.
+    Only a single line longer than a whole message is cut in the middle.
+
+    Args:
+        payload (str): The payload built by check_newcomers.build_payload().
+
+        max_length (int): Largest message length accepted by Discord.
+
+    Returns:
+        list: The messages, in order.
+    """
+
+    fenced = payload.startswith(f'{CODE_FENCE}\n') and payload.endswith(CODE_FENCE) and len(payload) >= 2 * len(CODE_FENCE) + 1
+    if fenced:
+        body = payload[len(CODE_FENCE) + 1:-len(CODE_FENCE)]
+        limit = max_length - 2 * len(CODE_FENCE) - 1
+    else:
+        body = payload
+        limit = max_length
+
+    chunks = []
+    current = ''
+    for line in body.splitlines(keepends=True):
+        if len(current) + len(line) > limit and current:
+            chunks.append(current)
+            current = ''
+        while len(line) > limit:
+            chunks.append(line[:limit])
+            line = line[limit:]
+        current += line
+    if current or not chunks:
+        chunks.append(current)
+
+    if fenced:
+        return [f'{CODE_FENCE}\n{chunk}{CODE_FENCE}' for chunk in chunks]
+    return chunks
+
+
+class DiscordOutbox:
+    """
+    Disk-backed queue of Discord webhook messages, delivered by a background thread.
+
+    enqueue() only writes the messages to outbox_dir and returns, so polling never waits on Discord.
+    Each message is a file named after its enqueue time and is deleted once Discord accepted it,
+    so messages left over by a crash or a restart are sent when the next outbox starts.
+    Throttled sends (429) wait for the delay requested by Discord, server and network errors are retried
+    with a growing delay, and messages rejected for good (other 4xx) are moved to outbox_dir/failed.
+
+    Args:
+        webhook_url (str): The Discord webhook URL.
+
+        outbox_dir (str): Directory holding the pending messages (e.g., '../data/123_fr_outbox').
+
+        client (http_client.HttpClient): The client used to post the messages.
+
+        max_length (int): Largest message length accepted by Discord.
+
+        retry_delay (float): Delay (in seconds) before the first retry of a failed send, doubled at every failure.
+
+        max_retry_delay (float): Largest delay (in seconds) between two attempts.
+
+        name (str): Label of the outbox in logs and metrics (e.g., '123_fr').
+    """
+
+    def __init__(
+        self,
+        webhook_url,
+        outbox_dir,
+        client,
+        max_length=DEFAULT_MAX_LENGTH,
+        retry_delay=DEFAULT_RETRY_DELAY,
+        max_retry_delay=DEFAULT_MAX_RETRY_DELAY,
+        name='discord',
+    ):
+        self.webhook_url = webhook_url
+        self.outbox_dir = outbox_dir
+        self.failed_dir = f'{outbox_dir}/failed'
+        self.client = client
+        self.max_length = max_length
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.name = name
+        self.failures = 0
+        self.thread = None
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        os.makedirs(self.failed_dir, exist_ok=True)
+
+    def pending(self):
+        """
+        Returns:
+            list: Paths of the messages waiting to be sent, oldest first.
+        """
+
+        names = sorted(name for name in os.listdir(self.outbox_dir) if name.endswith('.msg'))
+        return [f'{self.outbox_dir}/{name}' for name in names]
+
+    def enqueue(self, payload):
+        """
+        Split a payload into messages and store them for delivery.
+
+        Args:
+            payload (str | list): The payload built by check_newcomers.build_payload(), or several payloads
+                (e.g., newcomers and watchlist digest) each split on its own.
+
+        Raises:
+            OSError: If the messages cannot be written to the outbox directory.
+
+        Returns:
+            int: Number of queued messages.
+        """
+
+        payloads = [payload] if isinstance(payload, str) else payload
+        messages = [message for part in payloads for message in split_payload(part, self.max_length)]
+        with self._lock:
+            for message in messages:
+                self._sequence += 1
+                path = f'{self.outbox_dir}/{time.time_ns():020d}_{self._sequence:06d}.msg'
+                ss.atomic_write(path, message.encode())
+        metrics.registry.inc('webhook_queued_total', len(messages), target=self.name)
+        logging.info(f'{self.name}: Queued {len(messages)} messages')
+        self._wake.set()
+        return len(messages)
+
+    def start(self):
+        """
+        Start the background sender, pending messages from a previous run are sent first.
+
+        Returns:
+            DiscordOutbox: The outbox itself.
+        """
+
+        if self.thread is None or not self.thread.is_alive():
+            self._stop.clear()
+            self.thread = threading.Thread(target=self._run, name=f'outbox-{self.name}', daemon=True)
+            self.thread.start()
+            backlog = len(self.pending())
+            if backlog:
+                logging.info(f'{self.name}: Resuming delivery of {backlog} pending messages')
+        return self
+
+    def stop(self, timeout=None):
+        """
+        Stop the background sender after the message being sent, if any. Pending messages stay on disk.
+
+        Args:
+            timeout (float): Seconds to wait for the sender, None to wait as long as needed.
+
+        Returns: None.
+        """
+
+        self._stop.set()
+        self._wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def drain(self, timeout):
+        """
+        Wait for the pending messages to be sent, then stop the background sender.
+
+        Messages still pending after timeout stay on disk and are sent by the next outbox started on the directory.
+
+        Args:
+            timeout (float): Seconds to wait for the outbox to empty.
+
+        Returns:
+            int: Number of messages left pending.
+        """
+
+        deadline = time.monotonic() + timeout
+        while self.pending() and self.thread is not None and self.thread.is_alive() and time.monotonic() < deadline:
+            time.sleep(0.1)
+        self.stop(max(0.0, deadline - time.monotonic()))
+        left = len(self.pending())
+        if left:
+            logging.warning(f'{self.name}: {left} messages left in {self.outbox_dir}, they will be sent at next start')
+        return left
+
+    def _run(self):
+        while not self._stop.is_set():
+            # A failing send must not kill the sender thread, the messages would pile up unsent
+            try:
+                pending = self.pending()
+                if not pending:
+                    self._wake.wait()
+                    self._wake.clear()
+                    continue
+                delay = self.send(pending[0])
+            except Exception as exception:
+                logging.error(f'{self.name}: Sender failed: {exception}')
+                delay = self._backoff()
+            if delay > 0:
+                self._stop.wait(delay)
+
+    def send(self, path):
+        """
+        Post one queued message and remove it from the outbox once delivered.
+
+        Args:
+            path (str): The message file.
+
+        Raises: None.
+
+        Returns:
+            float: Seconds to wait before the next send.
+        """
+
+        try:
+            with open(path, 'r') as message_file:
+                message = message_file.read()
+        except OSError as error:
+            logging.warning(f'{self.name}: Unable to read {path}: {error}')
+            return self._backoff()
+
+        # Already loaded by the client, imported here so that importing this module stays cheap
+        import requests
+
+        try:
+            response = self.client.post(self.webhook_url, json={'content': message})
+        except requests.exceptions.RequestException as exception:
+            logging.warning(f'{self.name}: Calling send(): {exception}')
+            metrics.registry.inc('webhook_failures_total', target=self.name)
+            return self._backoff()
+
+        if response.status_code < 300:
+            os.remove(path)
+            self.failures = 0
+            metrics.registry.inc('webhook_sends_total', target=self.name)
+            logging.info(f'{self.name}: Message sent !')
+            # Wait for the bucket to refill instead of running into a 429
+            if response.headers.get('X-RateLimit-Remaining') == '0':
+                return rp.parse_retry_after(response.headers.get('X-RateLimit-Reset-After')) or 0
+            return 0
+
+        if response.status_code == 429:
+            metrics.registry.inc('webhook_throttled_total', target=self.name)
+            retry_after = rp.parse_retry_after(response.headers.get('Retry-After'))
+            try:
+                retry_after = float(response.json().get('retry_after', retry_after))
+            except (ValueError, AttributeError, TypeError):
+                pass
+            retry_after = retry_after if retry_after is not None else self.retry_delay
+            logging.warning(f'{self.name}: Throttled by Discord, waiting {retry_after:.1f}s')
+            return retry_after
+
+        metrics.registry.inc('webhook_failures_total', target=self.name)
+        if 400 <= response.status_code < 500:
+            # The message or the webhook is wrong, retrying will not help: keep the message aside for a manual replay
+            failed_path = f'{self.failed_dir}/{os.path.basename(path)}'
+            os.replace(path, failed_path)
+            logging.error(f'{self.name}: {response.status_code} from Discord, message moved to {failed_path}')
+            return 0
+        logging.warning(f'{self.name}: {response.status_code} from Discord')
+        return self._backoff()
+
+    def _backoff(self):
+        self.failures += 1
+        delay = min(self.max_retry_delay, self.retry_delay * 2 ** (self.failures - 1))
+        delay = random.uniform(delay / 2, delay)
+        logging.warning(f'{self.name}: Retrying in {delay:.1f}s')
+        return delay
+
+
+def from_config(config, webhook_url, outbox_dir, client, name='discord'):
+    """
+    Build a DiscordOutbox from a parsed config.toml.
+
+    Args:
+        config (dict): The parsed configuration file.
+
+        webhook_url (str): The Discord webhook URL.
+
+        outbox_dir (str): Directory holding the pending messages.
+
+        client (http_client.HttpClient): The client used to post the messages.
+
+        name (str): Label of the outbox in logs and metrics.
+
+    Returns:
+        DiscordOutbox: An outbox using the [DISCORD_BOT] settings, defaults for missing keys.
+    """
+
+    bot_config = config.get('DISCORD_BOT', {})
+    return DiscordOutbox(
+        webhook_url,
+        outbox_dir,
+        client,
+        max_length=bot_config.get('max_length', DEFAULT_MAX_LENGTH),
+        retry_delay=bot_config.get('retry_delay', DEFAULT_RETRY_DELAY),
+        max_retry_delay=bot_config.get('max_retry_delay', DEFAULT_MAX_RETRY_DELAY),
+        name=name,
+    )
@@ -0,0 +1,378 @@
+# Load necessary modules
+import argparse
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import app_context as ac
+import api_parsing as ap
+
+# Highscore types of OGame highscore API, see api_parsing.get_highscore_api()
+HIGHSCORE_TYPES = {
+    0: 'general',
+    1: 'economy',
+    2: 'technology',
+    3: 'military',
+    4: 'military_lost',
+    5: 'military_built',
+    6: 'military_destroyed',
+    7: 'honor',
+    8: 'lifeforms',
+    9: 'lifeforms_economy',
+    10: 'lifeforms_technology',
+    11: 'lifeforms_discovery',
+}
+
+MILITARY_TYPE = 3
+
+# Marks a player absent from a highscore type in positions (never a valid position, unlike scores that can be negative)
+MISSING = -1
+
+
+class HighscoreSnapshot:
+    """
+    Columnar snapshot of every player highscore type of a server.
+
+    Every array is aligned on ids, a sorted array of player IDs. Row t of positions and scores holds
+    highscore type t. Where the player is not ranked in that type, the position is MISSING and the score 0.
+
+    Attributes:
+        timestamp (int): Latest API timestamp among the fetched types.
+
+        ids (numpy.ndarray): Sorted player IDs (int64, shape (n,)).
+
+        positions (numpy.ndarray): Positions (int32, shape (12, n)).
+
+        scores (numpy.ndarray): Scores (int64, shape (12, n)).
+
+        ships (numpy.ndarray): Ship counts from the military highscore (int64, shape (n,)).
+    """
+
+    def __init__(self, timestamp, ids, positions, scores, ships):
+        self.timestamp = timestamp
+        self.ids = ids
+        self.positions = positions
+        self.scores = scores
+        self.ships = ships
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_entries(cls, timestamp, entries_by_type):
+        """
+        Build a snapshot from parsed highscore entries.
+
+        Args:
+            timestamp (int): API timestamp of the snapshot.
+
+            entries_by_type (dict): Highscore type (int) -> list of (id, position, score, ships) tuples,
+                rows with a None position or score are left out.
+
+        Returns:
+            HighscoreSnapshot: The aligned snapshot.
+        """
+
+        columns = {}
+        for highscore_type, entries in entries_by_type.items():
+            # A row without position or score (blank attribute in the API) is dropped, a missing ship count is 0
+            entries = [
+                (player_id, position, score, ships or 0)
+                for player_id, position, score, ships in entries
+                if position is not None and score is not None
+            ]
+            if entries:
+                columns[highscore_type] = np.array(entries, dtype=np.int64).reshape(-1, 4)
+            else:
+                columns[highscore_type] = np.empty((0, 4), dtype=np.int64)
+
+        all_ids = [column[:, 0] for column in columns.values()]
+        ids = np.unique(np.concatenate(all_ids)) if all_ids else np.empty(0, dtype=np.int64)
+
+        type_count = len(HIGHSCORE_TYPES)
+        positions = np.full((type_count, len(ids)), MISSING, dtype=np.int32)
+        scores = np.zeros((type_count, len(ids)), dtype=np.int64)
+        ships = np.zeros(len(ids), dtype=np.int64)
+        for highscore_type, column in columns.items():
+            rows = np.searchsorted(ids, column[:, 0])
+            positions[highscore_type, rows] = column[:, 1]
+            scores[highscore_type, rows] = column[:, 2]
+            if highscore_type == MILITARY_TYPE:
+                ships[rows] = column[:, 3]
+        return cls(timestamp, ids, positions, scores, ships)
+
+    def reindex(self, ids):
+        """
+        Align the snapshot on another sorted ID array.
+
+        Args:
+            ids (numpy.ndarray): Sorted player IDs, typically a union of several snapshots.
+
+        Returns:
+            tuple: (present, positions, scores, ships) arrays aligned on ids, MISSING positions and 0 scores/ships for absent players.
+        """
+
+        rows = np.searchsorted(self.ids, ids)
+        rows_clipped = np.minimum(rows, max(len(self.ids) - 1, 0))
+        present = (rows < len(self.ids)) & (self.ids[rows_clipped] == ids) if len(self.ids) else np.zeros(len(ids), dtype=bool)
+
+        positions = np.full((self.positions.shape[0], len(ids)), MISSING, dtype=np.int32)
+        scores = np.zeros((self.scores.shape[0], len(ids)), dtype=np.int64)
+        ships = np.zeros(len(ids), dtype=np.int64)
+        positions[:, present] = self.positions[:, rows_clipped[present]]
+        scores[:, present] = self.scores[:, rows_clipped[present]]
+        ships[present] = self.ships[rows_clipped[present]]
+        return present, positions, scores, ships
+
+    def save(self, path):
+        """
+        Write the snapshot to a compressed .npz file.
+
+        Args:
+            path (str): Destination file path (e.g., '../data/123_fr_snapshot.npz').
+
+        Returns: None.
+        """
+
+        tmp_path = f'{path}.tmp.npz'
+        np.savez_compressed(tmp_path, timestamp=np.int64(self.timestamp or 0), ids=self.ids,
+                            positions=self.positions, scores=self.scores, ships=self.ships)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a snapshot written by save().
+
+        Args:
+            path (str): Source file path.
+
+        Returns:
+            HighscoreSnapshot: The loaded snapshot.
+        """
+
+        with np.load(path) as data:
+            return cls(int(data['timestamp']), data['ids'], data['positions'], data['scores'], data['ships'])
+
+
+class SnapshotDelta:
+    """
+    Vectorized differences between two snapshots, aligned on the union of their player IDs.
+
+    Attributes:
+        ids (numpy.ndarray): Sorted union of player IDs.
+
+        before (numpy.ndarray): Whether each player is in the previous snapshot (bool).
+
+        after (numpy.ndarray): Whether each player is in the current snapshot (bool).
+
+        score_delta (numpy.ndarray): Score changes per type (int64, shape (12, n)), 0 where either side is missing.
+
+        position_delta (numpy.ndarray): Position changes per type (int32), negative when climbing the ranking.
+
+        ships_delta (numpy.ndarray): Ship count changes (int64).
+    """
+
+    def __init__(self, previous, current):
+        self.ids = np.union1d(previous.ids, current.ids)
+        self.before, previous_positions, previous_scores, previous_ships = previous.reindex(self.ids)
+        self.after, current_positions, current_scores, current_ships = current.reindex(self.ids)
+
+        # A player is ranked in a type when they have a position there, their score may be anything (e.g., negative honor)
+        both_ranked = (previous_positions != MISSING) & (current_positions != MISSING)
+        self.score_delta = np.where(both_ranked, current_scores - previous_scores, 0)
+        self.position_delta = np.where(both_ranked, current_positions - previous_positions, 0).astype(np.int32)
+        self.ships_delta = np.where(self.before & self.after, current_ships - previous_ships, 0)
+
+    def newcomers(self):
+        """
+        Returns:
+            numpy.ndarray: IDs present now but not in the previous snapshot.
+        """
+
+        return self.ids[self.after & ~self.before]
+
+    def departed(self):
+        """
+        Returns:
+            numpy.ndarray: IDs present in the previous snapshot but not anymore.
+        """
+
+        return self.ids[self.before & ~self.after]
+
+    def growth(self, player_ids, highscore_type=0):
+        """
+        Return the score change of some players in one highscore type.
+
+        Args:
+            player_ids (array-like): Player IDs of interest (e.g., newcomers of previous updates).
+
+            highscore_type (int): The highscore type (see HIGHSCORE_TYPES).
+
+        Returns:
+            numpy.ndarray: Score deltas in the order of player_ids, 0 for unknown players.
+        """
+
+        player_ids = np.asarray(player_ids, dtype=np.int64)
+        rows = np.searchsorted(self.ids, player_ids)
+        rows_clipped = np.minimum(rows, max(len(self.ids) - 1, 0))
+        found = (rows < len(self.ids)) & (self.ids[rows_clipped] == player_ids)
+        return np.where(found, self.score_delta[highscore_type, rows_clipped], 0)
+
+    def military_jumps(self, min_points):
+        """
+        Return the players whose military score rose by at least min_points.
+
+        Args:
+            min_points (int): Threshold on the military score increase.
+
+        Returns:
+            tuple: (ids, deltas) arrays sorted by decreasing delta.
+        """
+
+        mask = self.score_delta[MILITARY_TYPE] >= min_points
+        ids, deltas = self.ids[mask], self.score_delta[MILITARY_TYPE][mask]
+        order = np.argsort(-deltas, kind='stable')
+        return ids[order], deltas[order]
+
+    def stagnant(self, highscore_types=(1, 2, 8)):
+        """
+        Return the players whose score did not move in any of the given types, a sign of inactivity.
+
+        Args:
+            highscore_types (tuple): Highscore types that grow as long as a player is active
+                (economy, technology and lifeforms by default).
+
+        Returns:
+            numpy.ndarray: IDs present in both snapshots with no score change in those types.
+        """
+
+        rows = list(highscore_types)
+        unchanged = np.all(self.score_delta[rows] == 0, axis=0)
+        return self.ids[unchanged & self.before & self.after]
+
+
+def fetch_snapshot(server, community, category='1', highscore_types=tuple(HIGHSCORE_TYPES), workers=4, context=None):
+    """
+    Download and parse several highscore types of a server concurrently.
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        category (str): The category of highscore data to retrieve ('1' for players).
+
+        highscore_types (tuple): The highscore types to fetch (see HIGHSCORE_TYPES).
+
+        workers (int): Number of types downloaded and parsed at the same time.
+
+        context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
+
+    Returns if success:
+        HighscoreSnapshot: The aligned snapshot.
+
+    Returns if any type could not be fetched:
+        NoneType: None
+    """
+
+    def fetch(highscore_type):
+        stream = ap.get_highscore_stream(server, community, category, str(highscore_type), with_ships=True, context=context)
+        if stream is None or stream is ap.NOT_MODIFIED:
+            return highscore_type, None, None
+        try:
+            return highscore_type, stream.timestamp, list(stream)
+        except Exception as exception:
+            logging.warning(f'Calling fetch_snapshot(): type {highscore_type}: {exception}')
+            return highscore_type, None, None
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = list(executor.map(fetch, highscore_types))
+
+    if any(entries is None for _, _, entries in results):
+        logging.warning('Calling fetch_snapshot(): Unable to fetch every highscore type')
+        return None
+    timestamp = max((timestamp or 0) for _, timestamp, _ in results)
+    return HighscoreSnapshot.from_entries(timestamp, {highscore_type: entries for highscore_type, _, entries in results})
+
+
+def get_snapshot_path(data_dir, server, community):
+    """
+    Build the path of the snapshot file of a server.
+
+    Args:
+        data_dir (str): The data directory (e.g., '../data').
+
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+    Returns:
+        str: Path of the snapshot file.
+    """
+
+    return f'{data_dir}/{server}_{community}_snapshot.npz'
+
+
+def update_snapshot(server, community, data_dir, workers=4, context=None):
+    """
+    Fetch a new snapshot, compare it to the stored one and store it in its place.
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        data_dir (str): The data directory (e.g., '../data').
+
+        workers (int): Number of types downloaded and parsed at the same time.
+
+        context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
+
+    Returns if a previous snapshot exists:
+        SnapshotDelta: Differences between the stored and the new snapshot.
+
+    Returns if the stored snapshot is already at the API timestamp:
+        object: api_parsing.NOT_MODIFIED
+
+    Returns otherwise (first run or fetch failure):
+        NoneType: None
+    """
+
+    path = get_snapshot_path(data_dir, server, community)
+    current = fetch_snapshot(server, community, workers=workers, context=context)
+    if current is None:
+        return None
+    previous = HighscoreSnapshot.load(path) if os.path.exists(path) else None
+    if previous is not None and previous.timestamp == current.timestamp:
+        logging.info(f'Snapshot of {server}_{community} already at {current.timestamp}')
+        return ap.NOT_MODIFIED
+    current.save(path)
+    return SnapshotDelta(previous, current) if previous is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(usage='python3 highscore_snapshots.py -s|--server -c|--community [--min-jump] [-h|--help]')
+    parser.add_argument('-s', '--server', help='Server ID', required=True)
+    parser.add_argument('-c', '--community', help='Community ID', required=True)
+    parser.add_argument('--min-jump', help='Military points increase reported as a jump', type=int, default=100000)
+    arguments = parser.parse_args()
+
+    context = ac.load()
+    ac.setup_logging(context)
+    had_snapshot = os.path.exists(get_snapshot_path(context.data_dir, arguments.server, arguments.community))
+    delta = update_snapshot(arguments.server, arguments.community, context.data_dir, context=context)
+    if delta is ap.NOT_MODIFIED:
+        print('Snapshot unchanged, the API was not updated since the stored one')
+        return
+    if delta is None:
+        print('Unable to fetch the snapshot, see the logs' if had_snapshot else 'Snapshot stored, nothing to compare yet')
+        return
+    jump_ids, jump_deltas = delta.military_jumps(arguments.min_jump)
+    print(f'Newcomers: {len(delta.newcomers())}, departed: {len(delta.departed())}, stagnant: {len(delta.stagnant())}')
+    for player_id, points in zip(jump_ids, jump_deltas):
+        print(f'Military jump: {player_id} +{points:,}'.replace(',', '.'))
+
+
+if __name__ == '__main__':
+    main()
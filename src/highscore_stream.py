@@ -0,0 +1,87 @@
+# Load necessary modules
+import xml.etree.ElementTree as et
+import player_record as pr
+
+
+class HighscoreStream:
+    """
+    Incremental parser for OGame highscore API documents.
+
+    The document is fed chunk by chunk to an XMLPullParser and every player element is cleared as soon as it
+    has been read, so memory stays flat whatever the number of players.
+    The root timestamp is available right after construction, before the player entries are downloaded,
+    which lets callers stop early when the API has not been updated.
+
+    Iterating over the stream yields (id, position, score) tuples of int, or (id, position, score, ships)
+    tuples when with_ships is set (ships is 0 outside the military highscore). Unreadable values are None, see player_record.to_int().
+
+    Args:
+        chunks (iterable): Bytes chunks of the document (e.g., requests.Response.iter_content()).
+
+        on_close (callable): Optional function called when the stream is closed or exhausted.
+
+        with_ships (bool): Whether to add the ship count to every tuple.
+    """
+
+    def __init__(self, chunks, on_close=None, with_ships=False):
+        self._chunks = iter(chunks)
+        self._with_ships = with_ships
+        self._parser = et.XMLPullParser(events=('start', 'end'))
+        self._on_close = on_close
+        self._pending = []
+        self._root = None
+        self.timestamp = None
+
+        # Read until the root element shows up to capture its timestamp
+        while self._root is None and self._feed():
+            for event, element in self._parser.read_events():
+                if self._root is None and event == 'start':
+                    self._root = element
+                    timestamp = element.attrib.get('timestamp')
+                    self.timestamp = int(timestamp) if timestamp is not None else None
+                self._pending.append((event, element))
+
+    def __iter__(self):
+        try:
+            yield from self._read(self._pending)
+            self._pending = []
+            while self._feed():
+                yield from self._read(self._parser.read_events())
+            yield from self._read(self._parser.read_events())
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Stop reading the document and release the underlying response.
+
+        Returns: None.
+        """
+
+        if self._on_close is not None:
+            on_close, self._on_close = self._on_close, None
+            on_close()
+
+    def _feed(self):
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._parser.close()
+            return False
+        if chunk:
+            self._parser.feed(chunk)
+        return True
+
+    def _read(self, events):
+        root = self._root
+        for event, element in events:
+            if event != 'end' or element is root:
+                continue
+            player_id = element.attrib.get('id')
+            if player_id is not None:
+                entry = (int(player_id), pr.to_int(element.attrib.get('position', 0)), pr.to_int(element.attrib.get('score', 0)))
+                if self._with_ships:
+                    entry += (pr.to_int(element.attrib.get('ships', 0)),)
+                yield entry
+            element.clear()
+            # Drop the reference the root keeps to every read child
+            root.clear()
@@ -0,0 +1,129 @@
+# Load necessary modules
+import os
+import json
+import hashlib
+import logging
+import state_store as ss
+
+
+class HttpCache:
+    """
+    Per-URL store of HTTP validators (ETag, Last-Modified) and content hashes used for conditional GETs.
+
+    New validators seen during a cycle are kept pending and only become effective once commit() is called,
+    so a cycle that fails halfway is retried on the next poll instead of being skipped by a 304.
+
+    Args:
+        path (str): JSON file the cache is persisted to (e.g., '../data/123_fr_http_cache.json').
+            None keeps the cache in memory only.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self.pending = {}
+        self.dirty = False
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path, 'r') as cache_file:
+                    self.entries = json.load(cache_file)
+            except (OSError, ValueError) as error:
+                logging.warning(f'Ignoring unreadable HTTP cache {path}: {error}')
+
+    def validators(self, url):
+        """
+        Build the conditional request headers for a URL.
+
+        Args:
+            url (str): The endpoint URL.
+
+        Returns:
+            dict: If-None-Match and/or If-Modified-Since headers, empty if nothing is known about the URL.
+        """
+
+        entry = self.entries.get(url, {})
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def update(self, url, response):
+        """
+        Record the validators and content hash of a 200 response.
+
+        Args:
+            url (str): The endpoint URL.
+
+            response (requests.Response): The response, its body is read.
+
+        Returns:
+            bool: False if the body is identical to the last committed one (the server ignored the validators),
+                True otherwise.
+        """
+
+        digest = hashlib.blake2b(response.content, digest_size=16).hexdigest()
+        self.pending[url] = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'hash': digest,
+        }
+        return self.entries.get(url, {}).get('hash') != digest
+
+    def remember(self, url, response):
+        """
+        Record the validators of a 200 response whose body is streamed and therefore not hashed.
+
+        Args:
+            url (str): The endpoint URL.
+
+            response (requests.Response): The response, its body is left untouched.
+
+        Returns: None.
+        """
+
+        self.pending[url] = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'hash': None,
+        }
+
+    def commit(self, persist=True):
+        """
+        Make pending validators effective and persist the cache.
+
+        Args:
+            persist (bool): Whether to write the cache file now, False leaves it to a later save().
+
+        Returns: None.
+        """
+
+        if not self.pending:
+            return
+        self.entries.update(self.pending)
+        self.pending = {}
+        self.dirty = True
+        if persist:
+            self.save()
+
+    def save(self):
+        """
+        Write the committed validators to the cache file, if anything changed since the last write.
+
+        Returns: None.
+        """
+
+        if self.path is None or not self.dirty:
+            return
+        ss.atomic_write(self.path, json.dumps(self.entries).encode())
+        self.dirty = False
+
+    def discard(self):
+        """
+        Forget pending validators, the next request will download the endpoints again.
+
+        Returns: None.
+        """
+
+        self.pending = {}
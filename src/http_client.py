@@ -0,0 +1,114 @@
+# Load necessary modules
+import requests
+import requests.adapters
+
+# Default settings, overridable from the [HTTP_CLIENT] section of config.toml
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 60
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 8
+
+
+class HttpClient:
+    """
+    Reusable HTTP client shared by every OGame API call.
+
+    Wraps a requests.Session so TCP+TLS connections to s{server}-{community}.ogame.gameforge.com are kept alive
+    and reused between calls, negotiates gzip/deflate compression and always applies a timeout.
+
+    Args:
+        connect_timeout (float): Seconds allowed to establish a connection.
+
+        read_timeout (float): Seconds allowed between two bytes of the response.
+
+        pool_connections (int): Number of per-host connection pools kept around.
+
+        pool_maxsize (int): Maximum number of idle connections kept per host.
+    """
+
+    def __init__(
+        self,
+        connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+        read_timeout=DEFAULT_READ_TIMEOUT,
+        pool_connections=DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize=DEFAULT_POOL_MAXSIZE,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        self.session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+
+        # Retries are handled by the callers, the adapter only pools connections
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=0,
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, url, headers=None, stream=False):
+        """
+        Send a GET request through the pooled session.
+
+        Args:
+            url (str): The URL to fetch.
+
+            headers (dict): Extra request headers.
+
+            stream (bool): Whether to defer downloading the response body.
+
+        Raises:
+            requests.exceptions.RequestException: If there is an error during the request, including timeouts.
+
+        Returns:
+            requests.Response: The response.
+        """
+
+        return self.session.get(url, headers=headers, timeout=self.timeout, stream=stream)
+
+    def post(self, url, json=None):
+        """
+        Send a POST request with a JSON body through the pooled session.
+
+        Args:
+            url (str): The URL to post to.
+
+            json (dict): The request body, serialized as JSON.
+
+        Raises:
+            requests.exceptions.RequestException: If there is an error during the request, including timeouts.
+
+        Returns:
+            requests.Response: The response.
+        """
+
+        return self.session.post(url, json=json, timeout=self.timeout)
+
+    def close(self):
+        """
+        Close every pooled connection.
+
+        Returns: None.
+        """
+
+        self.session.close()
+
+
+def from_config(config):
+    """
+    Build an HttpClient from a parsed config.toml.
+
+    Args:
+        config (dict): The parsed configuration file.
+
+    Returns:
+        HttpClient: A client using the [HTTP_CLIENT] settings, defaults for missing keys.
+    """
+
+    http_config = config.get('HTTP_CLIENT', {})
+    return HttpClient(
+        connect_timeout=http_config.get('connect_timeout', DEFAULT_CONNECT_TIMEOUT),
+        read_timeout=http_config.get('read_timeout', DEFAULT_READ_TIMEOUT),
+        pool_connections=http_config.get('pool_connections', DEFAULT_POOL_CONNECTIONS),
+        pool_maxsize=http_config.get('pool_maxsize', DEFAULT_POOL_MAXSIZE),
+    )
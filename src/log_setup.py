@@ -0,0 +1,234 @@
+# Load necessary modules
+import os
+import re
+import gzip
+import json
+import time
+import queue
+import atexit
+import contextlib
+import shutil
+import logging
+import threading
+import contextvars
+import logging.handlers
+import metrics
+
+# Default settings, overridable from the [LOGGING] section of config.toml
+DEFAULT_FORMAT = 'text'
+DEFAULT_ROTATE = 'size'
+DEFAULT_MAX_BYTES = 10485760
+DEFAULT_WHEN = 'midnight'
+DEFAULT_BACKUP_COUNT = 7
+DEFAULT_COMPRESS = True
+DEFAULT_RATE_LIMIT_INTERVAL = 60
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(message)s'
+
+# Target (e.g., '123_fr') of the cycle running in the current thread, added to every record
+current_target = contextvars.ContextVar('current_target', default=None)
+
+# Listeners started by configure() and not stopped yet
+_running_listeners = set()
+
+# Retry delays ('3.1s') and attempt counters ('2/5') do not make a warning different, IDs and hosts do
+RETRY_NUMBERS_PATTERN = re.compile(r'\b\d+(\.\d+)?s\b|\b\d+/\d+\b')
+
+
+class TargetFilter(logging.Filter):
+    """
+    Add the target of the emitting thread (see target()) to every record, as record.target.
+
+    Runs on the QueueHandler, i.e. in the thread that logs, before the record crosses the queue.
+    """
+
+    def filter(self, record):
+        record.target = current_target.get()
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Drop warnings repeating an already logged one of the same target, for interval seconds.
+
+    Warnings are compared with their retry delays and attempt counters masked, so 'Waiting 3.1s and trying again (2/5)'
+    repeats 'Waiting 1.4s and trying again (1/5)', while warnings about different players or hosts stay apart.
+    The first occurrence goes through, the next ones are counted, and the first one logged after the interval tells
+    how many were suppressed. Records below WARNING always pass.
+
+    Args:
+        interval (float): Seconds during which a warning is only logged once, 0 disables the filter.
+    """
+
+    def __init__(self, interval=DEFAULT_RATE_LIMIT_INTERVAL):
+        super().__init__()
+        self.interval = interval
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.interval <= 0 or record.levelno < logging.WARNING:
+            return True
+        key = (getattr(record, 'target', None), record.name, record.levelno, RETRY_NUMBERS_PATTERN.sub('#', record.getMessage()))
+        now = time.monotonic()
+        with self._lock:
+            logged_at, suppressed = self._seen.get(key, (None, 0))
+            if logged_at is not None and now - logged_at < self.interval:
+                self._seen[key] = (logged_at, suppressed + 1)
+                metrics.registry.inc('log_suppressed_total', level=record.levelname)
+                return False
+            self._seen[key] = (now, 0)
+            # Forget keys that went quiet, so the table does not grow with every distinct message
+            if len(self._seen) > 1024:
+                self._seen = {seen_key: value for seen_key, value in self._seen.items() if now - value[0] < self.interval}
+        if suppressed:
+            record.msg = f'{record.getMessage()} ({suppressed} similar messages suppressed)'
+            record.args = None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as JSON lines: time, level, logger, target, thread and message (plus the traceback if any).
+    """
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'target': getattr(record, 'target', None),
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+@contextlib.contextmanager
+def target(name):
+    """
+    Tag the records logged by the current thread with a target while the block runs.
+
+    Args:
+        name (str): The target (e.g., '123_fr').
+
+    Returns:
+        contextlib.AbstractContextManager: The context manager.
+    """
+
+    token = current_target.set(name)
+    try:
+        yield
+    finally:
+        current_target.reset(token)
+
+
+def compress_rotated(source, dest):
+    """
+    Rotator of the file handlers: gzip the rotated log file (runs in the listener thread).
+
+    Args:
+        source (str): The log file being rotated.
+
+        dest (str): The rotated file name (ending with '.gz', see the handler namer).
+
+    Returns: None.
+    """
+
+    with open(source, 'rb') as source_file, gzip.open(dest, 'wb') as dest_file:
+        shutil.copyfileobj(source_file, dest_file)
+    os.remove(source)
+
+
+def build_file_handler(log_path, logging_config):
+    """
+    Build the handler writing the log file, rotated according to [LOGGING].
+
+    Args:
+        log_path (str): The log file.
+
+        logging_config (dict): The [LOGGING] section of config.toml.
+
+    Returns:
+        logging.Handler: A plain, size rotated or time rotated file handler.
+    """
+
+    # Extract configuration parameters: rotation trigger ('size', 'time' or '' to never rotate), thresholds, compression
+    rotate = logging_config.get('rotate', DEFAULT_ROTATE)
+    backup_count = logging_config.get('backup_count', DEFAULT_BACKUP_COUNT)
+    if rotate == 'size':
+        handler = logging.handlers.RotatingFileHandler(
+            log_path, maxBytes=logging_config.get('max_bytes', DEFAULT_MAX_BYTES), backupCount=backup_count,
+        )
+    elif rotate == 'time':
+        handler = logging.handlers.TimedRotatingFileHandler(log_path, when=logging_config.get('when', DEFAULT_WHEN), backupCount=backup_count)
+    else:
+        return logging.FileHandler(log_path, mode='a')
+    if logging_config.get('compress', DEFAULT_COMPRESS):
+        handler.namer = lambda name: f'{name}.gz'
+        handler.rotator = compress_rotated
+    return handler
+
+
+def configure(config, log_path, level=logging.INFO):
+    """
+    Send the logs of the process to a file through a queue, so that logging never waits for the disk.
+
+    The root logger gets a QueueHandler (with the target and rate limit filters), a QueueListener thread formats the
+    records and writes them to the rotated file. The listener is stopped at exit, after the queue is drained.
+
+    Args:
+        config (dict): The parsed configuration file, [LOGGING] settings are used, defaults for missing keys.
+
+        log_path (str): The log file.
+
+        level (int): The logging level of the root logger.
+
+    Returns:
+        logging.handlers.QueueListener: The started listener.
+    """
+
+    # Extract configuration parameters: output format ('text' or 'json') and repeated warnings window
+    logging_config = config.get('LOGGING', {})
+    file_handler = build_file_handler(log_path, logging_config)
+    if logging_config.get('format', DEFAULT_FORMAT) == 'json':
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(TargetFilter())
+    queue_handler.addFilter(RateLimitFilter(logging_config.get('rate_limit_interval', DEFAULT_RATE_LIMIT_INTERVAL)))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    _running_listeners.add(listener)
+    atexit.register(stop, listener, file_handler)
+    return listener
+
+
+def stop(listener, file_handler):
+    """
+    Write the queued records and close the log file.
+
+    Args:
+        listener (logging.handlers.QueueListener): The listener returned by configure().
+
+        file_handler (logging.Handler): Its file handler.
+
+    Returns: None.
+    """
+
+    # Already stopped by the caller, nothing left to do at exit
+    if listener not in _running_listeners:
+        return
+    _running_listeners.discard(listener)
+    listener.stop()
+    file_handler.close()
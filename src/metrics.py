@@ -0,0 +1,284 @@
+# Load necessary modules
+import json
+import time
+import threading
+import logging
+import collections
+import contextlib
+import state_store as ss
+
+# Upper bounds (in seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+# Number of cycles kept in the rolling JSON stats file
+RECENT_CYCLES = 100
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+class Registry:
+    """
+    In-process counters and latency histograms, exposed as Prometheus text or JSON.
+
+    While disabled every recording call returns right away, so instrumentation costs a function call
+    and an attribute check.
+
+    Args:
+        enabled (bool): Whether metrics are recorded.
+
+        buckets (tuple): Upper bounds (in seconds) of the histogram buckets.
+    """
+
+    def __init__(self, enabled=False, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self.counters = collections.defaultdict(float)
+        self.histograms = {}
+        self.cycles = collections.deque(maxlen=RECENT_CYCLES)
+        self.json_path = None
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        """
+        Increase a counter.
+
+        Args:
+            name (str): Metric name (e.g., 'api_requests_total').
+
+            value (float): Amount added to the counter.
+
+            labels: Label values of the series (e.g., endpoint='highscore.xml').
+
+        Returns: None.
+        """
+
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] += value
+
+    def observe(self, name, value, **labels):
+        """
+        Record a value (typically a duration in seconds) in a histogram.
+
+        Args:
+            name (str): Metric name (e.g., 'cycle_stage_seconds').
+
+            value (float): The observed value.
+
+            labels: Label values of the series.
+
+        Returns: None.
+        """
+
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['buckets'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def timer(self, name, **labels):
+        """
+        Time a block of code into a histogram.
+
+        Args:
+            name (str): Metric name (e.g., 'cycle_stage_seconds').
+
+            labels: Label values of the series.
+
+        Returns:
+            contextmanager: Use as `with registry.timer('cycle_stage_seconds', stage='diff'):`.
+        """
+
+        if not self.enabled:
+            return _NULL_TIMER
+        return self._timer(name, labels)
+
+    @contextlib.contextmanager
+    def _timer(self, name, labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def record_cycle(self, target, stages):
+        """
+        Append a cycle summary to the rolling stats and rewrite the JSON stats file.
+
+        Args:
+            target (str): The checked target (e.g., '123_fr').
+
+            stages (dict): Stage name -> duration in seconds.
+
+        Returns: None.
+        """
+
+        if not self.enabled:
+            return
+        with self._lock:
+            self.cycles.append({'target': target, 'finished_at': round(time.time()), 'stages': stages})
+        if self.json_path:
+            try:
+                ss.atomic_write(self.json_path, json.dumps(self.to_dict(), indent=2).encode())
+            except OSError as error:
+                logging.warning(f'Unable to write metrics to {self.json_path}: {error}')
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: Counters, histogram summaries and the recent cycles, JSON serializable.
+        """
+
+        with self._lock:
+            return {
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                'histograms': [
+                    {
+                        'name': name,
+                        'labels': dict(labels),
+                        'count': histogram['count'],
+                        'sum': histogram['sum'],
+                        'mean': histogram['sum'] / histogram['count'] if histogram['count'] else None,
+                    }
+                    for (name, labels), histogram in sorted(self.histograms.items())
+                ],
+                'cycles': list(self.cycles),
+            }
+
+    def to_prometheus(self):
+        """
+        Returns:
+            str: Every series in the Prometheus text exposition format.
+        """
+
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f'{name}{_format_labels(labels)} {value:g}')
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                for bound, count in zip(self.buckets, histogram['buckets']):
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", f"{bound:g}"),))} {count}')
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {histogram["count"]}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {histogram["sum"]:g}')
+                lines.append(f'{name}_count{_format_labels(labels)} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class CycleTimer:
+    """
+    Collect the stage durations of one check cycle.
+
+    Every stage is observed in the cycle_stage_seconds histogram and the whole cycle is appended
+    to the rolling stats by finish().
+
+    Args:
+        target (str): The checked target (e.g., '123_fr').
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if not registry.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            registry.observe('cycle_stage_seconds', elapsed, stage=name)
+
+    def finish(self):
+        registry.record_cycle(self.target, self.stages)
+
+
+# Registry shared by every module, disabled until configure() is called
+registry = Registry()
+
+
+def configure(config):
+    """
+    Enable metrics from the [METRICS] section of a parsed config.toml.
+
+    Starts the Prometheus HTTP endpoint if a port is set. Does nothing if the section is missing or disabled.
+
+    Args:
+        config (dict): The parsed configuration file.
+
+    Returns:
+        Registry: The shared registry.
+    """
+
+    metrics_config = config.get('METRICS', {})
+    if not metrics_config.get('enabled', False):
+        return registry
+    registry.enabled = True
+    registry.json_path = metrics_config.get('json_path') or None
+    port = metrics_config.get('port', 0)
+    if port:
+        start_http_server(port, metrics_config.get('host', '127.0.0.1'))
+    return registry
+
+
+def start_http_server(port, host='127.0.0.1'):
+    """
+    Serve the shared registry at http://{host}:{port}/metrics from a background thread.
+
+    Args:
+        port (int): Port to listen on.
+
+        host (str): Interface to listen on, local only by default.
+
+    Returns:
+        http.server.ThreadingHTTPServer: The running server.
+    """
+
+    # Only needed when the endpoint is enabled
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.to_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f'Serving metrics on http://{host}:{server.server_port}/metrics')
+    return server
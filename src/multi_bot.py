@@ -0,0 +1,223 @@
+# Load necessary modules
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import app_context as ac
+import check_newcomers as cn
+import daemon
+import discord_outbox as do
+import http_cache as hcache
+import update_scheduler as us
+import metrics
+
+
+class Target:
+    """
+    One monitored universe with its own state files, HTTP validators and Discord webhook.
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        webhook (str): The Discord webhook URL newcomers are posted to.
+
+        data_dir (str): The directory holding the state files of the server.
+
+        context (app_context.AppContext): Settings and HTTP client shared by every target.
+    """
+
+    def __init__(self, server, community, webhook, data_dir, context):
+        self.server = server
+        self.community = community
+        self.data_dir = data_dir
+        self.context = context
+        self.name = f'{server}_{community}'
+        self.outbox = do.from_config(context.config, webhook, f'{data_dir}/{self.name}_outbox', context.client, self.name)
+        self.http_cache = hcache.HttpCache(f'{data_dir}/{self.name}_http_cache.json')
+        self.scheduler = us.from_config(context.config, f'{data_dir}/{self.name}_scheduler_stats.json')
+        self.checkpoint_interval = context.config.get('DAEMON', {}).get('checkpoint_interval', daemon.DEFAULT_CHECKPOINT_INTERVAL)
+        self.state = None
+        self.next_poll = 0
+        self.running = False
+
+    @property
+    def timestamp(self):
+        return self.state.timestamp if self.state is not None else None
+
+    def load_state(self):
+        """
+        Load the state of the target into memory (warm start from its latest checkpoint), unless already loaded.
+
+        Returns if success:
+            int: Epoch unix timestamp of the last processed API update.
+
+        Returns if failure:
+            NoneType: None
+        """
+
+        if self.state is None:
+            try:
+                self.state = daemon.TargetState(
+                    self.data_dir, self.server, self.community, self.http_cache, self.scheduler, self.checkpoint_interval,
+                )
+            except (OSError, ValueError) as error:
+                logging.warning(f'{self.name}: Unable to load state: {error}')
+        return self.timestamp
+
+    def is_due(self, now):
+        """
+        Tell whether the target should be polled.
+
+        Args:
+            now (float): Current epoch unix time.
+
+        Returns:
+            bool: True if the target is idle and its scheduler asks for a poll.
+        """
+
+        return not self.running and now >= self.next_poll
+
+    def schedule(self, now):
+        """
+        Set the next poll time of the target from its scheduler.
+
+        Args:
+            now (float): Current epoch unix time.
+
+        Returns: None.
+        """
+
+        self.next_poll = now + self.scheduler.next_poll_delay(now)
+
+
+def get_targets(context):
+    """
+    Build the monitored targets from the [[TARGETS]] tables of config.toml.
+
+    Each table needs server, community and webhook keys and may override data_dir.
+    Without any [[TARGETS]] table, the single [CHECK_NEWCOMERS]/[DISCORD_BOT] pair is used.
+
+    Args:
+        context (app_context.AppContext): Settings and HTTP client shared by every target.
+
+    Returns:
+        list: Target objects.
+    """
+
+    target_configs = context.config.get('TARGETS')
+    if not target_configs:
+        target_configs = [{
+            'server': context.server,
+            'community': context.community,
+            'webhook': context.config.get('DISCORD_BOT', {}).get('webhook'),
+        }]
+    targets = []
+    for target_config in target_configs:
+        target = Target(
+            str(target_config['server']),
+            target_config['community'],
+            target_config['webhook'],
+            target_config.get('data_dir', context.data_dir),
+            context,
+        )
+        target.scheduler.observe(target.load_state())
+        target.schedule(time.time())
+        targets.append(target)
+    return targets
+
+
+def run_target(target):
+    """
+    Run one check cycle for a target and queue the resulting payload for its webhook.
+
+    Args:
+        target (Target): The target to check.
+
+    Returns: None.
+    """
+
+    try:
+        # The state files may have been created since startup, e.g. by setup.py
+        target.load_state()
+        if target.state is None:
+            return
+        payload = cn.check_target(target.server, target.community, target.data_dir, target.http_cache, target.context, target.state.store)
+        if payload is False:
+            return
+        # Queue the payload, the target outbox thread delivers it
+        target.outbox.enqueue(payload)
+    except Exception as exception:
+        logging.critical(f'{target.name}: Cycle failed: {exception}')
+    finally:
+        now = time.time()
+        target.scheduler.record_poll(target.timestamp, now)
+        if target.state is not None:
+            target.state.checkpoint()
+        target.schedule(now)
+        target.running = False
+
+
+def main(context=None):
+    """
+    Monitor every configured universe from a single process, posting newcomers to the webhook of each one.
+
+    Args:
+        context (app_context.AppContext): Settings and HTTP client shared by every target, loaded from config.toml if None.
+
+    Raises: None.
+
+    Returns: None.
+    """
+
+    if context is None:
+        context = ac.load()
+        ac.setup_logging(context)
+
+    # Extract configuration parameters: number of targets checked at the same time
+    workers = context.config.get('MULTI_BOT', {}).get('workers', 4)
+
+    # Extract configuration parameters: maximum seconds between two scheduling passes
+    poll_interval = context.config.get('MULTI_BOT', {}).get('poll_interval', 60)
+
+    # Extract configuration parameters: seconds allowed to flush the outboxes on shutdown
+    drain_timeout = context.config.get('DAEMON', {}).get('drain_timeout', daemon.DEFAULT_DRAIN_TIMEOUT)
+
+    # Expose metrics if enabled in the configuration
+    metrics.configure(context.config)
+
+    # Stop scheduling on SIGTERM/SIGINT, running cycles are finished before exiting
+    shutdown = daemon.ShutdownSignal()
+
+    targets = get_targets(context)
+    for target in targets:
+        target.outbox.start()
+    logging.info(f'Monitoring {len(targets)} targets with {workers} workers')
+
+    # A single pool serves every target, the HTTP connection pool of api_parsing is shared as well
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while not shutdown.is_set():
+            now = time.time()
+            for target in targets:
+                if target.is_due(now):
+                    target.running = True
+                    executor.submit(run_target, target)
+
+            # Wake up for the earliest predicted poll, running targets are rescheduled when they finish
+            idle_polls = [target.next_poll for target in targets if not target.running]
+            wake_up = min(idle_polls, default=now + poll_interval)
+            shutdown.wait(min(poll_interval, max(1, wake_up - time.time())))
+
+    # Graceful drain: the pool has finished the running cycles, persist every state and flush the outboxes
+    for target in targets:
+        if target.state is not None:
+            target.state.close()
+    deadline = time.monotonic() + drain_timeout
+    for target in targets:
+        target.outbox.drain(max(0.0, deadline - time.monotonic()))
+    context.close()
+    logging.info('Stopped !\n')
+
+
+if __name__ == '__main__':
+    main()
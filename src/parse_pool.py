@@ -0,0 +1,178 @@
+# Load necessary modules
+import os
+import array
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+import xml.etree.ElementTree as et
+import metrics
+import player_record as pr
+
+# Default settings, overridable from the [PARSE_POOL] section of config.toml
+DEFAULT_WORKERS = 0
+DEFAULT_INLINE_THRESHOLD = 262144
+
+
+class ParsePool:
+    """
+    Process pool parsing raw OGame API documents off the GIL.
+
+    Parsing an XML document is CPU-bound and holds the GIL, so threads fetching several universes or endpoints
+    end up parsing one at a time. The pool parses them in worker processes instead: raw bytes go in, compact results
+    come out (ID arrays, record tuples, plain dicts), never pickled ElementTrees.
+    Documents smaller than inline_threshold are parsed in the calling thread, where the round trip to a worker
+    would cost more than the parse itself.
+
+    Args:
+        workers (int): Worker processes, 0 for one per available CPU. With a single worker every document is parsed inline.
+
+        inline_threshold (int): Size (in bytes) below which documents are parsed in the calling thread.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, inline_threshold=DEFAULT_INLINE_THRESHOLD):
+        self.workers = workers if workers > 0 else default_workers()
+        self.inline_threshold = inline_threshold
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, function, content, *args):
+        """
+        Schedule function(content, *args) in a worker, or run it inline for small documents.
+
+        Args:
+            function (callable): A module level parse function (e.g., parse_highscore), it must be picklable.
+
+            content (bytes): The raw document.
+
+            *args: Extra arguments of function.
+
+        Returns:
+            concurrent.futures.Future: The future result, already done when parsed inline.
+        """
+
+        if self.workers <= 1 or len(content) < self.inline_threshold:
+            future = Future()
+            try:
+                with metrics.registry.timer('parse_seconds', function=function.__name__, mode='inline'):
+                    future.set_result(function(content, *args))
+            except Exception as exception:
+                future.set_exception(exception)
+            return future
+        metrics.registry.inc('parse_offloaded_bytes_total', len(content), function=function.__name__)
+        return self._get_executor().submit(function, content, *args)
+
+    def run(self, function, content, *args):
+        """
+        Parse a document and wait for the result, see submit().
+
+        Raises:
+            xml.etree.ElementTree.ParseError: If the document is malformed.
+
+        Returns:
+            object: What function returns.
+        """
+
+        future = self.submit(function, content, *args)
+        if future.done():
+            return future.result()
+        with metrics.registry.timer('parse_seconds', function=function.__name__, mode='pool'):
+            return future.result()
+
+    def close(self):
+        """
+        Stop the worker processes, if any were started.
+
+        Returns: None.
+        """
+
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # Forking a process running HTTP threads is unsafe, start the workers from a clean interpreter
+                    methods = multiprocessing.get_all_start_methods()
+                    mp_context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp_context)
+                    logging.info(f'Started {self.workers} parse workers')
+        return self._executor
+
+
+def default_workers():
+    """
+    Count the CPUs this process may run on.
+
+    Returns:
+        int: The CPU count (affinity aware where supported), at least 1.
+    """
+
+    if hasattr(os, 'sched_getaffinity'):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+def parse_highscore(content):
+    """
+    Parse an OGame highscore API document into its timestamp and player IDs.
+
+    Args:
+        content (bytes): The raw document.
+
+    Raises:
+        xml.etree.ElementTree.ParseError: If the document is malformed.
+
+    Returns:
+        tuple: (timestamp, player_ids), timestamp being None if missing and player_ids an array.array of int
+            (8 bytes per player to send back, instead of a list of str).
+    """
+
+    xml_tree = et.fromstring(content)
+    timestamp = xml_tree.attrib.get('timestamp')
+    player_ids = array.array('q', (int(player_id) for player_id in (child.attrib.get('id') for child in xml_tree) if player_id is not None))
+    return int(timestamp) if timestamp is not None else None, player_ids
+
+
+def parse_player(content):
+    """
+    Parse an OGame player API document, see player_record.parse_player().
+
+    Args:
+        content (bytes): The raw document.
+
+    Raises:
+        xml.etree.ElementTree.ParseError: If the document is malformed.
+
+    Returns:
+        player_record.PlayerRecord: The record, None if the document lacks the player ID or name.
+    """
+
+    return pr.parse_player(et.fromstring(content))
+
+
+def from_config(config):
+    """
+    Build a ParsePool from a parsed config.toml.
+
+    Args:
+        config (dict): The parsed configuration file.
+
+    Returns if enabled in [PARSE_POOL]:
+        ParsePool: A pool using the [PARSE_POOL] settings, defaults for missing keys.
+
+    Returns if parse offloading is disabled:
+        NoneType: None
+    """
+
+    # Extract configuration parameters: switch, worker count (0 for automatic) and inline threshold
+    pool_config = config.get('PARSE_POOL', {})
+    if not pool_config.get('enabled', False):
+        return None
+    return ParsePool(
+        workers=pool_config.get('workers', DEFAULT_WORKERS),
+        inline_threshold=pool_config.get('inline_threshold', DEFAULT_INLINE_THRESHOLD),
+    )
@@ -0,0 +1,95 @@
+# Load necessary modules
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import app_context as ac
+import api_parsing as ap
+import parse_pool as pp
+import player_record as pr
+import rate_limiter as rl
+
+
+def fetch_players(server, community, player_ids, requests_per_second=2.0, max_in_flight=4, context=None):
+    """
+    Retrieve data from OGame player API for several players concurrently.
+
+    Requests go through a thread pool of max_in_flight workers and are paced by a token bucket,
+    so at most requests_per_second requests are started per second.
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        player_ids (list): The IDs of the players of interest (e.g., ['142515', '108794']).
+
+        requests_per_second (float): Sustained request rate allowed against the API.
+
+        max_in_flight (int): Maximum number of requests running at the same time.
+
+        context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
+
+    Returns:
+        list: (player_id, xml_tree) tuples in the order of player_ids,
+            xml_tree being None for players whose data could not be fetched.
+    """
+
+    bucket = rl.TokenBucket(requests_per_second)
+
+    def fetch(player_id):
+        bucket.acquire()
+        try:
+            return ap.get_player_api(server, community, player_id, context)
+        except Exception as exception:
+            logging.warning(f'Calling fetch_players(): player {player_id}: {exception}')
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as executor:
+        xml_trees = list(executor.map(fetch, player_ids))
+    return list(zip(player_ids, xml_trees))
+
+
+def enrich_players(server, community, player_ids, requests_per_second=2.0, max_in_flight=4, context=None):
+    """
+    Retrieve and parse the data of several players through OGame player API.
+
+    With a parse pool in the context, every worker thread hands its raw document to the pool,
+    so the documents of several players are parsed on several cores.
+
+    Args:
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        player_ids (list): The IDs of the players of interest.
+
+        requests_per_second (float): Sustained request rate allowed against the API.
+
+        max_in_flight (int): Maximum number of requests running at the same time.
+
+        context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
+
+    Returns:
+        list: (player_id, record) tuples in the order of player_ids, record being a player_record.PlayerRecord
+            or None for players whose data could not be fetched.
+    """
+
+    context = context or ac.get_default()
+    parse_pool = context.parse_pool
+    if parse_pool is None:
+        fetched_players = fetch_players(server, community, player_ids, requests_per_second, max_in_flight, context)
+        return pr.parse_players(fetched_players)
+
+    bucket = rl.TokenBucket(requests_per_second)
+
+    def fetch(player_id):
+        bucket.acquire()
+        try:
+            content = ap.get_player_content(server, community, player_id, context)
+            return parse_pool.run(pp.parse_player, content) if content is not None else None
+        except Exception as exception:
+            logging.warning(f'Calling enrich_players(): player {player_id}: {exception}')
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as executor:
+        records = list(executor.map(fetch, player_ids))
+    return list(zip(player_ids, records))
@@ -0,0 +1,249 @@
+# Load necessary modules
+import os
+import json
+import logging
+import struct
+from array import array
+
+# Binary players file layout: magic, format version, entry count, API timestamp, then sorted little-endian uint32 IDs
+# Version 1 files have no timestamp field
+INDEX_MAGIC = b'CNPI'
+INDEX_VERSION = 2
+INDEX_HEADERS = {
+    1: struct.Struct('<4sII'),
+    2: struct.Struct('<4sIIq'),
+}
+
+
+class PlayerIndex:
+    """
+    Set of known player IDs kept as integers.
+
+    IDs are stored in an in-memory set for O(1) membership tests and persisted as a sorted array('I')
+    so the file on disk takes 4 bytes per player instead of a quoted JSON string.
+    The optional timestamp is the API timestamp the index was last committed at.
+    """
+
+    def __init__(self, player_ids=(), timestamp=None):
+        self._ids = set(int(player_id) for player_id in player_ids)
+        self.timestamp = timestamp
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, player_id):
+        return int(player_id) in self._ids
+
+    def __iter__(self):
+        return iter(sorted(self._ids))
+
+    def add(self, player_id):
+        """
+        Add a player ID to the index.
+
+        Args:
+            player_id (str | int): The ID of the player (e.g., '142515', 108794).
+
+        Returns: None.
+        """
+
+        self._ids.add(int(player_id))
+
+    def update(self, player_ids):
+        """
+        Add several player IDs to the index.
+
+        Args:
+            player_ids (iterable): Player IDs as str or int.
+
+        Returns: None.
+        """
+
+        self._ids.update(int(player_id) for player_id in player_ids)
+
+    def diff(self, current_ids):
+        """
+        Compare the index against a fresh list of player IDs in linear time.
+
+        Args:
+            current_ids (iterable): Player IDs as str or int, typically from get_player_ids().
+
+        Returns:
+            tuple: (added, removed) where added keeps the order of current_ids (as str)
+                and removed is sorted (as str).
+        """
+
+        seen = set()
+        added = []
+        for player_id in current_ids:
+            player_int = int(player_id)
+            if player_int in seen:
+                continue
+            seen.add(player_int)
+            if player_int not in self._ids:
+                added.append(str(player_int))
+        removed = [str(player_int) for player_int in sorted(self._ids - seen)]
+        return added, removed
+
+    def to_array(self):
+        """
+        Return the index as a sorted array of unsigned 32-bit integers.
+
+        Returns:
+            array.array: Sorted player IDs (typecode 'I').
+        """
+
+        return array('I', sorted(self._ids))
+
+    def to_bytes(self):
+        """
+        Serialize the index to the binary players file format.
+
+        Returns:
+            bytes: Header followed by the sorted IDs.
+        """
+
+        ids = self.to_array()
+        timestamp = -1 if self.timestamp is None else int(self.timestamp)
+        header = INDEX_HEADERS[INDEX_VERSION].pack(INDEX_MAGIC, INDEX_VERSION, len(ids), timestamp)
+        return header + _to_little_endian(ids).tobytes()
+
+    def save(self, path):
+        """
+        Write the index to a binary players file.
+
+        Args:
+            path (str): Destination file path (e.g., '../data/123_fr_players.bin').
+
+        Returns: None.
+        """
+
+        with open(path, 'wb') as index_file:
+            index_file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read an index from a binary players file.
+
+        Args:
+            path (str): Source file path.
+
+        Raises:
+            ValueError: If the file is not a valid binary players file.
+
+        Returns:
+            PlayerIndex: The loaded index.
+        """
+
+        with open(path, 'rb') as index_file:
+            data = index_file.read()
+        return cls.from_bytes(data)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Build an index from the content of a binary players file.
+
+        Args:
+            data (bytes): Raw file content.
+
+        Raises:
+            ValueError: If the header or payload size is invalid.
+
+        Returns:
+            PlayerIndex: The decoded index.
+        """
+
+        if len(data) < INDEX_HEADERS[1].size:
+            raise ValueError('Players index is truncated')
+        magic, version, count = INDEX_HEADERS[1].unpack_from(data)
+        if magic != INDEX_MAGIC or version not in INDEX_HEADERS:
+            raise ValueError(f'Unsupported players index header: {magic!r} v{version}')
+        header = INDEX_HEADERS[version]
+        if len(data) < header.size:
+            raise ValueError('Players index is truncated')
+        timestamp = header.unpack_from(data)[3] if version >= 2 else -1
+        payload = data[header.size:]
+        if len(payload) != count * 4:
+            raise ValueError(f'Players index holds {len(payload)} bytes, expected {count * 4}')
+        ids = array('I')
+        ids.frombytes(payload)
+        index = cls(timestamp=None if timestamp < 0 else timestamp)
+        index._ids = set(_to_little_endian(ids))
+        return index
+
+    @classmethod
+    def from_json(cls, path):
+        """
+        Build an index from a legacy JSON players file (a list of ID strings).
+
+        Args:
+            path (str): Source JSON file path.
+
+        Returns:
+            PlayerIndex: The decoded index.
+        """
+
+        with open(path, 'r') as players_file:
+            return cls(json.load(players_file))
+
+
+def _to_little_endian(ids):
+    # array('I') uses native byte order, the file format is little-endian
+    if struct.pack('=I', 1) == struct.pack('<I', 1):
+        return ids
+    swapped = array(ids.typecode, ids)
+    swapped.byteswap()
+    return swapped
+
+
+def get_index_path(data_dir, server, community):
+    """
+    Build the path of the binary players file of a server.
+
+    Args:
+        data_dir (str): The data directory (e.g., '../data').
+
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+    Returns:
+        str: Path of the binary players file.
+    """
+
+    return f'{data_dir}/{server}_{community}_players.bin'
+
+
+def load_player_index(data_dir, server, community):
+    """
+    Load the known players of a server, migrating the legacy JSON file if needed.
+
+    The first time it runs against a data directory that only holds {server}_{community}_players.json,
+    the JSON list is converted and written to {server}_{community}_players.bin.
+    The JSON file is left untouched so the migration can be rolled back.
+
+    Args:
+        data_dir (str): The data directory (e.g., '../data').
+
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+    Raises:
+        FileNotFoundError: If neither the binary nor the JSON players file exists.
+
+    Returns:
+        PlayerIndex: The known players.
+    """
+
+    index_path = get_index_path(data_dir, server, community)
+    if os.path.exists(index_path):
+        return PlayerIndex.load(index_path)
+
+    json_path = f'{data_dir}/{server}_{community}_players.json'
+    logging.info(f'Migrating {json_path} to {index_path}')
+    index = PlayerIndex.from_json(json_path)
+    index.save(index_path)
+    return index
@@ -0,0 +1,178 @@
+# Load necessary modules
+import logging
+from collections import namedtuple
+
+# Number of highscore types listed in playerData.xml (see api_parsing.get_highscore_api())
+HIGHSCORE_TYPE_COUNT = 12
+
+MILITARY_TYPE = 3
+
+Moon = namedtuple('Moon', ('id', 'name', 'size'))
+
+Planet = namedtuple('Planet', ('id', 'name', 'coords', 'moon'))
+
+Alliance = namedtuple('Alliance', ('id', 'name', 'tag'))
+
+
+class PlayerRecord(namedtuple('PlayerRecord', ('id', 'name', 'timestamp', 'positions', 'scores', 'ships', 'planets', 'alliance'))):
+    """
+    Everything OGame player API tells about a player, shared by enrichment, payload formatting and storage.
+
+    Attributes:
+        id (int): The player ID.
+
+        name (str): The player name.
+
+        timestamp (int): Epoch unix timestamp of the API document, None if unknown.
+
+        positions (tuple): Position per highscore type (indexed by type), None where the player is not ranked.
+
+        scores (tuple): Score per highscore type (indexed by type), None where the player is not ranked.
+
+        ships (int): Ship count from the military highscore, 0 if not reported.
+
+        planets (tuple): Planet tuples in API order, the first one being the home planet.
+
+        alliance (Alliance): The alliance of the player, None if they have none.
+    """
+
+    __slots__ = ()
+
+    @property
+    def home(self):
+        return self.planets[0].coords if self.planets else None
+
+    @property
+    def military_points(self):
+        return self.scores[MILITARY_TYPE]
+
+    @property
+    def ship_count(self):
+        return self.ships
+
+    @property
+    def moons(self):
+        return tuple(planet.moon for planet in self.planets if planet.moon is not None)
+
+    @classmethod
+    def partial(cls, player_id, name, home, military_points, ship_count, timestamp=None):
+        """
+        Build a record from the few fields the bulk APIs provide.
+
+        Args:
+            player_id (str | int): The player ID.
+
+            name (str): The player name.
+
+            home (str): Coordinates of the home planet (e.g. '3:420:12').
+
+            military_points (int): Military score.
+
+            ship_count (int): Ship count.
+
+            timestamp (int): Epoch unix timestamp of the data, if known.
+
+        Returns:
+            PlayerRecord: The record, with every other highscore type unknown and a single planet.
+        """
+
+        scores = [None] * HIGHSCORE_TYPE_COUNT
+        scores[MILITARY_TYPE] = military_points
+        planets = (Planet(None, None, home, None),) if home is not None else ()
+        return cls(int(player_id), name, timestamp, (None,) * HIGHSCORE_TYPE_COUNT, tuple(scores), ship_count or 0, planets, None)
+
+
+def parse_player(xml_tree):
+    """
+    Parse an OGame player API document in a single pass.
+
+    Positions are matched on their type attribute and planets on their tag, so the document layout may change
+    order without breaking the parser.
+
+    Args:
+        xml_tree (xml.etree.ElementTree.Element): Whole playerData.xml document as a tree.
+
+    Returns if success:
+        PlayerRecord: The parsed record.
+
+    Returns if failure (missing player ID or name):
+        NoneType: None
+    """
+
+    attrib = xml_tree.attrib
+    player_id = to_int(attrib.get('id'))
+    name = attrib.get('name')
+    if player_id is None or name is None:
+        logging.warning('Calling parse_player(): Attribute "id" or "name" not found in XML tree')
+        return None
+
+    positions = [None] * HIGHSCORE_TYPE_COUNT
+    scores = [None] * HIGHSCORE_TYPE_COUNT
+    ships = 0
+    planets = []
+    alliance = None
+    for child in xml_tree:
+        if child.tag == 'positions':
+            for position in child:
+                highscore_type = to_int(position.get('type'))
+                if highscore_type is None or not 0 <= highscore_type < HIGHSCORE_TYPE_COUNT:
+                    continue
+                positions[highscore_type] = to_int(position.text)
+                scores[highscore_type] = to_int(position.get('score'))
+                if highscore_type == MILITARY_TYPE:
+                    ships = to_int(position.get('ships')) or 0
+        elif child.tag == 'planets':
+            for planet in child:
+                moon = planet.find('moon')
+                if moon is not None:
+                    moon = Moon(to_int(moon.get('id')), moon.get('name'), to_int(moon.get('size')))
+                planets.append(Planet(to_int(planet.get('id')), planet.get('name'), planet.get('coords'), moon))
+        elif child.tag == 'alliance':
+            alliance = Alliance(to_int(child.get('id')), child.findtext('name'), child.findtext('tag'))
+
+    return PlayerRecord(
+        player_id, name, to_int(attrib.get('timestamp')), tuple(positions), tuple(scores), ships, tuple(planets), alliance,
+    )
+
+
+def parse_players(fetched_players):
+    """
+    Parse a batch of OGame player API documents.
+
+    Args:
+        fetched_players (iterable): (player_id, xml_tree) tuples as returned by player_fetcher.fetch_players(),
+            xml_tree being None for players whose data could not be fetched.
+
+    Returns:
+        list: (player_id, record) tuples in the same order, record being None for missing or unparsable documents.
+    """
+
+    parsed_players = []
+    for player_id, xml_tree in fetched_players:
+        record = parse_player(xml_tree) if xml_tree is not None else None
+        parsed_players.append((player_id, record))
+    return parsed_players
+
+
+def to_int(value):
+    """
+    Convert an OGame API attribute to an integer, shared by every parser so a value parses the same on every path.
+
+    Args:
+        value (str): The attribute value (e.g., '1234', '1234.0'), None if missing.
+
+    Returns if success:
+        int: The value.
+
+    Returns if failure:
+        NoneType: None
+    """
+
+    # Scores are integers, the float conversion is only a fallback for values like '1234.0'
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError, OverflowError):
+            return None
@@ -0,0 +1,44 @@
+# Load necessary modules
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting how many requests per second are sent.
+
+    Args:
+        rate (float): Tokens added per second, i.e. the sustained request rate.
+
+        burst (int): Maximum number of tokens that can accumulate, i.e. the largest allowed burst.
+    """
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError(f'rate must be positive, got {rate}')
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a token is available, then consume it.
+
+        Returns:
+            float: Time (in seconds) spent waiting.
+        """
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
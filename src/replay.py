@@ -0,0 +1,253 @@
+# Load necessary modules
+import time
+import bisect
+import logging
+import argparse
+import tempfile
+import xml.etree.ElementTree as et
+import app_context as ac
+import api_archive as aa
+import api_parsing as ap
+import check_newcomers as cn
+import player_index as pi
+import retry_policy as rp
+import state_store as ss
+
+# Archived endpoint whose updates drive the replay, the one check_newcomers.py polls
+HIGHSCORE_ENDPOINT = 'highscore.xml?category=1&type=3'
+
+# Nothing is sent over the network during a replay, so the player API pacing is lifted
+REPLAY_REQUESTS_PER_SECOND = 1e9
+
+
+def main():
+    arguments = get_arguments()
+    logging.basicConfig(level=logging.INFO if arguments.verbose else logging.WARNING, format='%(asctime)s %(levelname)s %(message)s')
+    context = ac.load()
+    if arguments.archive_dir:
+        archive = aa.ApiArchive(arguments.archive_dir)
+    else:
+        archive = context.archive
+    if archive is None:
+        raise SystemExit('replay.py: no archive, set archive_dir in [ARCHIVE] or pass --archive-dir')
+    if arguments.enrichment:
+        context.enrichment = arguments.enrichment
+    if arguments.streaming_parse:
+        context.streaming_parse = True
+
+    started = time.perf_counter()
+    updates = reports = 0
+    updates_replayed = replay(
+        archive, arguments.server, arguments.community, arguments.since, arguments.until, context, arguments.sqlite_path,
+    )
+    for timestamp, payload in updates_replayed:
+        updates += 1
+        if payload is False:
+            continue
+        reports += 1
+        for message in [payload] if isinstance(payload, str) else payload:
+            print(message)
+    print(f'Replayed {updates} updates ({reports} reports) in {time.perf_counter() - started:.2f}s')
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser(usage='python3 replay.py -s|--server -c|--community [--archive-dir] [--since] [--until] [--enrichment] [--streaming-parse] [--sqlite-path] [-v] [-h|--help]')
+    parser.add_argument('-s', '--server', help='Server ID', required=True)
+    parser.add_argument('-c', '--community', help='Community ID', required=True)
+    parser.add_argument('--archive-dir', help='Archive to replay, archive_dir of [ARCHIVE] by default')
+    parser.add_argument('--since', type=int, help='First API timestamp to replay (the update before it seeds the known players)')
+    parser.add_argument('--until', type=int, help='Last API timestamp to replay')
+    parser.add_argument('--enrichment', choices=('player', 'bulk'), help='Enrichment strategy, the configured one by default')
+    parser.add_argument('--streaming-parse', action='store_true', help='Parse the highscore as a stream')
+    parser.add_argument('--sqlite-path', default='', help='History database to record the replayed updates in, none by default')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Log every cycle')
+    return parser.parse_args()
+
+
+class ArchivedResponse:
+    """
+    Archived response body dressed as the requests.Response subset the fetchers use.
+
+    Args:
+        content (bytes): The response body.
+
+        status_code (int): The HTTP status.
+    """
+
+    def __init__(self, content=b'', status_code=200):
+        self.content = content
+        self.status_code = status_code
+        self.headers = {}
+
+    def iter_content(self, chunk_size=65536):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+class ArchiveClient:
+    """
+    Stand-in for http_client.HttpClient answering from an archive as it was at one point of the replay.
+
+    Every endpoint is answered with its latest response fetched before until, so a replayed cycle sees the documents
+    the live cycle fetched, and nothing fetched later. Endpoints never archived by then get a 404.
+
+    Args:
+        archive (api_archive.ApiArchive): The archive.
+
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+    """
+
+    def __init__(self, archive, server, community):
+        self.archive = archive
+        self.until = float('inf')
+        self._fetched_at = {}
+        self._digests = {}
+        for entry in sorted(archive.entries(server, community), key=lambda entry: entry['fetched_at']):
+            self._fetched_at.setdefault(entry['endpoint'], []).append(entry['fetched_at'])
+            self._digests.setdefault(entry['endpoint'], []).append(entry['digest'])
+
+    def get(self, url, headers=None, stream=False):
+        endpoint = url.rsplit('/', 1)[-1]
+        position = bisect.bisect_left(self._fetched_at.get(endpoint, ()), self.until)
+        if position == 0:
+            return ArchivedResponse(status_code=404)
+        return ArchivedResponse(self.archive.read(self._digests[endpoint][position - 1]))
+
+    def close(self):
+        pass
+
+
+def get_updates(archive, server, community):
+    """
+    List the archived updates of the highscore polled by check_newcomers.py.
+
+    Args:
+        archive (api_archive.ApiArchive): The archive.
+
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+    Returns:
+        list: Index entries sorted by API timestamp, the first fetch of every timestamp only.
+    """
+
+    updates = {}
+    for entry in sorted(archive.entries(server, community, HIGHSCORE_ENDPOINT), key=lambda entry: entry['fetched_at']):
+        if entry['timestamp'] is not None:
+            updates.setdefault(entry['timestamp'], entry)
+    return [updates[timestamp] for timestamp in sorted(updates)]
+
+
+def replay(archive, server, community, since=None, until=None, context=None, sqlite_path=''):
+    """
+    Run the check_newcomers.py cycles of a server over archived API responses, offline.
+
+    The update before the first replayed one seeds the known players, then every archived update goes through
+    check_newcomers.check_target() with the state kept in memory (in a temporary directory, the real state files
+    are left untouched) and the API served from the archive, without pacing or retries.
+
+    Args:
+        archive (api_archive.ApiArchive): The archive.
+
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        since (int): First API timestamp to replay, None for the second archived update.
+
+        until (int): Last API timestamp to replay, None for the last archived update.
+
+        context (app_context.AppContext): Settings to replay with (enrichment, streaming_parse),
+            the default context if None. Its archive and HTTP client are not used.
+
+        sqlite_path (str): History database to record the replayed updates in, empty to disable it
+            (the history of the bot is not used, replayed updates would be recorded twice).
+
+    Returns:
+        generator: (timestamp, payload) tuples, payload as returned by check_newcomers.check_target().
+    """
+
+    context = context or ac.get_default()
+    updates = get_updates(archive, server, community)
+    first = 1 if since is None else max(1, bisect.bisect_left([update['timestamp'] for update in updates], since))
+    if first >= len(updates):
+        logging.warning(f'Calling replay(): Not enough archived updates for {server}_{community}')
+        return
+
+    client = ArchiveClient(archive, server, community)
+    with tempfile.TemporaryDirectory() as data_dir:
+        replay_context = make_replay_context(context, data_dir, client, sqlite_path)
+        state = seed_state(archive, updates[first - 1], data_dir, server, community)
+        try:
+            for position in range(first, len(updates)):
+                timestamp = updates[position]['timestamp']
+                if until is not None and timestamp > until:
+                    break
+                # Serve what was fetched up to the next update, i.e. during the live cycle of this one
+                client.until = updates[position + 1]['fetched_at'] if position + 1 < len(updates) else float('inf')
+                yield timestamp, cn.check_target(server, community, data_dir, None, replay_context, state)
+        finally:
+            state.close()
+
+
+def make_replay_context(context, data_dir, client, sqlite_path=''):
+    """
+    Derive the context of a replay from the one of the bot.
+
+    Args:
+        context (app_context.AppContext): The bot context.
+
+        data_dir (str): The temporary data directory of the replay.
+
+        client (ArchiveClient): The client serving the archive.
+
+        sqlite_path (str): History database of the replay, empty to disable it.
+
+    Returns:
+        app_context.AppContext: A context reading from the archive, without archiving nor pacing.
+    """
+
+    config = {section: values for section, values in context.config.items() if section != 'ARCHIVE'}
+    replay_context = ac.AppContext(config, client=client, retry=rp.RetryPolicy(max_retries=0))
+    replay_context.data_dir = data_dir
+    replay_context.enrichment = context.enrichment
+    replay_context.streaming_parse = context.streaming_parse
+    replay_context.sqlite_path = sqlite_path
+    replay_context.requests_per_second = REPLAY_REQUESTS_PER_SECOND
+    return replay_context
+
+
+def seed_state(archive, update, data_dir, server, community):
+    """
+    Build the known players state of an archived update.
+
+    Args:
+        archive (api_archive.ApiArchive): The archive.
+
+        update (dict): Index entry of the highscore update.
+
+        data_dir (str): The data directory of the replay.
+
+        server (str): The OGame server number (e.g., '123', '260').
+
+        community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+    Returns:
+        state_store.StateStore: The state, committed at the timestamp of the update.
+    """
+
+    player_ids = ap.get_player_ids(et.fromstring(archive.read(update['digest'])))
+    state = ss.StateStore(data_dir, server, community)
+    state.players = pi.PlayerIndex(player_ids)
+    state.commit(update['timestamp'])
+    return state
+
+
+if __name__ == '__main__':
+    main()
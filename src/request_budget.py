@@ -0,0 +1,242 @@
+# Load necessary modules
+import os
+import time
+import struct
+import logging
+import argparse
+import tempfile
+import threading
+from urllib.parse import urlparse
+import metrics
+
+# File locks are only available on POSIX, elsewhere the budget is shared by the threads of one process only
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Default settings, overridable from the [BUDGET] section of config.toml
+DEFAULT_ENABLED = True
+DEFAULT_REQUESTS_PER_SECOND = 10.0
+DEFAULT_BURST = 20
+
+# Directory shared by every bot of the machine, whatever their checkout
+DEFAULT_BUDGET_DIR = os.path.join(tempfile.gettempdir(), 'check_newcomers_budget')
+
+# Bucket file layout: tokens, last refill (epoch unix time), requests granted and seconds waited by every process
+STATE_FORMAT = struct.Struct('<ddQd')
+
+
+class SharedTokenBucket:
+    """
+    Token bucket stored in a file, shared by every process of the machine opening the same file.
+
+    Each acquisition locks the file (flock), refills the tokens from the wall clock, takes one token and writes
+    the state back, so the sustained rate of all processes together never exceeds rate.
+    The file also accumulates how many requests were granted and how long callers waited, for every process.
+
+    Args:
+        path (str): The bucket file, created if needed.
+
+        rate (float): Tokens added per second, i.e. the sustained request rate of all processes together.
+
+        burst (int): Maximum number of tokens that can accumulate.
+    """
+
+    def __init__(self, path, rate=DEFAULT_REQUESTS_PER_SECOND, burst=DEFAULT_BURST):
+        if rate <= 0:
+            raise ValueError(f'rate must be positive, got {rate}')
+        self.path = path
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        # flock is held per open file, the threads of this process also need to take turns
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a token is available, then consume it.
+
+        Returns:
+            float: Time (in seconds) spent waiting.
+        """
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._lock_file()
+                try:
+                    tokens, updated, acquired, total_wait = self._read()
+                    now = time.time()
+                    # A clock going backwards must not create tokens
+                    tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+                    if tokens >= 1:
+                        self._write(tokens - 1, now, acquired + 1, total_wait + waited)
+                        return waited
+                    self._write(tokens, now, acquired, total_wait)
+                    delay = (1 - tokens) / self.rate
+                finally:
+                    self._unlock_file()
+            time.sleep(delay)
+            waited += delay
+
+    def state(self):
+        """
+        Read the shared state of the bucket.
+
+        Returns:
+            dict: tokens and updated (left by the last request), acquired and waited (totals of every process).
+        """
+
+        with self._lock:
+            self._lock_file()
+            try:
+                tokens, updated, acquired, total_wait = self._read()
+            finally:
+                self._unlock_file()
+        return {'tokens': tokens, 'updated': updated, 'acquired': acquired, 'waited': total_wait}
+
+    def close(self):
+        os.close(self._fd)
+
+    def _read(self):
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        data = os.read(self._fd, STATE_FORMAT.size)
+        if len(data) < STATE_FORMAT.size:
+            # New (or torn) file: start full
+            return float(self.burst), time.time(), 0, 0.0
+        return STATE_FORMAT.unpack(data)
+
+    def _write(self, tokens, updated, acquired, total_wait):
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.write(self._fd, STATE_FORMAT.pack(tokens, updated, acquired, total_wait))
+
+    def _lock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def _unlock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+class RequestBudget:
+    """
+    Per-host request budgets shared across processes, drawn from before every OGame API request.
+
+    Every universe is its own host ('s123-fr.ogame.gameforge.com'), so each one gets its own bucket file
+    ({budget_dir}/{host}.bucket) and bots watching different universes do not slow each other down.
+
+    Args:
+        budget_dir (str): Directory of the bucket files, the same for every bot of the machine.
+
+        rate (float): Sustained requests per second allowed per host, all processes together.
+
+        burst (int): Requests per host that may be sent at once after an idle period.
+    """
+
+    def __init__(self, budget_dir=DEFAULT_BUDGET_DIR, rate=DEFAULT_REQUESTS_PER_SECOND, burst=DEFAULT_BURST):
+        self.budget_dir = budget_dir
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+        os.makedirs(budget_dir, exist_ok=True)
+        if fcntl is None:
+            logging.warning('File locks are not available, the request budget is not shared with other processes')
+
+    def bucket(self, host):
+        """
+        Return the bucket of a host, opening its file if needed.
+
+        Args:
+            host (str): The host name (e.g., 's123-fr.ogame.gameforge.com').
+
+        Returns:
+            SharedTokenBucket: The bucket of the host.
+        """
+
+        with self._lock:
+            if host not in self._buckets:
+                file_name = ''.join(character if character.isalnum() or character in '.-' else '_' for character in host)
+                self._buckets[host] = SharedTokenBucket(os.path.join(self.budget_dir, f'{file_name}.bucket'), self.rate, self.burst)
+            return self._buckets[host]
+
+    def acquire(self, url):
+        """
+        Wait for the budget of the host of a URL to allow one more request.
+
+        Args:
+            url (str): The URL about to be fetched.
+
+        Returns:
+            float: Time (in seconds) spent waiting.
+        """
+
+        host = urlparse(url).netloc
+        waited = self.bucket(host).acquire()
+        metrics.registry.inc('api_budget_requests_total', host=host)
+        metrics.registry.observe('api_budget_wait_seconds', waited, host=host)
+        if waited:
+            metrics.registry.inc('api_budget_waited_seconds_total', waited, host=host)
+        return waited
+
+    def close(self):
+        with self._lock:
+            for bucket in self._buckets.values():
+                bucket.close()
+            self._buckets = {}
+
+
+def from_config(config):
+    """
+    Build a RequestBudget from a parsed config.toml.
+
+    Args:
+        config (dict): The parsed configuration file.
+
+    Returns if enabled in [BUDGET]:
+        RequestBudget: A budget using the [BUDGET] settings, defaults for missing keys.
+
+    Returns if the budget is disabled or its directory cannot be created:
+        NoneType: None
+    """
+
+    # Extract configuration parameters: switch, bucket files directory (empty for the machine wide default), rate and burst per host
+    budget_config = config.get('BUDGET', {})
+    if not budget_config.get('enabled', DEFAULT_ENABLED):
+        return None
+    try:
+        return RequestBudget(
+            budget_config.get('budget_dir') or DEFAULT_BUDGET_DIR,
+            rate=budget_config.get('requests_per_second', DEFAULT_REQUESTS_PER_SECOND),
+            burst=budget_config.get('burst', DEFAULT_BURST),
+        )
+    except OSError as error:
+        logging.warning(f'Request budget disabled, unable to use its directory: {error}')
+        return None
+
+
+def main():
+    # Show the shared budgets of the machine: tokens left by the last request, requests granted and time waited by every bot
+    parser = argparse.ArgumentParser(usage='python3 request_budget.py [-d|--budget-dir] [-h|--help]')
+    parser.add_argument('-d', '--budget-dir', default=DEFAULT_BUDGET_DIR, help='Directory of the bucket files')
+    budget_dir = parser.parse_args().budget_dir
+    if not os.path.isdir(budget_dir):
+        print(f'No budget in {budget_dir}')
+        return
+    print(f'{"host":<40} {"tokens left":>11} {"last request":>13} {"requests":>10} {"waited (s)":>11}')
+    for file_name in sorted(os.listdir(budget_dir)):
+        if not file_name.endswith('.bucket'):
+            continue
+        bucket = SharedTokenBucket(os.path.join(budget_dir, file_name))
+        try:
+            state = bucket.state()
+        finally:
+            bucket.close()
+        last_request = f'{time.time() - state["updated"]:.0f}s ago'
+        print(f'{file_name[:-len(".bucket")]:<40} {state["tokens"]:>11.1f} {last_request:>13} {state["acquired"]:>10} {state["waited"]:>11.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+# Load necessary modules
+import time
+import random
+import logging
+import threading
+import email.utils
+from urllib.parse import urlparse
+import metrics
+
+# Default settings, overridable from the [RETRY] section of config.toml
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 2
+DEFAULT_MAX_DELAY = 300
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 300
+
+# Client errors worth retrying, every other 4xx fails immediately
+RETRYABLE_CLIENT_ERRORS = (408, 425, 429)
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker.
+
+    After failure_threshold consecutive failures the circuit opens and requests fail fast for reset_timeout seconds.
+    Then a single trial request is let through (half-open): its success closes the circuit, its failure opens it again.
+
+    Args:
+        failure_threshold (int): Consecutive failures that open the circuit.
+
+        reset_timeout (float): Seconds the circuit stays open before a trial request is allowed.
+    """
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return 'open'
+        return 'half-open'
+
+    def allow(self):
+        """
+        Tell whether a request may be sent.
+
+        Returns:
+            bool: False while the circuit is open or a half-open trial is already running.
+        """
+
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class RetryPolicy:
+    """
+    Retry policy shared by every OGame API fetch.
+
+    Server errors (5xx), throttling (429), timeouts and connection errors are retried with exponential backoff
+    and full jitter, honoring Retry-After when the server sends one.
+    Other client errors (4xx) are not retried. Each host has its own circuit breaker so a dead universe fails fast
+    instead of stalling the callers.
+
+    Args:
+        max_retries (int): Retries after the first attempt.
+
+        base_delay (float): Backoff delay (in seconds) before the first retry, doubled at every retry.
+
+        max_delay (float): Largest delay (in seconds) between two attempts.
+
+        failure_threshold (int): Consecutive failures that open the circuit of a host.
+
+        reset_timeout (float): Seconds a circuit stays open.
+
+        budget (request_budget.RequestBudget): Per-host budget shared across processes, drawn from before every attempt.
+            None sends requests without waiting for one.
+    """
+
+    def __init__(
+        self,
+        max_retries=DEFAULT_MAX_RETRIES,
+        base_delay=DEFAULT_BASE_DELAY,
+        max_delay=DEFAULT_MAX_DELAY,
+        failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout=DEFAULT_RESET_TIMEOUT,
+        budget=None,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.budget = budget
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, host):
+        """
+        Return the circuit breaker of a host, creating it if needed.
+
+        Args:
+            host (str): The host name (e.g., 's123-fr.ogame.gameforge.com').
+
+        Returns:
+            CircuitBreaker: The breaker of the host.
+        """
+
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[host]
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        Compute the delay before the next attempt.
+
+        Args:
+            attempt (int): Number of attempts already made (1 after the first failure).
+
+            retry_after (float): Delay requested by the server, if any.
+
+        Returns:
+            float: Delay in seconds.
+        """
+
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def fetch(self, client, url, headers=None, stream=False):
+        """
+        Send a GET request, retrying it according to the policy.
+
+        Args:
+            client (http_client.HttpClient): The client used to send the request.
+
+            url (str): The URL to fetch.
+
+            headers (dict): Extra request headers.
+
+            stream (bool): Whether to defer downloading the response body.
+
+        Raises: None.
+
+        Returns if success:
+            requests.Response: A 200 or 304 response.
+
+        Returns if failure (client error, retries exhausted or circuit open):
+            NoneType: None
+        """
+
+        # Already loaded by the client, imported here so that importing this module stays cheap
+        import requests
+
+        parsed_url = urlparse(url)
+        host = parsed_url.netloc
+        endpoint = parsed_url.path.rsplit('/', 1)[-1]
+        breaker = self.breaker(host)
+        attempt = 0
+
+        while True:
+            if not breaker.allow():
+                logging.warning(f'Calling fetch(): Circuit open for {host}, failing fast')
+                metrics.registry.inc('api_circuit_rejections_total', host=host)
+                return None
+
+            retry_after = None
+            if self.budget is not None:
+                # Retries count too, they are what a struggling server sees the most of
+                self.budget.acquire(url)
+            try:
+                with metrics.registry.timer('api_request_seconds', endpoint=endpoint):
+                    response = client.get(url, headers=headers, stream=stream)
+                metrics.registry.inc('api_requests_total', endpoint=endpoint, status=response.status_code)
+                if response.status_code in (200, 304):
+                    breaker.record_success()
+                    if not stream:
+                        metrics.registry.inc('api_bytes_total', wire_bytes(response), endpoint=endpoint)
+                    return response
+                response.close()
+                if 400 <= response.status_code < 500 and response.status_code not in RETRYABLE_CLIENT_ERRORS:
+                    # The host answered, the request itself is wrong: retrying will not help
+                    breaker.record_success()
+                    logging.warning(f'Calling fetch(): {response.status_code} for {url}, not retrying')
+                    return None
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                logging.warning(f'Calling fetch(): {response.status_code} for {url}')
+            except requests.exceptions.RequestException as exception:
+                logging.warning(f'Calling fetch(): {exception}')
+                metrics.registry.inc('api_requests_total', endpoint=endpoint, status=type(exception).__name__)
+
+            breaker.record_failure()
+            if breaker.state == 'open':
+                logging.warning(f'Calling fetch(): Circuit opened for {host} after {breaker.failures} failures')
+                return None
+            attempt += 1
+            if attempt > self.max_retries:
+                logging.warning(f'Reached maximum retry limit ({self.max_retries}) for {url}')
+                return None
+            delay = self.backoff(attempt, retry_after)
+            metrics.registry.inc('api_retries_total', endpoint=endpoint)
+            logging.warning(f'Waiting {delay:.1f}s and trying again ({attempt}/{self.max_retries})')
+            time.sleep(delay)
+
+
+def wire_bytes(response):
+    """
+    Count the bytes of a response body as they came over the connection, i.e. still gzipped when it was.
+
+    Args:
+        response (requests.Response): The response, with its body read.
+
+    Returns:
+        int: Bytes read from the connection, the decoded body size for responses not backed by one.
+    """
+
+    tell = getattr(getattr(response, 'raw', None), 'tell', None)
+    if tell is None:
+        return len(response.content)
+    return tell()
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header.
+
+    Args:
+        value (str): Header value, either delay-seconds or an HTTP date.
+
+    Returns if success:
+        float: Delay in seconds (never negative).
+
+    Returns if missing or invalid:
+        NoneType: None
+    """
+
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def from_config(config):
+    """
+    Build a RetryPolicy from a parsed config.toml.
+
+    Args:
+        config (dict): The parsed configuration file.
+
+    Returns:
+        RetryPolicy: A policy using the [RETRY] settings, defaults for missing keys, drawing from the [BUDGET] request budget.
+    """
+
+    # Only loaded with a configuration, a bare RetryPolicy has no budget
+    import request_budget as rb
+    retry_config = config.get('RETRY', {})
+    return RetryPolicy(
+        max_retries=retry_config.get('max_retries', DEFAULT_MAX_RETRIES),
+        base_delay=retry_config.get('base_delay', DEFAULT_BASE_DELAY),
+        max_delay=retry_config.get('max_delay', DEFAULT_MAX_DELAY),
+        failure_threshold=retry_config.get('failure_threshold', DEFAULT_FAILURE_THRESHOLD),
+        reset_timeout=retry_config.get('reset_timeout', DEFAULT_RESET_TIMEOUT),
+        budget=rb.from_config(config),
+    )
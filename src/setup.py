@@ -1,33 +1,81 @@
 import argparse
 import os
 import toml
-import requests
-import xml.etree.ElementTree as et
+import app_context as ac
+import api_parsing as ap
+import bootstrap as bs
+import http_client as hc
 import json
 import shutil
-
-os.chdir(f'{os.path.dirname(__file__)}')
+import logging
 
 
 def main():
-    server, community, webhook = get_arguments()
+    os.chdir(f'{os.path.dirname(os.path.abspath(__file__))}')
+    arguments = get_arguments()
+    if arguments.targets or arguments.servers_file:
+        bulk_bootstrap(arguments)
+        return
+    server, community, webhook = arguments.server, arguments.community, arguments.webhook
+    if not (server and community and webhook):
+        raise SystemExit('setup.py: -s, -c and -w are required without --targets or --servers-file')
+
+    # Fetch the players first, with the API base URL, HTTP, retry and budget settings the bot will use,
+    # so a failure leaves the checkout untouched and the set up can simply be run again
+    context = ac.load()
+    try:
+        api = ap.get_highscore_api(server, community, '1', '3', context=context)
+    finally:
+        context.close()
+    if api is None:
+        raise SystemExit(f'setup.py: unable to fetch the highscore of {server}_{community}, check the server and community')
+    player_list = ap.get_player_ids(api)
+
     rename_files(server, community)
     update_config_file(server, community, webhook)
-    api = get_highscore_api(server, community, 1, 3)
-    player_list = get_player_ids(api)
     update_players_file(server, community, player_list)
     finalize_directory(server, community)
 
 
 def get_arguments():
-    parser = argparse.ArgumentParser(usage='python3 setup.py -s|--server -c|--community -w|--webhook [-h|--help]')
-    parser.add_argument('-s', '--server', help='Server ID', required=True)
-    parser.add_argument('-c', '--community', help='Community ID', required=True)
-    parser.add_argument('-w', '--webhook', help='Webhook URL', required=True)
-    server = parser.parse_args().server
-    community = parser.parse_args().community
-    webhook = parser.parse_args().webhook
-    return server, community, webhook
+    parser = argparse.ArgumentParser(
+        usage='python3 setup.py -s|--server -c|--community -w|--webhook [-h|--help]\n'
+              '       python3 setup.py --targets SERVER:COMMUNITY[:WEBHOOK] ... | --servers-file FILE [-c|--community] [-w|--webhook] [--workers] [--reseed]'
+    )
+    parser.add_argument('-s', '--server', help='Server ID')
+    parser.add_argument('-c', '--community', help='Community ID (with --servers-file: only keep this community)')
+    parser.add_argument('-w', '--webhook', help='Webhook URL (bulk mode: default webhook of the targets)', default='')
+    parser.add_argument('--targets', nargs='+', help='Bulk mode: targets to seed, e.g. 123:fr 260:en')
+    parser.add_argument('--servers-file', help='Bulk mode: server list file (OGame lobby JSON or "server community [webhook]" lines)')
+    parser.add_argument('--workers', type=int, default=bs.DEFAULT_WORKERS, help='Bulk mode: universes seeded at the same time')
+    parser.add_argument('--reseed', action='store_true', help='Bulk mode: overwrite the state of already seeded universes')
+    return parser.parse_args()
+
+
+def bulk_bootstrap(arguments):
+    """
+    Seed every listed universe and add them to the [[TARGETS]] tables of config.toml, for multi_bot.py.
+
+    Unlike the single server set up, template files, .git and the checkout directory are left untouched,
+    so it can be run again to add universes or retry the failed ones.
+    """
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    targets = [bs.parse_target(target, arguments.webhook) for target in arguments.targets or []]
+    if arguments.servers_file:
+        targets += bs.read_server_list(arguments.servers_file, arguments.community, arguments.webhook)
+
+    # One pooled client for every universe, sized for the concurrent downloads
+    context = ac.load()
+    context = ac.AppContext(context.config, client=hc.HttpClient(pool_connections=arguments.workers, pool_maxsize=arguments.workers))
+    results = bs.bootstrap(targets, arguments.workers, arguments.reseed, context)
+    context.close()
+
+    for target, status in results:
+        print(f'{target["server"]}_{target["community"]}: {status}')
+    failed = sum(1 for _, status in results if status == 'failed')
+    if failed:
+        raise SystemExit(f'{failed}/{len(results)} targets failed, run the same command again to retry them')
 
 
 def rename_files(server, community):
@@ -46,79 +94,6 @@ def update_config_file(server, community, webhook):
         toml.dump(config_data, f)
 
 
-def get_highscore_api(server, community, category, type):
-    """
-    Retrieve data from OGame highscore API.
-
-    Args:
-        server (str): The OGame server number (e.g., '123', '260').
-
-        community (str): The OGame community abbreviation (e.g., 'en', 'us').
-
-        category (str): The category of highscore data to retrieve.
-            - '1': Player highscore
-            - '2': Alliance highscore
-
-        type (str): The type of highscore data to retrieve.
-            - '0': General highscore
-            - '1': Economy highscore
-            - '2': Technology highscore
-            - '3': Military highscore
-            - '4': Military lost highscore
-            - '5': Military build highscore
-            - '6': Military destroyed highscore
-            - '7': Honor highscore
-            - '8': Lifeforms highscore
-            - '9': Lifeforms economy highscore
-            - '10': Lifeforms technology highscore
-            - '11': Lifeforms discovery highscore
-
-    Raises:
-        requests.exceptions.RequestException: If there is an error during the request.
-
-    Returns if success:
-        xml.etree.ElementTree.Element: The whole XML document as a tree.
-
-    Returns if failure:
-        NoneType: None
-    """
-    api_url = f'https://s{server}-{community}.ogame.gameforge.com/api/highscore.xml?category={category}&type={type}'
-    try:
-        response = requests.get(api_url)
-        if response.status_code == 200:
-            xml_tree = et.fromstring(response.content)
-            return xml_tree
-        response.raise_for_status()
-    except requests.exceptions.RequestException:
-        return None
-
-
-def get_player_ids(xml_tree):
-    """
-    Retrieve a list of all player IDs from OGame highscore API.
-
-    Args:
-        xml_tree (xml.etree.ElementTree.Element): Whole XML document as a tree.
-
-    Raises:
-        KeyError: If the attribute 'timestamp' does not exist in xml_tree.
-
-    Returns if success:
-        list: All fetched player IDs.
-
-    Returns if failure:
-        NoneType: None
-    """
-    ids = []
-    for child in xml_tree:
-        try:
-            id = child.attrib.get('id')
-            ids.append(id)
-        except KeyError:
-            return None
-    return ids
-
-
 def update_players_file(server, community, player_list):
     with open(f'../data/{server}_{community}_players.json', 'w') as players_file:
         json.dump(player_list, players_file)
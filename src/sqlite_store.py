@@ -0,0 +1,254 @@
+# Load necessary modules
+import argparse
+import os
+import json
+import sqlite3
+import time
+import player_index as pi
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    server TEXT NOT NULL,
+    community TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    player_count INTEGER NOT NULL,
+    newcomer_count INTEGER NOT NULL,
+    recorded_at INTEGER NOT NULL,
+    PRIMARY KEY (server, community, timestamp)
+);
+
+CREATE TABLE IF NOT EXISTS players (
+    server TEXT NOT NULL,
+    community TEXT NOT NULL,
+    player_id INTEGER NOT NULL,
+    first_seen INTEGER NOT NULL,
+    last_seen INTEGER NOT NULL,
+    PRIMARY KEY (server, community, player_id)
+);
+
+CREATE INDEX IF NOT EXISTS players_first_seen ON players (server, community, first_seen);
+
+CREATE TABLE IF NOT EXISTS enrichments (
+    server TEXT NOT NULL,
+    community TEXT NOT NULL,
+    player_id INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    name TEXT,
+    home TEXT,
+    military_points INTEGER,
+    ship_count INTEGER,
+    PRIMARY KEY (server, community, player_id, timestamp)
+);
+"""
+
+
+class SqliteStore:
+    """
+    Optional SQLite history of API snapshots, players first/last seen times and newcomer enrichment results.
+
+    The database runs in WAL mode so readers never block the bot, and every cycle is written in one transaction.
+    Use it as a context manager to close the connection.
+
+    Args:
+        path (str): The database file (e.g., '../data/check_newcomers.sqlite3').
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def record_cycle(self, server, community, timestamp, current_ids, enriched_players=()):
+        """
+        Record one API update in a single transaction.
+
+        Args:
+            server (str): The OGame server number (e.g., '123', '260').
+
+            community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+            timestamp (int): Epoch unix timestamp of the API update.
+
+            current_ids (list): Every player ID present in the update.
+
+            enriched_players (list): (player_id, record) tuples as returned by player_fetcher.enrich_players(),
+                players with a None record are skipped.
+
+        Returns:
+            int: Number of players seen for the first time.
+        """
+
+        timestamp = int(timestamp)
+        rows = [(server, community, int(player_id), timestamp, timestamp) for player_id in current_ids]
+        with self.connection:
+            before = self._player_count(server, community)
+            self.connection.executemany(
+                'INSERT INTO players (server, community, player_id, first_seen, last_seen) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (server, community, player_id) DO UPDATE SET last_seen = MAX(last_seen, excluded.last_seen)',
+                rows,
+            )
+            newcomer_count = self._player_count(server, community) - before
+            self.connection.execute(
+                'INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?, ?)',
+                (server, community, timestamp, len(rows), newcomer_count, int(time.time())),
+            )
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO enrichments VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (server, community, int(player_id), timestamp, record.name, record.home, record.military_points, record.ship_count)
+                    for player_id, record in enriched_players
+                    if record is not None
+                ],
+            )
+        return newcomer_count
+
+    def first_seen(self, server, community, player_id):
+        """
+        Return when a player was first seen.
+
+        Args:
+            server (str): The OGame server number (e.g., '123', '260').
+
+            community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+            player_id (str | int): The ID of the player of interest.
+
+        Returns if the player is known:
+            int: Epoch unix timestamp of the first API update listing the player.
+
+        Returns otherwise:
+            NoneType: None
+        """
+
+        row = self.connection.execute(
+            'SELECT first_seen FROM players WHERE server = ? AND community = ? AND player_id = ?',
+            (server, community, int(player_id)),
+        ).fetchone()
+        return row[0] if row else None
+
+    def player_history(self, server, community, player_id):
+        """
+        Return the recorded enrichment results of a player.
+
+        Args:
+            server (str): The OGame server number (e.g., '123', '260').
+
+            community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+            player_id (str | int): The ID of the player of interest.
+
+        Returns:
+            list: (timestamp, name, home, military_points, ship_count) tuples, oldest first.
+        """
+
+        return self.connection.execute(
+            'SELECT timestamp, name, home, military_points, ship_count FROM enrichments '
+            'WHERE server = ? AND community = ? AND player_id = ? ORDER BY timestamp',
+            (server, community, int(player_id)),
+        ).fetchall()
+
+    def arrivals(self, server, community, since, until=None):
+        """
+        Return the players first seen in a time range.
+
+        Args:
+            server (str): The OGame server number (e.g., '123', '260').
+
+            community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+            since (int): Epoch unix timestamp, inclusive.
+
+            until (int): Epoch unix timestamp, exclusive, None for no upper bound.
+
+        Returns:
+            list: (player_id, first_seen) tuples ordered by first_seen.
+        """
+
+        until = until if until is not None else 2 ** 63 - 1
+        return self.connection.execute(
+            'SELECT player_id, first_seen FROM players '
+            'WHERE server = ? AND community = ? AND first_seen >= ? AND first_seen < ? ORDER BY first_seen, player_id',
+            (server, community, int(since), int(until)),
+        ).fetchall()
+
+    def snapshots(self, server, community):
+        """
+        Return the recorded API updates of a server.
+
+        Args:
+            server (str): The OGame server number (e.g., '123', '260').
+
+            community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        Returns:
+            list: (timestamp, player_count, newcomer_count) tuples, oldest first.
+        """
+
+        return self.connection.execute(
+            'SELECT timestamp, player_count, newcomer_count FROM snapshots '
+            'WHERE server = ? AND community = ? ORDER BY timestamp',
+            (server, community),
+        ).fetchall()
+
+    def import_json(self, data_dir, server, community):
+        """
+        Import the flat state files of a server (players index and timestamp).
+
+        The files carry no history, so every known player gets the stored timestamp as first and last seen time.
+        They are only read: a legacy JSON players file is imported as is, not migrated to the binary format.
+
+        Args:
+            data_dir (str): The data directory (e.g., '../data').
+
+            server (str): The OGame server number (e.g., '123', '260').
+
+            community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+        Returns:
+            int: Number of imported players.
+        """
+
+        index_path = pi.get_index_path(data_dir, server, community)
+        if os.path.exists(index_path):
+            index = pi.PlayerIndex.load(index_path)
+        else:
+            index = pi.PlayerIndex.from_json(f'{data_dir}/{server}_{community}_players.json')
+        timestamp = index.timestamp
+        if timestamp is None:
+            with open(f'{data_dir}/{server}_{community}_timestamp.json', 'r') as timestamp_file:
+                timestamp = int(json.load(timestamp_file))
+        self.record_cycle(server, community, timestamp, list(index))
+        return len(index)
+
+    def _player_count(self, server, community):
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM players WHERE server = ? AND community = ?',
+            (server, community),
+        ).fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(usage='python3 sqlite_store.py -d|--database -s|--server -c|--community [--data-dir] [-h|--help]')
+    parser.add_argument('-d', '--database', help='SQLite database file', required=True)
+    parser.add_argument('-s', '--server', help='Server ID', required=True)
+    parser.add_argument('-c', '--community', help='Community ID', required=True)
+    parser.add_argument('--data-dir', help='Data directory holding the JSON files', default=f'{os.path.dirname(__file__)}/../data')
+    arguments = parser.parse_args()
+    with SqliteStore(arguments.database) as store:
+        count = store.import_json(arguments.data_dir, arguments.server, arguments.community)
+    print(f'Imported {count} players of {arguments.server}_{arguments.community}')
+
+
+if __name__ == '__main__':
+    main()
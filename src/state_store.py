@@ -0,0 +1,225 @@
+# Load necessary modules
+import os
+import json
+import logging
+import player_index as pi
+
+
+class StateStore:
+    """
+    Crash-safe persistence of the known players index and the last API timestamp of a server.
+
+    During a cycle, processed player IDs are appended to a journal file ({server}_{community}_players.journal)
+    and fsynced in batches, so the cost of recording a newcomer does not depend on the number of known players.
+    At the end of the cycle commit() writes the index and its timestamp into a single binary file through
+    a temporary file and a rename, then truncates the journal.
+    Since the timestamp lives in the same file as the index, both are always committed together;
+    {server}_{community}_timestamp.json is kept as a mirror for readers that only need the timestamp.
+
+    If the process dies mid-cycle, load() replays the journal so already processed players are not reported twice.
+    """
+
+    def __init__(self, data_dir, server, community, fsync_every=32):
+        self.data_dir = data_dir
+        self.server = server
+        self.community = community
+        self.fsync_every = fsync_every
+        self.index_path = pi.get_index_path(data_dir, server, community)
+        self.journal_path = f'{data_dir}/{server}_{community}_players.journal'
+        self.timestamp_path = f'{data_dir}/{server}_{community}_timestamp.json'
+        self.players = None
+        self.timestamp = None
+        self.dirty = False
+        self._journal_file = None
+        self._pending = 0
+
+    def load(self):
+        """
+        Load the players index and timestamp, then replay the journal left by an interrupted cycle.
+
+        Raises:
+            FileNotFoundError: If neither the players file nor the timestamp file exists.
+
+        Returns:
+            StateStore: self, for chaining.
+        """
+
+        self.players = pi.load_player_index(self.data_dir, self.server, self.community)
+
+        # The index header is authoritative, fall back to the JSON mirror for indexes written before it existed
+        if self.players.timestamp is not None:
+            self.timestamp = self.players.timestamp
+            self._repair_timestamp_mirror()
+        else:
+            with open(self.timestamp_path, 'r') as timestamp_file:
+                self.timestamp = int(json.load(timestamp_file))
+            self.players.timestamp = self.timestamp
+
+        replayed = self._replay_journal()
+        if replayed:
+            logging.info(f'Replayed {replayed} entries from {self.journal_path}')
+        return self
+
+    def record(self, player_id):
+        """
+        Mark a player as processed by appending it to the journal.
+
+        Args:
+            player_id (str | int): The ID of the processed player.
+
+        Returns: None.
+        """
+
+        self.players.add(player_id)
+        if self._journal_file is None:
+            self._journal_file = open(self.journal_path, 'a')
+        self._journal_file.write(f'{int(player_id)}\n')
+        self._pending += 1
+        if self._pending >= self.fsync_every:
+            self.flush()
+
+    def flush(self):
+        """
+        Force pending journal entries to disk.
+
+        Returns: None.
+        """
+
+        if self._journal_file is None or self._pending == 0:
+            return
+        self._journal_file.flush()
+        os.fsync(self._journal_file.fileno())
+        self._pending = 0
+
+    def advance(self, timestamp):
+        """
+        Move the in-memory state to a processed API update without rewriting the index.
+
+        Used by long-running processes that keep the state in memory and checkpoint() it periodically.
+        Journaled players stay safe meanwhile: after a crash, load() returns the last checkpoint plus the journal,
+        and the update is processed again without reporting them twice.
+
+        Args:
+            timestamp (int): Epoch unix timestamp of the processed API update.
+
+        Returns: None.
+        """
+
+        self.flush()
+        self.timestamp = int(timestamp)
+        self.players.timestamp = self.timestamp
+        self.dirty = True
+
+    def checkpoint(self):
+        """
+        Persist the in-memory state if it moved since the last commit.
+
+        Returns:
+            bool: True if the state was written.
+        """
+
+        if not self.dirty:
+            return False
+        self.commit(self.timestamp)
+        return True
+
+    def commit(self, timestamp):
+        """
+        Atomically persist the players index together with the API timestamp and clear the journal.
+
+        Args:
+            timestamp (int): Epoch unix timestamp of the processed API update.
+
+        Returns: None.
+        """
+
+        self.flush()
+        self.players.timestamp = int(timestamp)
+        atomic_write(self.index_path, self.players.to_bytes())
+        self.timestamp = int(timestamp)
+
+        # The journal is now part of the index, drop it
+        self.close()
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+        atomic_write(self.timestamp_path, json.dumps(self.timestamp).encode())
+        self.dirty = False
+
+    def close(self):
+        """
+        Flush and close the journal file if it is open.
+
+        Returns: None.
+        """
+
+        if self._journal_file is None:
+            return
+        self.flush()
+        self._journal_file.close()
+        self._journal_file = None
+
+    def _repair_timestamp_mirror(self):
+        # A crash between the index rename and the mirror write leaves the mirror one update behind
+        try:
+            with open(self.timestamp_path, 'r') as timestamp_file:
+                mirrored = int(json.load(timestamp_file))
+        except (OSError, ValueError):
+            mirrored = None
+        if mirrored != self.timestamp:
+            logging.info(f'Repairing {self.timestamp_path}: {mirrored} -> {self.timestamp}')
+            atomic_write(self.timestamp_path, json.dumps(self.timestamp).encode())
+
+    def _replay_journal(self):
+        if not os.path.exists(self.journal_path):
+            return 0
+        replayed = 0
+        with open(self.journal_path, 'r') as journal_file:
+            for line in journal_file:
+                # A line without its newline is a torn write from a crash, ignore it
+                if not line.endswith('\n'):
+                    logging.warning(f'Ignoring incomplete entry in {self.journal_path}: {line!r}')
+                    break
+                try:
+                    self.players.add(int(line))
+                except ValueError:
+                    logging.warning(f'Ignoring invalid entry in {self.journal_path}: {line!r}')
+                    continue
+                replayed += 1
+        return replayed
+
+
+def atomic_write(path, data):
+    """
+    Replace the content of a file atomically.
+
+    The data is written and fsynced to a temporary file in the same directory, which is then renamed over path.
+    Readers see either the old or the new content, never a partial file.
+
+    Args:
+        path (str): Destination file path.
+
+        data (bytes): New file content.
+
+    Returns: None.
+    """
+
+    directory = os.path.dirname(path) or '.'
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as tmp_file:
+        tmp_file.write(data)
+        tmp_file.flush()
+        os.fsync(tmp_file.fileno())
+    os.replace(tmp_path, path)
+
+    # Persist the rename itself
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
@@ -0,0 +1,251 @@
+# Load necessary modules
+import os
+import json
+import random
+import statistics
+import logging
+import state_store as ss
+
+# Default settings, overridable from the [SCHEDULER] section of config.toml
+DEFAULT_INTERVAL = 3600
+DEFAULT_WINDOW = 300
+DEFAULT_MIN_POLL = 30
+DEFAULT_MAX_POLL = 600
+DEFAULT_JITTER = 0.1
+DEFAULT_HISTORY = 24
+
+
+class UpdateScheduler:
+    """
+    Predict when an OGame API endpoint is updated and decide when to poll it next.
+
+    The update interval is learned from the observed API timestamps (median of the gaps between them).
+    The scheduler sleeps until shortly before the next predicted update, then polls with growing
+    intervals (min_poll, 2 * min_poll, ... up to max_poll) and some random jitter until the update shows up.
+
+    Args:
+        default_interval (int): Interval (in seconds) assumed until two updates have been observed.
+
+        window (int): How early (in seconds) before the predicted update polling starts.
+
+        min_poll (int): First delay (in seconds) between two polls inside the window.
+
+        max_poll (int): Largest delay (in seconds) between two polls inside the window.
+
+        jitter (float): Relative random variation applied to every delay (e.g., 0.1 for +/- 10%).
+
+        history (int): Number of observed updates kept to learn the interval and build stats.
+
+        stats_path (str): Optional JSON file the stats are written to by save_stats(), i.e. at every state checkpoint,
+            and the observed updates are reloaded from by load_stats(), so a restart keeps the learned interval.
+    """
+
+    def __init__(
+        self,
+        default_interval=DEFAULT_INTERVAL,
+        window=DEFAULT_WINDOW,
+        min_poll=DEFAULT_MIN_POLL,
+        max_poll=DEFAULT_MAX_POLL,
+        jitter=DEFAULT_JITTER,
+        history=DEFAULT_HISTORY,
+        stats_path=None,
+    ):
+        self.default_interval = default_interval
+        self.window = window
+        self.min_poll = min_poll
+        self.max_poll = max_poll
+        self.jitter = jitter
+        self.history = history
+        self.stats_path = stats_path
+        self.timestamps = []
+        self.updates = []
+        self.misses = 0
+        self.polls = 0
+        self.wasted_polls = 0
+
+    @property
+    def last_timestamp(self):
+        return self.timestamps[-1] if self.timestamps else None
+
+    def interval(self):
+        """
+        Return the learned update interval.
+
+        Returns:
+            float: Median gap (in seconds) between observed API timestamps, default_interval if unknown.
+        """
+
+        gaps = [later - earlier for earlier, later in zip(self.timestamps, self.timestamps[1:]) if later > earlier]
+        if not gaps:
+            return float(self.default_interval)
+        return float(statistics.median(gaps))
+
+    def predict_next(self):
+        """
+        Return the predicted timestamp of the next API update.
+
+        Returns if at least one update was observed:
+            float: Epoch unix timestamp.
+
+        Returns otherwise:
+            NoneType: None
+        """
+
+        if self.last_timestamp is None:
+            return None
+        return self.last_timestamp + self.interval()
+
+    def observe(self, timestamp):
+        """
+        Seed the scheduler with a known API timestamp without counting a poll (e.g., at startup).
+
+        Args:
+            timestamp (int): Epoch unix timestamp of the last processed API update.
+
+        Returns: None.
+        """
+
+        if timestamp is None or timestamp == self.last_timestamp:
+            return
+        self.timestamps.append(int(timestamp))
+        del self.timestamps[:-self.history]
+        self.misses = 0
+
+    def record_poll(self, timestamp, now):
+        """
+        Record the outcome of a poll.
+
+        Args:
+            timestamp (int): API timestamp known after the poll.
+
+            now (float): Epoch unix time the poll finished at.
+
+        Returns:
+            bool: True if the poll found a new API update.
+        """
+
+        self.polls += 1
+        if timestamp is None or timestamp == self.last_timestamp:
+            self.misses += 1
+            self.wasted_polls += 1
+            return False
+
+        predicted = self.predict_next()
+        if predicted is not None:
+            self.updates.append({
+                'predicted': round(predicted),
+                'actual': int(timestamp),
+                'detected_at': round(now),
+                'prediction_error': round(predicted - timestamp),
+                'detection_latency': round(now - timestamp),
+                'polls': self.misses + 1,
+            })
+            del self.updates[:-self.history]
+        self.observe(timestamp)
+        return True
+
+    def next_poll_delay(self, now):
+        """
+        Return how long to wait before the next poll.
+
+        Args:
+            now (float): Current epoch unix time.
+
+        Returns:
+            float: Delay in seconds.
+        """
+
+        predicted = self.predict_next()
+        if predicted is None:
+            delay = self.min_poll
+        elif now < predicted - self.window:
+            # Sleep until the polling window opens, no jitter needed
+            return predicted - self.window - now
+        else:
+            delay = min(self.min_poll * 2 ** self.misses, self.max_poll)
+        return max(1.0, delay * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def stats(self):
+        """
+        Summarize the scheduler behaviour.
+
+        Returns:
+            dict: Learned interval, next predicted update, poll counters, the observed API timestamps and
+                the predicted versus actual times of the recent updates.
+        """
+
+        errors = [abs(update['prediction_error']) for update in self.updates]
+        latencies = [update['detection_latency'] for update in self.updates]
+        return {
+            'interval': self.interval(),
+            'last_timestamp': self.last_timestamp,
+            'next_predicted': self.predict_next(),
+            'polls': self.polls,
+            'wasted_polls': self.wasted_polls,
+            'mean_abs_prediction_error': statistics.mean(errors) if errors else None,
+            'mean_detection_latency': statistics.mean(latencies) if latencies else None,
+            'timestamps': list(self.timestamps),
+            'updates': list(self.updates),
+        }
+
+    def load_stats(self):
+        """
+        Reseed the observed API timestamps and recent updates from stats_path, if the file exists.
+
+        Returns: None.
+        """
+
+        if self.stats_path is None or not os.path.exists(self.stats_path):
+            return
+        try:
+            with open(self.stats_path, 'r') as stats_file:
+                stats = json.load(stats_file)
+            # Files written before the timestamps were saved only know the last one
+            timestamps = stats.get('timestamps')
+            if timestamps is None:
+                timestamps = [] if stats.get('last_timestamp') is None else [stats['last_timestamp']]
+            self.timestamps = [int(timestamp) for timestamp in timestamps][-self.history:]
+            self.updates = list(stats.get('updates', []))[-self.history:]
+        except (OSError, ValueError, TypeError, AttributeError) as exception:
+            logging.warning(f'Ignoring unreadable scheduler stats {self.stats_path}: {exception}')
+
+    def save_stats(self):
+        """
+        Write stats() to stats_path if one was given.
+
+        Returns: None.
+        """
+
+        if self.stats_path is None:
+            return
+        try:
+            ss.atomic_write(self.stats_path, json.dumps(self.stats(), indent=2).encode())
+        except OSError as error:
+            logging.warning(f'Unable to write scheduler stats to {self.stats_path}: {error}')
+
+
+def from_config(config, stats_path=None):
+    """
+    Build an UpdateScheduler from a parsed config.toml.
+
+    Args:
+        config (dict): The parsed configuration file.
+
+        stats_path (str): Optional JSON file the stats are written to and the observed updates reloaded from.
+
+    Returns:
+        UpdateScheduler: A scheduler using the [SCHEDULER] settings, defaults for missing keys.
+    """
+
+    scheduler_config = config.get('SCHEDULER', {})
+    scheduler = UpdateScheduler(
+        default_interval=scheduler_config.get('default_interval', DEFAULT_INTERVAL),
+        window=scheduler_config.get('window', DEFAULT_WINDOW),
+        min_poll=scheduler_config.get('min_poll', DEFAULT_MIN_POLL),
+        max_poll=scheduler_config.get('max_poll', DEFAULT_MAX_POLL),
+        jitter=scheduler_config.get('jitter', DEFAULT_JITTER),
+        history=scheduler_config.get('history', DEFAULT_HISTORY),
+        stats_path=stats_path,
+    )
+    scheduler.load_stats()
+    return scheduler
@@ -0,0 +1,243 @@
+# Load necessary modules
+import os
+import json
+import heapq
+import logging
+from collections import namedtuple
+import metrics
+import player_fetcher as pf
+import state_store as ss
+
+# Default settings, overridable from the [WATCHLIST] section of config.toml
+DEFAULT_TRACK_DAYS = 7
+DEFAULT_REFRESH_INTERVAL = 21600
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_MIN_POINTS_JUMP = 10000
+DEFAULT_MIN_SHIPS_JUMP = 100
+
+# A significant change of a tracked player since the last time they were reported
+Change = namedtuple('Change', ('player_id', 'name', 'home', 'age', 'points_before', 'points_after', 'ships_before', 'ships_after'))
+
+
+class Watchlist:
+    """
+    Newcomers followed for their first days, refreshed in bounded batches.
+
+    Tracked players sit in a heap ordered by next refresh time. Each cycle pops at most batch_size due players
+    and fetches them from OGame player API, so the refresh cost of a cycle does not depend on the watchlist size.
+    A refreshed player is pushed back one refresh_interval later, until track_days have passed since they arrived.
+    Rescheduling leaves the old heap entry in place: entries whose time no longer matches the player are skipped when popped.
+
+    Times are API timestamps, so a replay of archived updates refreshes the same players as the live bot did.
+
+    Args:
+        path (str): JSON file the watchlist is persisted to, None keeps it in memory only.
+
+        track_days (float): Days a newcomer is followed.
+
+        refresh_interval (float): Seconds between two refreshes of a player.
+
+        batch_size (int): Maximum number of players refreshed per cycle.
+
+        min_points_jump (int): Military points gained since the last report that make a change significant.
+
+        min_ships_jump (int): Ships gained since the last report that make a change significant.
+    """
+
+    def __init__(
+        self,
+        path=None,
+        track_days=DEFAULT_TRACK_DAYS,
+        refresh_interval=DEFAULT_REFRESH_INTERVAL,
+        batch_size=DEFAULT_BATCH_SIZE,
+        min_points_jump=DEFAULT_MIN_POINTS_JUMP,
+        min_ships_jump=DEFAULT_MIN_SHIPS_JUMP,
+    ):
+        self.path = path
+        self.track_seconds = track_days * 86400
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self.min_points_jump = min_points_jump
+        self.min_ships_jump = min_ships_jump
+        self.entries = {}
+        self.dirty = False
+        self._heap = []
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path, 'r') as watchlist_file:
+                    self.entries = json.load(watchlist_file)
+            except (OSError, ValueError) as error:
+                logging.warning(f'Ignoring unreadable watchlist {path}: {error}')
+        self._heap = [(entry['next_refresh'], player_id) for player_id, entry in self.entries.items()]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, record, now):
+        """
+        Start following a newcomer, unless they are already followed.
+
+        Args:
+            record (player_record.PlayerRecord): The record the newcomer was reported with.
+
+            now (int): Current time, as an epoch unix timestamp.
+
+        Returns: None.
+        """
+
+        player_id = str(record.id)
+        if player_id in self.entries:
+            return
+        self.entries[player_id] = {
+            'name': record.name,
+            'home': record.home,
+            'first_seen': now,
+            'next_refresh': now + self.refresh_interval,
+            'points': record.military_points,
+            'ships': record.ship_count,
+        }
+        heapq.heappush(self._heap, (now + self.refresh_interval, player_id))
+        self.dirty = True
+
+    def pop_due(self, now):
+        """
+        Take the players whose refresh is due, forgetting the ones followed long enough.
+
+        Args:
+            now (int): Current time, as an epoch unix timestamp.
+
+        Returns:
+            list: Up to batch_size player IDs (as str), the most overdue first.
+        """
+
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+            next_refresh, player_id = heapq.heappop(self._heap)
+            entry = self.entries.get(player_id)
+            if entry is None or entry['next_refresh'] != next_refresh:
+                # Stale heap entry of a rescheduled or forgotten player
+                continue
+            if now - entry['first_seen'] >= self.track_seconds:
+                del self.entries[player_id]
+                self.dirty = True
+                continue
+            due.append(player_id)
+        return due
+
+    def update(self, player_id, record, now):
+        """
+        Record the refreshed data of a player and schedule their next refresh.
+
+        Args:
+            player_id (str): The ID of the refreshed player.
+
+            record (player_record.PlayerRecord): The refreshed record, None if it could not be fetched.
+
+            now (int): Current time, as an epoch unix timestamp.
+
+        Returns if the player changed significantly since they were last reported:
+            Change: The change, the player is then reported with these values.
+
+        Returns otherwise:
+            NoneType: None
+        """
+
+        entry = self.entries[player_id]
+        entry['next_refresh'] = now + self.refresh_interval
+        heapq.heappush(self._heap, (entry['next_refresh'], player_id))
+        self.dirty = True
+        if record is None:
+            return None
+
+        points_before, ships_before = entry['points'], entry['ships']
+        points_after, ships_after = record.military_points, record.ship_count
+        entry['name'] = record.name
+        if not (_gained(points_before, points_after) >= self.min_points_jump or _gained(ships_before, ships_after) >= self.min_ships_jump):
+            return None
+        entry['points'], entry['ships'] = points_after, ships_after
+        return Change(player_id, record.name, entry['home'], now - entry['first_seen'], points_before, points_after, ships_before, ships_after)
+
+    def refresh(self, server, community, now, requests_per_second=2.0, max_in_flight=4, context=None):
+        """
+        Refresh the due players of the watchlist through OGame player API.
+
+        Args:
+            server (str): The OGame server number (e.g., '123', '260').
+
+            community (str): The OGame community abbreviation (e.g., 'en', 'us').
+
+            now (int): Current time, as an epoch unix timestamp.
+
+            requests_per_second (float): Sustained request rate allowed against the API.
+
+            max_in_flight (int): Maximum number of requests running at the same time.
+
+            context (app_context.AppContext): Settings and HTTP client to use, the default context if None.
+
+        Returns:
+            list: Significant Change tuples, largest military points gain first.
+        """
+
+        due = self.pop_due(now)
+        if not due:
+            return []
+        logging.info(f'Refreshing {len(due)}/{len(self.entries)} watched players')
+        metrics.registry.inc('watchlist_refreshes_total', len(due), target=f'{server}_{community}')
+
+        changes = []
+        for player_id, record in pf.enrich_players(server, community, due, requests_per_second, max_in_flight, context):
+            change = self.update(player_id, record, now)
+            if change is not None:
+                changes.append(change)
+        changes.sort(key=lambda change: _gained(change.points_before, change.points_after), reverse=True)
+        return changes
+
+    def save(self):
+        """
+        Write the watchlist to its file, if anything changed since the last write.
+
+        Returns: None.
+        """
+
+        if self.path is None or not self.dirty:
+            return
+        ss.atomic_write(self.path, json.dumps(self.entries).encode())
+        self.dirty = False
+
+
+def _gained(before, after):
+    # Unknown values (missing from the API) never make a change significant
+    if before is None or after is None:
+        return 0
+    return after - before
+
+
+def from_config(config, path):
+    """
+    Build a Watchlist from a parsed config.toml.
+
+    Args:
+        config (dict): The parsed configuration file.
+
+        path (str): JSON file the watchlist is persisted to.
+
+    Returns if enabled in [WATCHLIST]:
+        Watchlist: A watchlist using the [WATCHLIST] settings, defaults for missing keys.
+
+    Returns if newcomers are not followed:
+        NoneType: None
+    """
+
+    # Extract configuration parameters: switch, tracking period, refresh pacing and significance thresholds
+    watchlist_config = config.get('WATCHLIST', {})
+    if not watchlist_config.get('enabled', False):
+        return None
+    return Watchlist(
+        path,
+        track_days=watchlist_config.get('track_days', DEFAULT_TRACK_DAYS),
+        refresh_interval=watchlist_config.get('refresh_interval', DEFAULT_REFRESH_INTERVAL),
+        batch_size=watchlist_config.get('batch_size', DEFAULT_BATCH_SIZE),
+        min_points_jump=watchlist_config.get('min_points_jump', DEFAULT_MIN_POINTS_JUMP),
+        min_ships_jump=watchlist_config.get('min_ships_jump', DEFAULT_MIN_SHIPS_JUMP),
+    )